@@ -3,7 +3,10 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.core.error_handler import app_exception_handler
+from app.core.http_pool import http_pool
+from app.tools.pdf_render_service import pdf_render_service
 from api.routes.artifact import router as artifact_router
+from api.routes.metrics import router as metrics_router
 from api.routes import task
 
 app = FastAPI(title=settings.app_name, version=settings.app_version)
@@ -26,6 +29,13 @@ app.add_exception_handler(Exception, app_exception_handler)
 # 所以我们需要加上 prefix="/api"
 app.include_router(task.router, prefix="/api", tags=["Task"])
 app.include_router(artifact_router, prefix="/api", tags=["Artifact"])
+app.include_router(metrics_router, prefix="/api", tags=["Metrics"])
+
+@app.on_event("shutdown")
+async def shutdown():
+    """关闭共享 HTTP 连接池与 PDF 渲染进程池"""
+    await http_pool.aclose()
+    pdf_render_service.shutdown(wait=False)
 
 @app.get("/health")
 def health():
@@ -1,13 +1,162 @@
 # api/routes/artifact.py
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
 import os
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+
+from app.core.artifact_store import artifact_store
+from app.core.config import settings
+from app.models.artifact import Artifact
+from app.tools.pdf_artifacts import markdown_for_task, pdf_artifacts
+from app.tools.pdf_render_service import RenderQueueFull
 
 router = APIRouter()
 
+_CHUNK = 64 * 1024
+
+
 @router.get("/artifact/{task_id}")
-def download_artifact(task_id: str):
-    pdf_path = f"app/artifacts/{task_id}.pdf"
-    if not os.path.exists(pdf_path):
+def download_artifact(task_id: str, request: Request):
+    """
+    下载 PDF：第一次请求时由 Markdown 渲染（同一内容只渲染一次，并发请求等待同一次渲染），
+    之后直接从产物存储读取；支持 ETag / 304 与断点续传。
+    渲染队列已满是暂时过载，返回 503 + Retry-After，客户端稍后重试即可。
+    """
+    try:
+        artifact = pdf_artifacts.pdf_for_task(task_id)
+    except RenderQueueFull:
+        raise HTTPException(status_code=503, detail="PDF render queue is full, retry later",
+                            headers={"Retry-After": str(settings.pdf_retry_after_s)})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"PDF render failed: {e}")
+    if artifact is None:
         raise HTTPException(status_code=404, detail="Artifact not found")
-    return FileResponse(pdf_path, filename=f"{task_id}.pdf", media_type="application/pdf")
\ No newline at end of file
+    return _serve(request, artifact, f"{task_id}.pdf")
+
+
+@router.get("/artifact/{task_id}/markdown")
+def download_markdown(task_id: str, request: Request):
+    """下载报告 Markdown；客户端接受 gzip 时直接发送预压缩版本"""
+    artifact = markdown_for_task(task_id)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    return _serve(request, artifact, f"{task_id}.md")
+
+
+def _serve(request: Request, artifact: Artifact, filename: str) -> Response:
+    """
+    按 HTTP 条件请求语义发送产物：
+      - 强 ETag 即内容 sha256（gzip 版本为 "{sha256}-gzip"），If-None-Match 命中返回 304，不读文件；
+      - Range: bytes=… 单段请求返回 206（If-Range 与当前 ETag 不符时忽略 Range），越界返回 416；
+      - 无 Range 且 Accept-Encoding 含 gzip 时发送预压缩文件，带 Content-Encoding 与 Vary。
+    """
+    sha256 = artifact.meta["sha256"]
+    etag = f'"{sha256}"'
+    gz_etag = f'"{sha256}-gzip"'
+    has_gzip = bool(artifact.meta.get("gz_size"))
+    headers = {"ETag": etag, "Accept-Ranges": "bytes", "Cache-Control": "no-cache"}
+    if has_gzip:
+        headers["Vary"] = "Accept-Encoding"
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, (etag, gz_etag)):
+        if gz_etag in if_none_match:
+            headers["ETag"] = gz_etag
+        artifact_store.record_served(304)
+        return Response(status_code=304, headers=headers)
+
+    path = artifact.uri
+    size = artifact.meta["size"]
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        byte_range = _parse_range(range_header, size)
+        if byte_range == "invalid":
+            artifact_store.record_served(416)
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            _require_file(path)
+            artifact_store.record_served(206, length)
+            return StreamingResponse(
+                _iter_file(path, start, length),
+                status_code=206,
+                media_type=artifact.mime,
+                headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(length)},
+            )
+
+    if has_gzip and not range_header and _accepts_gzip(request.headers.get("accept-encoding", "")):
+        headers["ETag"] = gz_etag
+        headers["Content-Encoding"] = "gzip"
+        path = artifact_store.gzip_path(sha256)
+        _require_file(path)
+        artifact_store.record_served(200, artifact.meta["gz_size"], gzipped=True)
+    else:
+        _require_file(path)
+        artifact_store.record_served(200, size)
+    return FileResponse(path, filename=filename, media_type=artifact.mime, headers=headers)
+
+
+def _require_file(path: str):
+    """对象文件被清理时返回 404（在构造响应之前检查：StreamingResponse 开始发送后才打开文件，届时已无法改状态码）"""
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Artifact file missing")
+
+
+def _etag_matches(header: str, etags: Tuple[str, ...]) -> bool:
+    """If-None-Match 用弱比较：去掉 W/ 前缀后比较"""
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") in etags:
+            return True
+    return False
+
+
+def _parse_range(header: str, size: int):
+    """解析单段 bytes 范围，返回 (start, end)；多段请求返回 None（按完整内容发送），无法满足返回 "invalid" """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return "invalid"
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:  # bytes=-N：最后 N 个字节
+            suffix = int(last)
+            if suffix <= 0:
+                return "invalid"
+            start, end = max(0, size - suffix), size - 1
+    except ValueError:
+        return "invalid"
+    if start >= size or start > end or start < 0:
+        return "invalid"
+    return start, min(end, size - 1)
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            q: Optional[str] = params.strip()[2:] if params.strip().startswith("q=") else None
+            try:
+                return q is None or float(q) > 0
+            except ValueError:
+                return False
+    return False
+
+
+def _iter_file(path: str, start: int, length: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(_CHUNK, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
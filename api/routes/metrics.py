@@ -0,0 +1,26 @@
+# api/routes/metrics.py
+from fastapi import APIRouter
+from app.core.artifact_store import artifact_store
+from app.core.http_pool import http_pool
+from app.core.metrics import load_exported_stats
+from app.tools.pdf_artifacts import pdf_artifacts
+from app.tools.pdf_render_service import pdf_render_service
+
+router = APIRouter()
+
+@router.get("/metrics")
+def get_metrics():
+    """
+    汇总性能指标：
+      - workers: 各 Worker 进程导出到 Redis 的统计快照
+      - api: 当前 API 进程本地的统计
+    """
+    return {
+        "workers": load_exported_stats(),
+        "api": {
+            "http_pool": http_pool.stats(),
+            "artifact_store": artifact_store.snapshot(),
+            "pdf_artifacts": pdf_artifacts.snapshot(),
+            "pdf_render": pdf_render_service.snapshot(),
+        },
+    }
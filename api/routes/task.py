@@ -1,6 +1,8 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Header
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from uuid import uuid4
+import time
 from typing import Optional, Dict, List
 import json
 
@@ -8,6 +10,7 @@ from app.core.event_bus import bus, Topic
 from app.models.protocol import TaskPayload
 from app.core.db import db
 from app.core.state_manager import state_manager
+from app.core.report_stream import report_stream
 
 router = APIRouter()
 
@@ -29,7 +32,7 @@ async def create_task(req: TaskRequest):
         task_id=task_id,
         topic=req.topic,
         step="init",
-        params={"depth": req.depth}
+        params={"depth": req.depth, "submitted_at": time.time()}  # submitted_at 用于计算首内容时间（TTFC）
     )
     
     # 2. 初始化 MongoDB 记录（确保前端能及时查到状态）
@@ -59,4 +62,19 @@ async def get_task_status(task_id: str):
     return {
         "info": task,
         "timeline": steps
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/task/{task_id}/report/stream")
+def stream_report(task_id: str, last_event_id: Optional[str] = Header(default=None)):
+    """
+    SSE：按节推送报告（event: section），结束时推送 event: end。
+    断线重连时浏览器自动带上 Last-Event-ID，从断点继续；任务完成后再连接会从头重放全部分节。
+    """
+    if not db.tasks.find_one({"task_id": task_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Task not found")
+    return StreamingResponse(
+        report_stream.iter_sse(task_id, last_event_id or "0"),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
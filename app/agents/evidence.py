@@ -0,0 +1,99 @@
+# app/agents/evidence.py
+"""
+基于嵌入的证据合并：把所有候选事实句一次性批量嵌入，按余弦相似度阈值聚类，
+换了说法的 PubMed 句子与 arXiv 句子也能被识别为同一条证据。
+
+相似度用分块矩阵乘法计算（每块 EVIDENCE_BLOCK_SIZE 行 × 其后所有列，只算上三角），
+内存占用为 O(块大小 × 句子数)；超过阈值且数值一致的句子对用并查集合并。
+结果与 fact_enricher.extract_key_facts 的格式一致，直接交给 classify_facts 分到结论区 / 待核实区。
+"""
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.agents.fact_clustering import UnionFind, numbers
+from app.agents.fact_enricher import extract_key_facts, split_facts
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.tools.embedding_service import embedder
+
+logger = get_logger(__name__)
+
+
+def similarity_clusters(vectors: np.ndarray, threshold: float, block: int = 1024,
+                        keys: Optional[Sequence[Any]] = None) -> List[List[int]]:
+    """
+    按余弦相似度 ≥ threshold 做单链接聚类，返回每个簇的行下标列表（按首次出现排序）。
+    keys: 可选的硬性校验，只有 keys[i] == keys[j] 的两行才会合并
+    """
+    n = len(vectors)
+    if n == 0:
+        return []
+    v = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(v, axis=1, keepdims=True)
+    v = v / np.maximum(norms, 1e-12)
+
+    uf = UnionFind(n)
+    for start in range(0, n, block):
+        sims = v[start:start + block] @ v[start:].T  # (块行数, n - start)
+        rows, cols = np.nonzero(sims >= threshold)
+        rows += start
+        cols += start
+        upper = cols > rows
+        for r, c in zip(rows[upper].tolist(), cols[upper].tolist()):
+            if keys is not None and keys[r] != keys[c]:
+                continue
+            uf.union(r, c)
+
+    clusters: Dict[int, List[int]] = {}
+    for i in range(n):
+        clusters.setdefault(uf.find(i), []).append(i)
+    return list(clusters.values())
+
+
+def consolidate_evidence(rag_results: List[Dict[str, Any]], threshold: float = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    返回 {代表句: 支持该事实的片段列表}（与 extract_key_facts 相同）。
+    相同的句子只嵌入一次；嵌入失败或 EVIDENCE_MODE=minhash 时退回 MinHash/LSH 聚类。
+    """
+    if settings.evidence_mode != "embedding":
+        return extract_key_facts(rag_results)
+    threshold = settings.evidence_similarity if threshold is None else threshold
+
+    sentences: List[str] = []
+    owners: List[List[Dict[str, Any]]] = []
+    index: Dict[str, int] = {}
+    for item in rag_results:
+        content = item.get("content", "")
+        if not content:
+            continue
+        for s in split_facts(content):
+            key = " ".join(s.lower().split())
+            if key not in index:
+                index[key] = len(sentences)
+                sentences.append(s)
+                owners.append([])
+            if all(item is not o for o in owners[index[key]]):
+                owners[index[key]].append(item)
+    if not sentences:
+        return {}
+
+    try:
+        vectors = embedder.embed(sentences)
+    except Exception as e:
+        logger.warning(f"事实句嵌入失败，改用 MinHash 聚类: {e}")
+        return extract_key_facts(rag_results)
+
+    fact_map = {}
+    nums = [numbers(s) for s in sentences]
+    for members in similarity_clusters(vectors, threshold, settings.evidence_block_size, keys=nums):
+        # 代表句：支持片段最多的说法（并列时取最先出现的）
+        fact = sentences[max(members, key=lambda i: (len(owners[i]), -i))]
+        support, seen = [], set()
+        for i in members:
+            for item in owners[i]:
+                if id(item) not in seen:
+                    seen.add(id(item))
+                    support.append(item)
+        fact_map[fact] = support
+    return fact_map
@@ -0,0 +1,150 @@
+# app/agents/fact_clustering.py
+"""
+近重复事实聚类：MinHash 签名 + LSH 分桶，时间复杂度约为句子数的线性。
+
+不同来源对同一事实的表述往往只差大小写、标点、个别词（"U-Net achieves a Dice of 0.91 on Kvasir"
+vs "the U-Net achieved Dice 0.91 on the Kvasir dataset"），按完整句子字符串分组几乎找不到交集。
+这里把每个句子切成词级 shingle，计算 MinHash 签名；签名按 band 分桶，同桶且估计 Jaccard
+相似度达到阈值、且数值一致的句子用并查集合并成一个簇（"Dice 0.91" 与 "Dice 0.85" 是两个事实）。
+"""
+import re
+import zlib
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.tools.chunking import tokenize
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+def _terms(sentence: str) -> List[str]:
+    return [t.lower() for t in tokenize(sentence) if t[0].isalnum()]
+
+
+def numbers(sentence: str) -> frozenset:
+    """句子中出现的数值（0.91、3、2021…），作为合并前的硬性校验"""
+    return frozenset(_NUMBER.findall(sentence))
+
+
+def shingles(sentence: str, k: int) -> List[int]:
+    """词级 k-shingle（中文逐字），用 crc32 映射成 32 位整数；不足 k 个词时整句作为一个 shingle"""
+    terms = _terms(sentence)
+    if not terms:
+        return []
+    if len(terms) <= k:
+        grams = [" ".join(terms)]
+    else:
+        grams = [" ".join(terms[i:i + k]) for i in range(len(terms) - k + 1)]
+    return sorted({zlib.crc32(g.encode("utf-8")) for g in grams})
+
+
+class MinHasher:
+    """固定随机种子的 MinHash：h_i(x) = ((a_i * x + b_i) mod p) & 0xffffffff"""
+
+    def __init__(self, num_perm: int, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = rng.randint(1, 1 << 61, size=num_perm, dtype=np.uint64)[:, None]
+        self.b = rng.randint(0, 1 << 61, size=num_perm, dtype=np.uint64)[:, None]
+
+    def signatures(self, shingle_sets: Sequence[List[int]], block: int = 65536) -> np.ndarray:
+        """
+        批量计算签名，返回 (句子数, num_perm) 的 uint32 矩阵。
+        所有 shingle 拼成一个数组，按块做向量化哈希，再用 minimum.reduceat 按句子取最小值。
+        """
+        n = len(shingle_sets)
+        sigs = np.full((n, self.num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+        lengths = np.fromiter((len(s) for s in shingle_sets), dtype=np.int64, count=n)
+        nonempty = np.flatnonzero(lengths)
+        if len(nonempty) == 0:
+            return sigs
+        flat = np.fromiter((h for s in shingle_sets for h in s), dtype=np.uint64, count=int(lengths.sum()))
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+        # 按句子分块，每块的 shingle 总数约为 block，控制 (num_perm × block) 中间矩阵的内存
+        i = 0
+        while i < len(nonempty):
+            j = i
+            total = 0
+            while j < len(nonempty) and (total == 0 or total + lengths[nonempty[j]] <= block):
+                total += lengths[nonempty[j]]
+                j += 1
+            rows = nonempty[i:j]
+            lo, hi = starts[rows[0]], starts[rows[-1]] + lengths[rows[-1]]
+            with np.errstate(over="ignore"):
+                hashed = ((self.a * flat[lo:hi][None, :] + self.b) % _MERSENNE) & _MAX_HASH
+            sigs[rows] = np.minimum.reduceat(hashed, starts[rows] - lo, axis=1).T.astype(np.uint32)
+            i = j
+        return sigs
+
+
+class UnionFind:
+    """并查集（路径减半；合并时保留较小的下标作为根，簇按首次出现的顺序排列）"""
+
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, x: int, y: int):
+        rx, ry = self.find(x), self.find(y)
+        if rx != ry:
+            self.parent[max(rx, ry)] = min(rx, ry)
+
+
+def cluster_sentences(sentences: Sequence[str], threshold: float = None, num_perm: int = None,
+                      bands: int = None, shingle_size: int = None) -> List[List[int]]:
+    """
+    把近重复句子聚成簇，返回每个簇的句子下标列表（簇按首个句子出现的顺序排列）。
+    threshold: 估计 Jaccard 相似度下限（签名一致位的比例）
+    bands: LSH band 数，num_perm 必须能被整除；每个 band 行数 r = num_perm / bands，
+           两个句子成为候选的概率 ≈ 1 - (1 - s^r)^bands
+    同一个桶只和桶内第一个句子比较（而不是两两比较），保证线性；传递性由并查集补齐。
+    句子中的数值集合必须完全相同才会合并，避免只差一个数值的不同结论被聚到一起。
+    """
+    threshold = settings.fact_cluster_threshold if threshold is None else threshold
+    num_perm = num_perm or settings.fact_minhash_perm
+    bands = bands or settings.fact_lsh_bands
+    shingle_size = shingle_size or settings.fact_shingle_size
+    if num_perm % bands:
+        raise ValueError(f"num_perm={num_perm} 不能被 bands={bands} 整除")
+    n = len(sentences)
+    if n == 0:
+        return []
+
+    sets = [shingles(s, shingle_size) for s in sentences]
+    nums = [numbers(s) for s in sentences]
+    sigs = MinHasher(num_perm).signatures(sets)
+    rows = num_perm // bands
+    uf = UnionFind(n)
+
+    # 完全相同的 shingle 集合（大小写 / 标点差异）直接合并
+    exact: Dict[tuple, int] = {}
+    for i, s in enumerate(sets):
+        if s:
+            uf.union(i, exact.setdefault((tuple(s), nums[i]), i))
+
+    for band in range(bands):
+        buckets: Dict[bytes, int] = {}
+        band_sigs = np.ascontiguousarray(sigs[:, band * rows:(band + 1) * rows])
+        for i in range(n):
+            if not sets[i]:
+                continue
+            head = buckets.setdefault(band_sigs[i].tobytes(), i)
+            if head != i and nums[head] == nums[i] and uf.find(head) != uf.find(i):
+                if np.count_nonzero(sigs[head] == sigs[i]) >= threshold * num_perm:
+                    uf.union(head, i)
+
+    clusters: Dict[int, List[int]] = {}
+    for i in range(n):
+        clusters.setdefault(uf.find(i), []).append(i)
+    return list(clusters.values())
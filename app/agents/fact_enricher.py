@@ -1,54 +1,72 @@
 # app/agents/fact_enricher.py
 import re
+from collections import Counter
 from typing import List, Dict, Any
 
+from app.agents.fact_clustering import cluster_sentences
+
+def split_facts(content: str) -> List[str]:
+    """按 . 。 ! ? 拆句并去掉过短的片段"""
+    # === 修复：使用正则同时支持中文句号(。)和英文句号(.) ===
+    # 解释：按 . 或 。 或 ! ? 分割，并去除空白
+    # 英文句号后通常有空格，所以 split(". ") 也是一种简单策略，这里用正则更稳
+    # 小数点（0.91、3.5 mm）两侧都是数字，不作为句子边界
+    sentences = re.split(r'(?<!\d)\.|\.(?!\d)|[。!！?？]', content)
+
+    # 清洗
+    return [s.strip() for s in sentences if len(s.strip()) > 10] # 长度阈值稍微调高到10，过滤无意义短语
+
+
 def extract_key_facts(rag_results: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
     """
-    把每条检索到的 RAG 片段的文本按句子拆开。
+    把每条检索到的 RAG 片段的文本按句子拆开，近重复的句子（MinHash/LSH 聚类）归为同一个事实。
+    返回 {代表句: 支持该事实的片段列表}；代表句取簇内出现次数最多的说法（并列时取最先出现的）。
     """
-    fact_map = {}
-
+    sentences: List[str] = []
+    owners: List[Dict[str, Any]] = []
     for item in rag_results:
         content = item.get("content", "")
         if not content:
             continue
-            
-        # === 修复：使用正则同时支持中文句号(。)和英文句号(.) ===
-        # 解释：按 . 或 。 或 ! ? 分割，并去除空白
-        # 英文句号后通常有空格，所以 split(". ") 也是一种简单策略，这里用正则更稳
-        sentences = re.split(r'[.。!！?？]', content)
-        
-        # 清洗
-        clean_sentences = [s.strip() for s in sentences if len(s.strip()) > 10] # 长度阈值稍微调高到10，过滤无意义短语
-        # ====================================================
+        for s in split_facts(content):
+            sentences.append(s)
+            owners.append(item)
+
+    fact_map = {}
+    for members in cluster_sentences(sentences):
+        counts = Counter(sentences[i] for i in members)
+        fact = max(counts, key=counts.get)
+        support, seen = [], set()
+        for i in members:
+            if id(owners[i]) not in seen:  # 同一片段里的多个近重复句子只算一次
+                seen.add(id(owners[i]))
+                support.append(owners[i])
+        fact_map[fact] = support  # 完全相同的句子必在同一簇，代表句不会重复
 
-        for s in clean_sentences:
-            if s not in fact_map: 
-                fact_map[s] = []
-            fact_map[s].append(item)
-            
     return fact_map
 
 def classify_facts(fact_map: Dict[str, List[Dict[str, Any]]]):
     """
-    v1 一致性策略：
+    v1 一致性策略（按事实簇统计）：
       - >=2 个不同来源 source 支持 → 结论区
       - 否则 → 待核实区
+    每项带 sources（去重后的来源列表）
     """
     conclusion = []
     to_verify = []
 
     for fact, items in fact_map.items():
-        # 统计来源数量
-        sources = {item["metadata"].get("source", "unknown") for item in items}
+        # 统计不同来源的数量（同一来源的多个片段只算一个）
+        sources = sorted({(item.get("metadata") or {}).get("source", "unknown") for item in items})
+        entry = {"fact": fact, "support": items, "sources": sources}
 
         if len(sources) >= 2:
-            conclusion.append({"fact": fact, "support": items})
+            conclusion.append(entry)
         else:
-            to_verify.append({"fact": fact, "support": items})
+            to_verify.append(entry)
     
     # 按来源数降序排序，让证据多的排前面
-    conclusion.sort(key=lambda x: len(x["support"]), reverse=True)
+    conclusion.sort(key=lambda x: (len(x["sources"]), len(x["support"])), reverse=True)
     to_verify.sort(key=lambda x: len(x["support"]), reverse=True)
 
     return conclusion, to_verify
@@ -10,27 +10,21 @@ from app.tools.github_client import ingest_github
 from app.tools.trials_client import ingest_trials
 from app.core.async_utils import with_retry
 from app.core.config import settings
+from app.core.http_pool import http_pool
 
 logger = get_logger(__name__)
 
-async def ingest_trials_safe(topic: str):
-    """
-    trials.gov 必须同步调用 → 用 asyncio.to_thread 包一下
-    """
-    return await asyncio.to_thread(ingest_trials, topic)
-
 async def ingest_all_sources(topic: str):
     """
-    PubMed / arXiv / GitHub 并发
-    Trials.gov 单独顺序执行
+    PubMed / arXiv / GitHub / Trials.gov 全部并发
     """
     tasks = [
         with_retry(ingest_pubmed, topic),
         with_retry(ingest_arxiv, topic),
         with_retry(ingest_github, topic),
+        with_retry(ingest_trials, topic),
     ]
-    pubmed, arxiv, github = await asyncio.gather(*tasks)
-    trials = await ingest_trials_safe(topic)
+    pubmed, arxiv, github, trials = await asyncio.gather(*tasks)
 
     return pubmed, arxiv, github, trials
 
@@ -39,7 +33,10 @@ async def run_pipeline(topic: str):
     logger.info(f"开始最小流水线执行（MVP）：{topic}")
 
     # 并发获取数据
-    pubmed, arxiv, github, trials = await ingest_all_sources(topic)
+    try:
+        pubmed, arxiv, github, trials = await ingest_all_sources(topic)
+    finally:
+        await http_pool.aclose()
     logger.info("ingest_all_sources 执行完成")
 
     return {
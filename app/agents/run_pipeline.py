@@ -9,6 +9,7 @@ from app.tools.rag_query import query_rag
 from app.agents.writer import generate_markdown_report
 from app.tools.pdf_exporter import save_markdown_as_pdf  # 确保这里用的是新写的带 weasyprint 的版本
 from app.core.metrics import tracker
+from app.core.http_pool import http_pool
 
 async def run_pipeline(topic: str):
     # 生成一个任务 ID
@@ -39,8 +40,7 @@ async def run_pipeline(topic: str):
         # 4. ClinicalTrials
         print(f"=== [4] 拉取 ClinicalTrials ===")
         with tracker.track("trials"):
-            # 如果 trials 还是同步函数，直接调；如果是 async 就加 await
-            ingest_trials(topic)
+            await ingest_trials(topic)
 
         # 5. RAG Query
         print(f"=== [5] 查询 RAG ===")
@@ -68,6 +68,9 @@ async def run_pipeline(topic: str):
     finally:
         # 无论成功失败，最后打印指标表
         tracker.report()
+        print(f"🔌 HTTP 连接池: {http_pool.stats()}")
+        # asyncio.run 结束时会关闭 loop，先释放绑定在该 loop 上的连接
+        await http_pool.aclose()
 
     return report
 
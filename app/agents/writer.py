@@ -1,9 +1,9 @@
 # app/agents/writer.py
 from app.agents.fact_enricher import (
-    extract_key_facts,
     classify_facts,
     enrich_with_trials,
 )
+from app.agents.evidence import consolidate_evidence
 
 
 def generate_markdown_report(topic: str, rag_bundle):
@@ -11,6 +11,40 @@ def generate_markdown_report(topic: str, rag_bundle):
     综合 writer：生成结构化医学技术报告（Markdown）
     rag_bundle: 可以是 (trial_chunks, other_chunks) 元组，也可以是混合的 list
     """
+    return "\n".join(md for _, md in iter_report_sections(topic, rag_bundle))
+
+
+def report_header(topic: str) -> str:
+    """报告开头一节（标题 / 摘要 / 对比要点）；整篇报告只有这一节含主题文字"""
+    md = []
+    # 标题
+    md.append(f"# 医学技术自动化报告：{topic}\n")
+
+    # 摘要（Summary）
+    md.append("## 摘要\n")
+    md.append(
+        f"本报告通过 PubMed、arXiv、GitHub 以及 ClinicalTrials.gov 等多个公开数据源，"
+        f"自动收集与分析了 **{topic}** 相关的研究证据、技术趋势及结构化试验结果，"
+        f"并对多来源证据进行一致性比对，以提升医学证据的可解释性。\n"
+    )
+
+    # 对比要点（Highlights）
+    md.append("\n## 对比要点（Highlights）\n")
+    md.append(
+        "- **PubMed**：医学文献数量与研究热点趋势\n"
+        "- **arXiv**：最新前沿研究方向\n"
+        "- **GitHub**：技术实现成熟度、代码活跃度\n"
+        "- **ClinicalTrials**：真实世界结构化临床试验证据\n"
+    )
+    return "\n".join(md)
+
+
+def iter_report_sections(topic: str, rag_bundle):
+    """
+    分节生成报告：每一节准备好就 yield (节名, Markdown)，调用方可以边生成边推送。
+    节名依次为 header / trials / rag_summary / facts / appendix / references（trials 无数据时跳过）；
+    各节用换行拼接即为完整报告，与 generate_markdown_report 的输出一致。
+    """
 
     # ============================================================
     # 1. 智能数据解包与分类（修复的核心逻辑）
@@ -46,34 +80,15 @@ def generate_markdown_report(topic: str, rag_bundle):
     
     # ============================================================
 
-    md = []
-    # 标题
-    md.append(f"# 医学技术自动化报告：{topic}\n")
-
-    # 摘要（Summary）
-    md.append("## 摘要\n")
-    md.append(
-        f"本报告通过 PubMed、arXiv、GitHub 以及 ClinicalTrials.gov 等多个公开数据源，"
-        f"自动收集与分析了 **{topic}** 相关的研究证据、技术趋势及结构化试验结果，"
-        f"并对多来源证据进行一致性比对，以提升医学证据的可解释性。\n"
-    )
-
-    # 对比要点（Highlights）
-    md.append("\n## 对比要点（Highlights）\n")
-    md.append(
-        "- **PubMed**：医学文献数量与研究热点趋势\n"
-        "- **arXiv**：最新前沿研究方向\n"
-        "- **GitHub**：技术实现成熟度、代码活跃度\n"
-        "- **ClinicalTrials**：真实世界结构化临床试验证据\n"
-    )
+    yield "header", report_header(topic)
 
     # ClinicalTrials 结构化增强（Trial Enrich）
     trial_section = enrich_with_trials(trial_chunks)
     if trial_section:
-        md.append("\n## 临床试验概览（ClinicalTrials）\n")
-        md.append(trial_section)
+        yield "trials", "\n".join(["\n## 临床试验概览（ClinicalTrials）\n", trial_section])
 
     # RAG 检索主要结果摘要
+    md = []
     md.append("\n## 文献/技术检索要点（RAG Summary）\n")
 
     if not other_chunks:
@@ -85,11 +100,14 @@ def generate_markdown_report(topic: str, rag_bundle):
             content = c.get("content", "")[:180].replace("\n", " ")
             md.append(f"- **{source}**: {content}...\n")
 
+    yield "rag_summary", "\n".join(md)
+
     # 事实抽取 + 多来源一致性（Fact Enricher）
-    # 合并列表进行事实提取
+    # 合并列表进行事实提取；换了说法的同一事实按嵌入相似度合并（app/agents/evidence.py）
     all_chunks = trial_chunks + other_chunks
     if all_chunks:
-        fact_map = extract_key_facts(all_chunks)
+        md = []
+        fact_map = consolidate_evidence(all_chunks)
         conclusion, to_verify = classify_facts(fact_map)
 
         md.append("\n## 结论区（多来源一致的事实）\n")
@@ -97,16 +115,19 @@ def generate_markdown_report(topic: str, rag_bundle):
             md.append("暂无一致结论。\n")
         else:
             for item in conclusion:
-                md.append(f"- {item['fact']} （来源数：{len(item['support'])}）\n")
+                md.append(f"- {item['fact']} （来源数：{len(item['sources'])}，片段数：{len(item['support'])}）\n")
 
         md.append("\n## 待核实区（证据不足）\n")
         if not to_verify:
             md.append("暂无。\n")
         else:
             for item in to_verify:
-                md.append(f"- {item['fact']} （来源数：{len(item['support'])}）\n")
+                md.append(f"- {item['fact']} （来源数：{len(item['sources'])}，片段数：{len(item['support'])}）\n")
+
+        yield "facts", "\n".join(md)
 
     # 附录：ClinicalTrials 明细列表
+    md = []
     md.append("\n## 附录：ClinicalTrials 试验列表\n")
     if not trial_chunks:
         md.append("暂无临床试验记录。\n")
@@ -118,7 +139,10 @@ def generate_markdown_report(topic: str, rag_bundle):
                 f"（状态：{meta.get('trial_status', '未知')}，地点：{meta.get('location', '未知')}）\n"
             )
 
+    yield "appendix", "\n".join(md)
+
     # 引用（References）
+    md = []
     md.append("\n## 引用（References）\n")
     for i, item in enumerate(all_chunks, start=1):
         meta = item.get("metadata", {})
@@ -126,5 +150,4 @@ def generate_markdown_report(topic: str, rag_bundle):
         source = meta.get("source", "unknown")
         md.append(f"[{i}] **{source}** → {url}\n")
 
-    # 输出 Markdown 字符串
-    return "\n".join(md)
\ No newline at end of file
+    yield "references", "\n".join(md)
\ No newline at end of file
@@ -0,0 +1,180 @@
+# app/core/artifact_store.py
+import gzip
+import hashlib
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.core.cache import _MISS, LocalLRU
+from app.core.config import settings
+from app.core.db import db
+from app.core.logger import get_logger
+from app.models.artifact import Artifact
+from app.models.enums import ArtifactType
+
+logger = get_logger("ArtifactStore")
+
+# 这些类型另存一份 gzip 预压缩版本，下载时直接发送，不必每次在线压缩
+_COMPRESSIBLE = ("text/", "application/json")
+
+
+def _is_compressible(mime: str) -> bool:
+    return mime.startswith(_COMPRESSIBLE)
+
+
+class ArtifactStore:
+    """
+    内容寻址的产物存储：
+      - 文件按内容 sha256 存放在 objects/{sha[:2]}/{sha}，相同内容只存一份，写入后不再修改；
+      - 文本类产物（Markdown）同时保存 {sha}.gz 预压缩版本；
+      - MongoDB artifacts 集合是索引：每个 (task_id, type) 一条 Artifact，uri 指向对象文件，
+        meta 记录 sha256 / size / gz_size / source_sha256（如 PDF 对应的 Markdown hash）；
+      - 索引查询结果在进程内缓存，重复请求（ETag 校验 → 304）既不查库也不读盘。
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._index_cache = LocalLRU(settings.artifact_index_cache_size)
+        self._indexed = False
+        self._lock = threading.Lock()
+        self.stats = {"puts": 0, "dedup_hits": 0, "bytes_written": 0, "index_hits": 0, "index_misses": 0,
+                      "served_200": 0, "served_206": 0, "served_304": 0, "served_416": 0,
+                      "served_gzip": 0, "bytes_served": 0}
+
+    # ------------------------------------------------------------
+    # 对象文件
+    # ------------------------------------------------------------
+    def object_path(self, sha256: str) -> str:
+        return os.path.join(self.root, "objects", sha256[:2], sha256)
+
+    def gzip_path(self, sha256: str) -> str:
+        return self.object_path(sha256) + ".gz"
+
+    def put_bytes(self, data: bytes, mime: str) -> Dict[str, Any]:
+        """写入对象（已存在则跳过），返回 {sha256, size, gz_size}"""
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self.object_path(sha256)
+        if os.path.exists(path):
+            self.stats["dedup_hits"] += 1
+        else:
+            self._write_atomic(path, data)
+        return self._finish_put(sha256, len(data), mime, data)
+
+    def put_file(self, src_path: str, mime: str) -> Dict[str, Any]:
+        """把已生成的文件（如渲染好的 PDF）移入存储，源文件被移走或删除"""
+        h = hashlib.sha256()
+        with open(src_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        sha256 = h.hexdigest()
+        size = os.path.getsize(src_path)
+        path = self.object_path(sha256)
+        if os.path.exists(path):
+            self.stats["dedup_hits"] += 1
+            os.remove(src_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(src_path, path)
+            self.stats["bytes_written"] += size
+        return self._finish_put(sha256, size, mime)
+
+    def _finish_put(self, sha256: str, size: int, mime: str, data: Optional[bytes] = None) -> Dict[str, Any]:
+        self.stats["puts"] += 1
+        info = {"sha256": sha256, "size": size, "gz_size": None}
+        if _is_compressible(mime):
+            gz = self.gzip_path(sha256)
+            if not os.path.exists(gz):
+                if data is None:
+                    with open(self.object_path(sha256), "rb") as f:
+                        data = f.read()
+                # mtime=0：相同内容得到逐字节相同的压缩文件
+                self._write_atomic(gz, gzip.compress(data, compresslevel=settings.artifact_gzip_level, mtime=0))
+            info["gz_size"] = os.path.getsize(gz)
+        return info
+
+    def _write_atomic(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self.stats["bytes_written"] += len(data)
+
+    # ------------------------------------------------------------
+    # 索引（MongoDB artifacts）
+    # ------------------------------------------------------------
+    def _ensure_indexes(self):
+        if self._indexed:
+            return
+        with self._lock:
+            if not self._indexed:
+                db.artifacts.create_index([("task_id", 1), ("type", 1)], unique=True)
+                db.artifacts.create_index([("type", 1), ("meta.source_sha256", 1)])
+                self._indexed = True
+
+    def register(self, task_id: str, type: ArtifactType, mime: str, info: Dict[str, Any],
+                 meta: Optional[Dict[str, Any]] = None) -> Artifact:
+        """登记 (task_id, type) 对应的对象；同一任务同一类型重复登记时覆盖"""
+        self._ensure_indexes()
+        artifact = Artifact(
+            artifact_id=f"{task_id}:{type.value.lower()}",
+            task_id=task_id,
+            type=type,
+            mime=mime,
+            uri=self.object_path(info["sha256"]),
+            meta={**(meta or {}), **info, "created_at": datetime.utcnow().isoformat()},
+        )
+        db.artifacts.update_one(
+            {"task_id": task_id, "type": type.value},
+            {"$set": artifact.model_dump(mode="json")},
+            upsert=True,
+        )
+        self._index_cache.set(self._key(task_id, type), artifact, settings.artifact_index_cache_ttl_s)
+        return artifact
+
+    def save(self, task_id: str, type: ArtifactType, data: bytes, mime: str,
+             meta: Optional[Dict[str, Any]] = None) -> Artifact:
+        return self.register(task_id, type, mime, self.put_bytes(data, mime), meta)
+
+    def get(self, task_id: str, type: ArtifactType) -> Optional[Artifact]:
+        key = self._key(task_id, type)
+        cached = self._index_cache.get(key)
+        if cached is not _MISS:
+            self.stats["index_hits"] += 1
+            return cached
+        self.stats["index_misses"] += 1
+        doc = db.artifacts.find_one({"task_id": task_id, "type": type.value}, {"_id": 0})
+        artifact = Artifact(**doc) if doc else None
+        if artifact is not None:
+            self._index_cache.set(key, artifact, settings.artifact_index_cache_ttl_s)
+        return artifact
+
+    def find_by_source(self, type: ArtifactType, source_sha256: str) -> Optional[Artifact]:
+        """按来源内容 hash 找已有产物（如同一份 Markdown 渲染过的 PDF），对象文件仍在才返回"""
+        self._ensure_indexes()
+        doc = db.artifacts.find_one({"type": type.value, "meta.source_sha256": source_sha256}, {"_id": 0})
+        if doc and os.path.exists(self.object_path(doc["meta"]["sha256"])):
+            return Artifact(**doc)
+        return None
+
+    def read_text(self, artifact: Artifact) -> str:
+        with open(self.object_path(artifact.meta["sha256"]), "r", encoding="utf-8") as f:
+            return f.read()
+
+    def record_served(self, status: int, nbytes: int = 0, gzipped: bool = False):
+        self.stats[f"served_{status}"] = self.stats.get(f"served_{status}", 0) + 1
+        self.stats["bytes_served"] += nbytes
+        if gzipped:
+            self.stats["served_gzip"] += 1
+
+    @staticmethod
+    def _key(task_id: str, type: ArtifactType) -> str:
+        return f"{task_id}:{type.value}"
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "index_cached": len(self._index_cache)}
+
+
+# 全局单例
+artifact_store = ArtifactStore(settings.artifact_store_dir)
@@ -1,5 +1,6 @@
 # app/core/base_worker.py
 import json
+import threading
 import traceback
 from abc import ABC, abstractmethod
 from app.core.event_bus import bus, Topic
@@ -22,13 +23,23 @@ class BaseWorker(ABC):
 
         # === 初始化Logger ===
         self.logger = get_logger(self.__class__.__name__)
+        # === 停止信号（由 system_runner 在退出时设置）===
+        self._stop_event = threading.Event()
         # === 创建消费者组 ===
         bus.create_group(listen_topic, group_name)
 
+    def stop(self):
+        """请求停止：主循环会在当前 consume 阻塞结束后退出"""
+        self._stop_event.set()
+
+    def on_shutdown(self):
+        """关闭钩子：子类可覆盖以释放连接池、事件循环等资源"""
+        pass
+
     def run(self):
         # print(f"👷 [{self.__class__.__name__}] Listening on {self.listen_topic.value} (DB-Backed)...")
         self.logger.info(f"Listening on {self.listen_topic.value} (DB-Backed)...")
-        while True:
+        while not self._stop_event.is_set():
             try:
                 # 阻塞读取消息
                 messages = bus.consume(self.listen_topic, self.group_name, self.worker_name, count=1, block=5000)
@@ -89,6 +100,13 @@ class BaseWorker(ABC):
                 # 捕获 consume 本身的错误（如 Redis 断连）
                 worker_error_handler.analyze(outer_e, component="BaseWorkerLoop")
 
+        # === 退出前执行关闭钩子 ===
+        try:
+            self.on_shutdown()
+        except Exception as e:
+            self.logger.warning(f"关闭钩子执行失败: {e}")
+        self.logger.info("Worker 已停止")
+
     @abstractmethod
     def process(self, payload: TaskPayload) -> TaskPayload:
         """业务逻辑，返回传递给下一个 Agent 的 Payload"""
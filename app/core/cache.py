@@ -1,39 +1,460 @@
+import asyncio
+import inspect
 import json
 import hashlib
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
 from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+from app.core.config import settings
 from app.core.event_bus import bus  # 复用 redis 连接
 from app.core.logger import get_logger
 
+try:
+    import msgpack  # 可选：比 JSON 更紧凑、解码更快
+except ImportError:
+    msgpack = None
+
 logger = get_logger("Cache")
 
-def cache_result(ttl_seconds=3600, key_prefix="cache"):
+# 只有持锁者才能删除锁（防止锁超时后误删别人的锁）
+_UNLOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_MISS = object()
+
+
+# ============================================================
+# 编解码：1 字节格式 + 1 字节压缩标记 + 数据
+# ============================================================
+def encode_value(value: Any) -> bytes:
+    fmt, data = b"J", None
+    if msgpack is not None and settings.cache_codec == "msgpack":
+        try:
+            data, fmt = msgpack.packb(value, use_bin_type=True), b"M"
+        except (TypeError, ValueError):
+            data = None  # datetime 等 msgpack 不支持的类型退回 JSON
+    if data is None:
+        data, fmt = json.dumps(value, default=str).encode("utf-8"), b"J"
+    if len(data) >= settings.cache_compress_min_bytes:
+        return fmt + b"z" + zlib.compress(data, 6)
+    return fmt + b"-" + data
+
+
+def decode_value(raw: bytes) -> Any:
+    fmt, flag, data = raw[:1], raw[1:2], raw[2:]
+    if fmt not in (b"J", b"M") or flag not in (b"z", b"-"):
+        return json.loads(raw)  # 旧版缓存：纯 JSON 字符串
+    if flag == b"z":
+        data = zlib.decompress(data)
+    if fmt == b"M":
+        if msgpack is None:
+            raise ValueError("缓存值为 msgpack 格式，但未安装 msgpack")
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data)
+
+
+# ============================================================
+# 进程内 LRU + TTL
+# ============================================================
+class LocalLRU:
+    """进程内一级缓存：容量有界，条目按 TTL 过期。存的是解码后的对象，调用方应只读使用返回值。"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return _MISS
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return _MISS
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# ============================================================
+# 缓存引擎
+# ============================================================
+class CacheEngine:
     """
-    装饰器：缓存函数返回结果到 Redis
+    两级结果缓存：进程内 LRU/TTL → Redis。
+      - 读：先查本地，再查 Redis（命中后回填本地）；
+      - 防击穿（single-flight）：同一个 key 未命中时，进程内由线程锁 / in-flight Future 保证只算一次，
+        进程间用 Redis SET NX 锁保证只有一个进程执行，其余进程轮询等待结果；
+      - 值用 msgpack（未安装时 JSON）序列化，超过阈值 zlib 压缩；
+      - 按 key 前缀统计命中率与耗时。
+    Redis 不可用时退化为只用本地缓存，不影响业务函数执行。
     """
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            # 1. 生成 Cache Key
-            # 将 args 和 kwargs 序列化后做 hash
-            arg_str = json.dumps({"args": args, "kwargs": kwargs}, sort_keys=True, default=str) # 参数转为字符串
-            key_hash = hashlib.md5(arg_str.encode()).hexdigest() # 对序列化后的参数字符串进行 MD5 哈希计算，生成一个固定长度的摘要
-            cache_key = f"{key_prefix}:{func.__name__}:{key_hash}"#将用户定义的 key_prefix、函数名 func.__name__ 和参数哈希值 key_hash 组合，形成Redis Key
-
-            # 2. 尝试读取缓存
-            cached_val = bus.redis.get(cache_key)
-            if cached_val: # 如果缓存存在，直接返回反序列化结果
-                logger.info(f"⚡ [Cache] Hit: {func.__name__}")
-                return json.loads(cached_val)
-
-            # 3. 执行原函数
-            result = func(*args, **kwargs)
-
-            # 4. 写入缓存
+
+    def __init__(self):
+        self.local = LocalLRU(settings.cache_local_size)
+        self._key_locks: Dict[str, list] = {}
+        self._key_locks_guard = threading.Lock()
+        self._inflight: Dict[Tuple[asyncio.AbstractEventLoop, str], asyncio.Future] = {}
+        self._unlock_script = None
+        # 代际计数：name -> (generation, 读取时间)
+        self._generations: Dict[str, Tuple[int, float]] = {}
+        # 热点 key：name -> OrderedDict(base_key -> [命中次数, 计算函数, ttl, prefix])
+        self._hot: Dict[str, "OrderedDict[str, list]"] = defaultdict(OrderedDict)
+        self._hot_lock = threading.Lock()
+        self._rewarm_timers: Dict[str, threading.Timer] = {}
+        self.gen_stats = {"bumps": 0, "rewarm_runs": 0, "rewarmed": 0}
+        self._stats: Dict[str, Dict[str, float]] = defaultdict(lambda: {
+            "local_hits": 0, "redis_hits": 0, "misses": 0, "computes": 0, "waits": 0, "errors": 0,
+            "lookup_time_s": 0.0, "compute_time_s": 0.0,
+        })
+
+    @property
+    def redis(self):
+        return bus.redis_raw
+
+    # ------------------------------------------------------------
+    # 基础读写
+    # ------------------------------------------------------------
+    def get(self, key: str, prefix: str = "cache") -> Any:
+        """返回缓存值；未命中返回 _MISS"""
+        start = time.perf_counter()
+        stats = self._stats[prefix]
+        value = self.local.get(key)
+        if value is not _MISS:
+            stats["local_hits"] += 1
+            logger.info(f"⚡ [Cache] Hit (local): {key}")
+        else:
+            value = self._redis_get(key, prefix)
+            if value is not _MISS:
+                stats["redis_hits"] += 1
+                logger.info(f"⚡ [Cache] Hit (redis): {key}")
+        stats["lookup_time_s"] += time.perf_counter() - start
+        return value
+
+    def set(self, key: str, value: Any, ttl: float, prefix: str = "cache"):
+        self.local.set(key, value, min(ttl, settings.cache_local_ttl_s))
+        try:
+            self.redis.set(key, encode_value(value), ex=int(ttl))
+        except Exception as e:
+            self._stats[prefix]["errors"] += 1
+            logger.warning(f"缓存写入失败: {e}")
+
+    def delete(self, key: str):
+        self.local.delete(key)
+        try:
+            self.redis.delete(key)
+        except Exception as e:
+            logger.warning(f"缓存删除失败: {e}")
+
+    def _redis_get(self, key: str, prefix: str) -> Any:
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.get(key)
+            pipe.ttl(key)
+            raw, remaining = pipe.execute()
+            if raw is None:
+                return _MISS
+            value = decode_value(raw)
+        except Exception as e:
+            self._stats[prefix]["errors"] += 1
+            logger.warning(f"缓存读取失败: {e}")
+            return _MISS
+        # 回填本地，TTL 不超过 Redis 剩余时间
+        ttl = settings.cache_local_ttl_s if remaining is None or remaining < 0 else min(remaining, settings.cache_local_ttl_s)
+        if ttl > 0:
+            self.local.set(key, value, ttl)
+        return value
+
+    # ------------------------------------------------------------
+    # Redis 分布式锁
+    # ------------------------------------------------------------
+    def _try_lock(self, key: str) -> Optional[str]:
+        """抢到锁返回 token；没抢到返回 None；Redis 不可用返回空串（视为抢到，直接本地计算）"""
+        token = uuid.uuid4().hex
+        try:
+            ok = self.redis.set(f"lock:{key}", token, nx=True, px=int(settings.cache_lock_ttl_s * 1000))
+            return token if ok else None
+        except Exception:
+            return ""
+
+    def _unlock(self, key: str, token: str):
+        if not token:
+            return
+        try:
+            if self._unlock_script is None:
+                self._unlock_script = self.redis.register_script(_UNLOCK_LUA)
+            self._unlock_script(keys=[f"lock:{key}"], args=[token])
+        except Exception as e:
+            logger.warning(f"释放缓存锁失败: {e}")
+
+    # ------------------------------------------------------------
+    # 同步 single-flight
+    # ------------------------------------------------------------
+    @contextmanager
+    def _local_flight(self, key: str):
+        with self._key_locks_guard:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._key_locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._key_locks.pop(key, None)
+
+    def get_or_compute(self, key: str, fn: Callable[[], Any], ttl: float, prefix: str = "cache") -> Any:
+        value = self.get(key, prefix)
+        if value is not _MISS:
+            return value
+        with self._local_flight(key):
+            # 等锁期间同进程的其它线程可能已算完
+            value = self.get(key, prefix)
+            if value is not _MISS:
+                return value
+            self._stats[prefix]["misses"] += 1
+
+            deadline = time.monotonic() + settings.cache_lock_wait_s
+            delay = 0.05
+            while True:
+                token = self._try_lock(key)
+                if token is not None:
+                    try:
+                        return self._compute(key, fn, ttl, prefix)
+                    finally:
+                        self._unlock(key, token)
+                # 其它进程正在计算：轮询结果
+                self._stats[prefix]["waits"] += 1
+                time.sleep(delay)
+                delay = min(delay * 2, 0.5)
+                value = self._redis_get(key, prefix)
+                if value is not _MISS:
+                    return value
+                if time.monotonic() > deadline:
+                    logger.warning(f"等待缓存锁超时，直接计算: {key}")
+                    return self._compute(key, fn, ttl, prefix)
+
+    def _compute(self, key: str, fn: Callable[[], Any], ttl: float, prefix: str) -> Any:
+        start = time.perf_counter()
+        value = fn()
+        self._stats[prefix]["computes"] += 1
+        self._stats[prefix]["compute_time_s"] += time.perf_counter() - start
+        self.set(key, value, ttl, prefix)
+        return value
+
+    # ------------------------------------------------------------
+    # 异步 single-flight
+    # ------------------------------------------------------------
+    async def aget_or_compute(self, key: str, coro_fn: Callable[[], Any], ttl: float, prefix: str = "cache") -> Any:
+        value = self.local.get(key)
+        if value is not _MISS:
+            self._stats[prefix]["local_hits"] += 1
+            return value
+
+        loop = asyncio.get_running_loop()
+        flight = self._inflight.get((loop, key))
+        if flight is not None:
+            # 同一事件循环内已有协程在算这个 key
+            self._stats[prefix]["waits"] += 1
+            return await asyncio.shield(flight)
+        flight = loop.create_future()
+        self._inflight[(loop, key)] = flight
+        try:
+            value = await self._aresolve(key, coro_fn, ttl, prefix)
+            flight.set_result(value)
+            return value
+        except BaseException as e:
+            flight.set_exception(e)
+            flight.exception()  # 标记为已取出，没有等待者时不报 "exception was never retrieved"
+            raise
+        finally:
+            self._inflight.pop((loop, key), None)
+
+    async def _aresolve(self, key: str, coro_fn: Callable[[], Any], ttl: float, prefix: str) -> Any:
+        value = await asyncio.to_thread(self.get, key, prefix)
+        if value is not _MISS:
+            return value
+        self._stats[prefix]["misses"] += 1
+
+        deadline = time.monotonic() + settings.cache_lock_wait_s
+        delay = 0.05
+        while True:
+            token = await asyncio.to_thread(self._try_lock, key)
+            if token is not None:
+                try:
+                    return await self._acompute(key, coro_fn, ttl, prefix)
+                finally:
+                    await asyncio.to_thread(self._unlock, key, token)
+            self._stats[prefix]["waits"] += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+            value = await asyncio.to_thread(self._redis_get, key, prefix)
+            if value is not _MISS:
+                return value
+            if time.monotonic() > deadline:
+                logger.warning(f"等待缓存锁超时，直接计算: {key}")
+                return await self._acompute(key, coro_fn, ttl, prefix)
+
+    async def _acompute(self, key: str, coro_fn: Callable[[], Any], ttl: float, prefix: str) -> Any:
+        start = time.perf_counter()
+        value = await coro_fn()
+        self._stats[prefix]["computes"] += 1
+        self._stats[prefix]["compute_time_s"] += time.perf_counter() - start
+        await asyncio.to_thread(self.set, key, value, ttl, prefix)
+        return value
+
+    # ------------------------------------------------------------
+    # 代际失效：数据更新时计数 +1，缓存 key 带上代际号，旧结果自然失效
+    # ------------------------------------------------------------
+    def generation(self, name: str) -> int:
+        """当前代际号（本地缓存 CACHE_GENERATION_REFRESH_S 秒，避免每次调用都访问 Redis）"""
+        cached = self._generations.get(name)
+        if cached and time.monotonic() - cached[1] < settings.cache_generation_refresh_s:
+            return cached[0]
+        try:
+            gen = int(self.redis.get(f"gen:{name}") or 0)
+        except Exception:
+            gen = cached[0] if cached else 0
+        self._generations[name] = (gen, time.monotonic())
+        return gen
+
+    def bump_generation(self, name: str) -> int:
+        """数据已更新：代际号 +1，并在防抖延迟后后台重算热点 key"""
+        try:
+            gen = int(self.redis.incr(f"gen:{name}"))
+        except Exception as e:
+            logger.warning(f"更新缓存代际失败: {e}")
+            return self.generation(name)
+        self._generations[name] = (gen, time.monotonic())
+        self.gen_stats["bumps"] += 1
+        self._schedule_rewarm(name)
+        return gen
+
+    def note_hot(self, name: str, base_key: str, fn: Callable[[], Any], ttl: float, prefix: str):
+        """记录一次访问，用于代际更新后挑选需要预热的热点 key"""
+        with self._hot_lock:
+            hot = self._hot[name]
+            entry = hot.get(base_key)
+            if entry is None:
+                entry = hot[base_key] = [0, fn, ttl, prefix]
+            entry[0] += 1
+            hot.move_to_end(base_key)
+            while len(hot) > settings.cache_hot_keys_max:
+                hot.popitem(last=False)
+
+    def _schedule_rewarm(self, name: str):
+        """一次抓取会多次入库，防抖：最后一次更新后 CACHE_REWARM_DELAY_S 秒再预热"""
+        if settings.cache_rewarm_top_n <= 0:
+            return
+        with self._hot_lock:
+            timer = self._rewarm_timers.get(name)
+            if timer is not None:
+                timer.cancel()
+            timer = threading.Timer(settings.cache_rewarm_delay_s, self._rewarm, args=(name,))
+            timer.daemon = True
+            self._rewarm_timers[name] = timer
+            timer.start()
+
+    def _rewarm(self, name: str):
+        with self._hot_lock:
+            self._rewarm_timers.pop(name, None)
+            hot = sorted(self._hot[name].items(), key=lambda kv: kv[1][0], reverse=True)
+            targets = hot[:settings.cache_rewarm_top_n]
+            for _, entry in hot:
+                entry[0] //= 2  # 衰减，让热点随时间变化
+        gen = self.generation(name)
+        self.gen_stats["rewarm_runs"] += 1
+        for base_key, (_, fn, ttl, prefix) in targets:
             try:
-                bus.redis.set(cache_key, json.dumps(result, default=str), ex=ttl_seconds)
+                self.get_or_compute(f"{base_key}@g{gen}", fn, ttl, prefix)
+                self.gen_stats["rewarmed"] += 1
             except Exception as e:
-                logger.warning(f"缓存写入失败: {e}")
+                logger.warning(f"预热缓存失败 {base_key}: {e}")
+        if targets:
+            logger.info(f"🔥 [Cache] {name} 第 {gen} 代：已预热 {len(targets)} 个热点 key")
+
+    # ------------------------------------------------------------
+    # 统计
+    # ------------------------------------------------------------
+    def snapshot(self) -> Dict[str, Any]:
+        """按 key 前缀汇总：命中率、平均查找 / 计算耗时（毫秒）"""
+        prefixes = {}
+        for prefix, s in list(self._stats.items()):
+            hits = s["local_hits"] + s["redis_hits"]
+            lookups = hits + s["misses"]
+            prefixes[prefix] = {
+                **{k: v for k, v in s.items() if not k.endswith("_time_s")},
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+                "avg_lookup_ms": round(s["lookup_time_s"] / max(1, lookups) * 1000, 3),
+                "avg_compute_ms": round(s["compute_time_s"] / max(1, s["computes"]) * 1000, 3),
+            }
+        return {"local_entries": len(self.local), "codec": "msgpack" if msgpack and settings.cache_codec == "msgpack" else "json",
+                "generations": {name: gen for name, (gen, _) in self._generations.items()},
+                **self.gen_stats, "prefixes": prefixes}
+
+
+# 全局单例
+cache_engine = CacheEngine()
+
+
+def make_cache_key(key_prefix: str, func_name: str, args: tuple, kwargs: dict) -> str:
+    # 将 args 和 kwargs 序列化后做 hash
+    arg_str = json.dumps({"args": args, "kwargs": kwargs}, sort_keys=True, default=str) # 参数转为字符串
+    key_hash = hashlib.md5(arg_str.encode()).hexdigest() # 对序列化后的参数字符串进行 MD5 哈希计算，生成一个固定长度的摘要
+    return f"{key_prefix}:{func_name}:{key_hash}"#将用户定义的 key_prefix、函数名和参数哈希值组合，形成Redis Key
+
 
-            return result
+def cache_result(ttl_seconds=3600, key_prefix="cache", generation: Optional[str] = None):
+    """
+    装饰器：缓存函数返回结果（进程内 LRU → Redis 两级），同步 / 异步函数均可使用。
+    同一个 key 并发未命中时只执行一次原函数，其余调用等待结果。
+    generation: 代际计数名（如 "medical_docs"）。key 中带上当前代际号，
+                数据更新时 bump_generation 即让旧结果全部失效，因此可以放心使用很长的 TTL；
+                同步函数的热点 key 会在代际更新后后台预热。
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                cache_key = make_cache_key(key_prefix, func.__name__, args, kwargs)
+                if generation:
+                    cache_key += f"@g{await asyncio.to_thread(cache_engine.generation, generation)}"
+                return await cache_engine.aget_or_compute(
+                    cache_key, lambda: func(*args, **kwargs), ttl_seconds, key_prefix)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            cache_key = make_cache_key(key_prefix, func.__name__, args, kwargs)
+            if generation:
+                cache_engine.note_hot(generation, cache_key, lambda: func(*args, **kwargs), ttl_seconds, key_prefix)
+                cache_key += f"@g{cache_engine.generation(generation)}"
+            return cache_engine.get_or_compute(
+                cache_key, lambda: func(*args, **kwargs), ttl_seconds, key_prefix)
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
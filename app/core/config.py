@@ -11,4 +11,122 @@ class Settings(BaseSettings):
     request_timeout_s: int = Field(default=10, alias="REQUEST_TIMEOUT_S")
     retry_max: int = Field(default=3, alias="RETRY_MAX")
     github_token: str = Field(default="", alias="GITHUB_TOKEN")
-settings = Settings()
\ No newline at end of file
+
+    # === HTTP 连接池（app/core/http_pool.py）===
+    http_max_connections: int = Field(default=20, alias="HTTP_MAX_CONNECTIONS")  # 每个 host 的最大连接数
+    http_max_keepalive: int = Field(default=10, alias="HTTP_MAX_KEEPALIVE")  # 每个 host 保持的空闲长连接数
+    http_keepalive_expiry_s: float = Field(default=30.0, alias="HTTP_KEEPALIVE_EXPIRY_S")
+    http_http2: bool = Field(default=False, alias="HTTP_HTTP2")  # 需要安装 h2（pip install httpx[http2]）
+
+    # === ClinicalTrials.gov ===
+    trials_page_size: int = Field(default=50, alias="TRIALS_PAGE_SIZE")  # v2 API 单页条数（上限 1000）
+
+    # === PubMed (NCBI E-utilities) ===
+    pubmed_batch_size: int = Field(default=200, alias="PUBMED_BATCH_SIZE")  # 每次 efetch 的文献数
+    pubmed_max_concurrency: int = Field(default=3, alias="PUBMED_MAX_CONCURRENCY")  # 并发 efetch 批次数
+    pubmed_rate_per_s: float = Field(default=3.0, alias="PUBMED_RATE_PER_S")  # NCBI 无 API Key 时上限 3 次/秒
+    ncbi_api_key: str = Field(default="", alias="NCBI_API_KEY")  # 设置后 PubMed 限速提升到 10 次/秒
+
+    # === GitHub ===
+    github_max_concurrency: int = Field(default=6, alias="GITHUB_MAX_CONCURRENCY")  # 同时在途的 GitHub 请求数
+    github_stats_wait_s: float = Field(default=5.0, alias="GITHUB_STATS_WAIT_S")  # 202 时最多等待统计结果的秒数
+    github_stats_poll_attempts: int = Field(default=6, alias="GITHUB_STATS_POLL_ATTEMPTS")  # 后台轮询次数上限
+
+    # === 限流（app/core/rate_limiter.py）===
+    rate_limit_backend: str = Field(default="redis", alias="RATE_LIMIT_BACKEND")  # redis（多进程共享）| local
+    arxiv_rate_per_s: float = Field(default=0.34, alias="ARXIV_RATE_PER_S")  # arXiv 要求每 3 秒不超过 1 次
+    github_rate_per_s: float = Field(default=5.0, alias="GITHUB_RATE_PER_S")
+    github_search_rate_per_s: float = Field(default=0.5, alias="GITHUB_SEARCH_RATE_PER_S")  # 搜索 API 带 Token 时 30 次/分钟
+    trials_rate_per_s: float = Field(default=10.0, alias="TRIALS_RATE_PER_S")
+
+    # === HTTP 响应缓存（app/core/http_cache.py）===
+    http_cache_mode: str = Field(default="on", alias="HTTP_CACHE_MODE")  # off | on | replay（只读缓存，离线复现）
+    http_cache_dir: str = Field(default="./cache/http", alias="HTTP_CACHE_DIR")
+    http_cache_max_mb: int = Field(default=512, alias="HTTP_CACHE_MAX_MB")
+    http_cache_ttl_default_s: float = Field(default=3600, alias="HTTP_CACHE_TTL_DEFAULT_S")
+    http_cache_ttl_pubmed_s: float = Field(default=86400, alias="HTTP_CACHE_TTL_PUBMED_S")
+    http_cache_ttl_arxiv_s: float = Field(default=86400, alias="HTTP_CACHE_TTL_ARXIV_S")
+    http_cache_ttl_github_s: float = Field(default=3600, alias="HTTP_CACHE_TTL_GITHUB_S")
+    http_cache_ttl_trials_s: float = Field(default=43200, alias="HTTP_CACHE_TTL_TRIALS_S")
+
+    # === 增量抓取（app/core/watermark.py）===
+    incremental_ingest: bool = Field(default=True, alias="INCREMENTAL_INGEST")  # 只抓水位线之后的新内容
+
+    # === 分块（app/tools/chunking.py）===
+    chunk_max_tokens: int = Field(default=200, alias="CHUNK_MAX_TOKENS")  # 单个分块的 token 上限
+    chunk_overlap_tokens: int = Field(default=40, alias="CHUNK_OVERLAP_TOKENS")  # 相邻分块重叠的 token 数（按整句）
+
+    # === 嵌入服务（app/tools/embedding_service.py）===
+    embedding_model_id: str = Field(default="all-MiniLM-L6-v2", alias="EMBEDDING_MODEL_ID")  # 区分不同模型的缓存目录
+    embedding_batch_size: int = Field(default=64, alias="EMBEDDING_BATCH_SIZE")  # 单次推理的文本数
+    embedding_workers: int = Field(default=2, alias="EMBEDDING_WORKERS")
+    embedding_executor: str = Field(default="thread", alias="EMBEDDING_EXECUTOR")  # thread | process
+    embedding_cache: bool = Field(default=True, alias="EMBEDDING_CACHE")
+    embedding_cache_dir: str = Field(default="./cache/embeddings", alias="EMBEDDING_CACHE_DIR")
+    query_embedding_cache_size: int = Field(default=2048, alias="QUERY_EMBEDDING_CACHE_SIZE")  # 查询向量 LRU 条数
+
+    # === 后台入库队列（app/tools/ingest_queue.py）===
+    ingest_queue_size: int = Field(default=8, alias="INGEST_QUEUE_SIZE")  # 排队中的分块批次上限（背压）
+    ingest_max_batch: int = Field(default=0, alias="INGEST_MAX_BATCH")  # 合并写入的分块上限，0 表示使用 Chroma 的 max_batch_size
+
+    # === 混合检索（app/tools/bm25_index.py）===
+    bm25_index_path: str = Field(default="./chroma_db/bm25.sqlite3", alias="BM25_INDEX_PATH")
+    rag_hybrid: bool = Field(default=True, alias="RAG_HYBRID")  # 向量 + BM25 并行检索，RRF 融合
+    rag_hybrid_candidates: int = Field(default=20, alias="RAG_HYBRID_CANDIDATES")  # 每一路召回的候选数
+    rag_rrf_k: int = Field(default=60, alias="RAG_RRF_K")  # RRF 平滑常数：score = Σ 1 / (k + rank)
+
+    # === 按数据源配额检索（app/tools/rag_query.py）===
+    rag_source_quotas: str = Field(default="pubmed:4,arxiv:3,github:2,clinical_trials:3", alias="RAG_SOURCE_QUOTAS")  # 每个数据源各取多少条
+
+    # === 结果缓存（app/core/cache.py）===
+    cache_local_size: int = Field(default=512, alias="CACHE_LOCAL_SIZE")  # 进程内 LRU 条数
+    cache_local_ttl_s: float = Field(default=60.0, alias="CACHE_LOCAL_TTL_S")  # 本地条目最长存活时间
+    cache_codec: str = Field(default="msgpack", alias="CACHE_CODEC")  # msgpack（需安装）| json
+    cache_compress_min_bytes: int = Field(default=1024, alias="CACHE_COMPRESS_MIN_BYTES")  # 超过该大小才 zlib 压缩
+    cache_lock_ttl_s: float = Field(default=30.0, alias="CACHE_LOCK_TTL_S")  # single-flight 锁的过期时间
+    cache_lock_wait_s: float = Field(default=10.0, alias="CACHE_LOCK_WAIT_S")  # 等待其它进程计算结果的上限
+    cache_generation_refresh_s: float = Field(default=1.0, alias="CACHE_GENERATION_REFRESH_S")  # 本地缓存代际号的时间
+    cache_hot_keys_max: int = Field(default=200, alias="CACHE_HOT_KEYS_MAX")  # 每个代际记录的热点 key 上限
+    cache_rewarm_top_n: int = Field(default=20, alias="CACHE_REWARM_TOP_N")  # 代际更新后预热的 key 数，0 关闭
+    cache_rewarm_delay_s: float = Field(default=5.0, alias="CACHE_REWARM_DELAY_S")  # 预热防抖延迟
+
+    # === 语义近重复缓存（app/core/semantic_cache.py）===
+    semantic_cache_enabled: bool = Field(default=True, alias="SEMANTIC_CACHE_ENABLED")
+    semantic_cache_threshold: float = Field(default=0.92, alias="SEMANTIC_CACHE_THRESHOLD")  # 余弦相似度 ≥ 该值视为同一查询
+    semantic_cache_log_maxlen: int = Field(default=100000, alias="SEMANTIC_CACHE_LOG_MAXLEN")  # 决策记录 Stream 长度，0 不记录
+    report_cache_ttl_s: int = Field(default=7 * 86400, alias="REPORT_CACHE_TTL_S")  # 最终报告的缓存时间
+
+    # === 任务记忆（app/core/memory.py）===
+    memory_ttl_light_s: int = Field(default=7 * 86400, alias="MEMORY_TTL_LIGHT_S")  # 轻量请求可复用的记忆最长年龄
+    memory_ttl_deep_s: int = Field(default=86400, alias="MEMORY_TTL_DEEP_S")  # 深度请求要求更新的记忆
+    memory_max_entries: int = Field(default=5000, alias="MEMORY_MAX_ENTRIES")  # 超过后淘汰最旧的记忆，0 不限
+
+    # === 事实聚类（app/agents/fact_clustering.py）===
+    fact_cluster_threshold: float = Field(default=0.5, alias="FACT_CLUSTER_THRESHOLD")  # 估计 Jaccard ≥ 该值视为同一事实
+    fact_minhash_perm: int = Field(default=64, alias="FACT_MINHASH_PERM")  # MinHash 签名长度
+    fact_lsh_bands: int = Field(default=16, alias="FACT_LSH_BANDS")  # LSH band 数（须整除签名长度）
+    fact_shingle_size: int = Field(default=2, alias="FACT_SHINGLE_SIZE")  # 词级 shingle 长度
+
+    # === 证据合并（app/agents/evidence.py）===
+    evidence_mode: str = Field(default="embedding", alias="EVIDENCE_MODE")  # embedding | minhash
+    evidence_similarity: float = Field(default=0.85, alias="EVIDENCE_SIMILARITY")  # 余弦相似度 ≥ 该值视为同一事实
+    evidence_block_size: int = Field(default=1024, alias="EVIDENCE_BLOCK_SIZE")  # 分块矩阵乘法每块的行数
+
+    # === 报告分节推送（app/core/report_stream.py）===
+    report_stream_ttl_s: int = Field(default=3600, alias="REPORT_STREAM_TTL_S")  # stream:report:{task_id} 保留时间
+    report_stream_timeout_s: float = Field(default=900.0, alias="REPORT_STREAM_TIMEOUT_S")  # 单个 SSE 连接最长时间
+    report_stream_block_ms: int = Field(default=15000, alias="REPORT_STREAM_BLOCK_MS")  # XREAD 阻塞时间，超时发送保活
+
+    # === PDF 渲染服务（app/tools/pdf_render_service.py）===
+    pdf_render_workers: int = Field(default=0, alias="PDF_RENDER_WORKERS")  # 渲染进程数，0 表示按 CPU 数自动选择（1~2）
+    pdf_render_max_queue: int = Field(default=16, alias="PDF_RENDER_MAX_QUEUE")  # 排队中的渲染任务上限
+    pdf_render_timeout_s: float = Field(default=120.0, alias="PDF_RENDER_TIMEOUT_S")  # 单个任务的渲染超时
+    pdf_submit_wait_s: float = Field(default=5.0, alias="PDF_SUBMIT_WAIT_S")  # 队列满时提交方最多等待多久
+    pdf_retry_after_s: int = Field(default=10, alias="PDF_RETRY_AFTER_S")  # 队列满时下载接口返回 503，建议客户端多久后重试
+
+    # === 产物存储与下载（app/core/artifact_store.py, api/routes/artifact.py）===
+    artifact_store_dir: str = Field(default="./app/artifacts/store", alias="ARTIFACT_STORE_DIR")  # 内容寻址对象目录
+    artifact_gzip_level: int = Field(default=9, alias="ARTIFACT_GZIP_LEVEL")  # 预压缩只做一次，用最高压缩级别
+    artifact_index_cache_size: int = Field(default=4096, alias="ARTIFACT_INDEX_CACHE_SIZE")  # 进程内索引缓存条数
+    artifact_index_cache_ttl_s: float = Field(default=300.0, alias="ARTIFACT_INDEX_CACHE_TTL_S")  # 索引缓存时间
+settings = Settings()
@@ -1,4 +1,23 @@
-from typing import Dict, Any
+import re
+from typing import Dict, Any, Optional
+
+def normalize_topic(topic: str) -> str:
+    """主题规范化：小写、去首尾空白、合并连续空白（"Polyp  Segmentation " -> "polyp segmentation"）"""
+    return " ".join((topic or "").lower().split())
+
+def date_to_int(value: Any) -> Optional[int]:
+    """
+    日期转成可做范围过滤的整数 YYYYMMDD：
+    "2023-05-01" / "2023/05/01" / "2023-05-01T12:00:00Z" -> 20230501，只有年份时 "2023" -> 20230000
+    """
+    if isinstance(value, int):
+        return value
+    if not isinstance(value, str):
+        return None
+    m = re.match(r"\s*(\d{4})(?:[-/](\d{1,2}))?(?:[-/](\d{1,2}))?", value)
+    if not m:
+        return None
+    return int(m.group(1)) * 10000 + int(m.group(2) or 0) * 100 + int(m.group(3) or 0)
 
 def is_valid_url(url: str) -> bool:
     return isinstance(url, str) and url.startswith(("http://", "https://"))
@@ -15,10 +15,12 @@ class DBClient:
         self.tasks = self.db["tasks"]#访问或创建名为 tasks 的集合
         self.steps = self.db["steps"]#访问或创建名为 steps 的集合
         self.artifacts = self.db["artifacts"]#访问或创建名为 artifacts 的集合
+        self.watermarks = self.db["watermarks"]#增量抓取水位线：每个 (source, topic) 一条
         
         # 创建索引（幂等性关键）
         # 确保同一个 task 的同一个 step 唯一
         self.steps.create_index([("task_id", 1), ("step_name", 1)], unique=True)
+        self.watermarks.create_index([("source", 1), ("topic_key", 1)], unique=True)
 
 # 全局同步客户端 (供 Workers 使用)
 db = DBClient()
\ No newline at end of file
@@ -1,4 +1,7 @@
+import asyncio
+import threading
 import redis
+import redis.asyncio
 from typing import Dict, Any, List, Optional
 import json
 import os
@@ -16,12 +19,32 @@ class Topic(str, Enum):
 class EventBus:
     def __init__(self, host="localhost", port=6379, db=0):
         # 优先读取环境变量，方便后续 Docker 部署
-        self.redis = redis.Redis(
-            host=os.getenv("REDIS_HOST", host),
-            port=int(os.getenv("REDIS_PORT", port)),
-            db=int(os.getenv("REDIS_DB", db)),
-            decode_responses=True # 自动解码为字符串
-        )
+        self._conn = {
+            "host": os.getenv("REDIS_HOST", host),
+            "port": int(os.getenv("REDIS_PORT", port)),
+            "db": int(os.getenv("REDIS_DB", db)),
+        }
+        self.redis = redis.Redis(**self._conn, decode_responses=True) # 自动解码为字符串
+        # 不解码的连接：结果缓存存的是压缩后的二进制（app/core/cache.py）
+        self.redis_raw = redis.Redis(**self._conn, decode_responses=False)
+        # 异步连接绑定在创建它的事件循环上，按 loop 缓存（见 async_redis）
+        self._async_clients: Dict[asyncio.AbstractEventLoop, "redis.asyncio.Redis"] = {}
+        self._async_lock = threading.Lock()
+
+    def async_redis(self) -> "redis.asyncio.Redis":
+        """
+        当前事件循环专用的 redis.asyncio 客户端（decode_responses=True），
+        供协程里的 Redis 调用使用，不阻塞事件循环。各 Worker 线程各跑一个 loop，API 进程另有一个。
+        """
+        loop = asyncio.get_running_loop()
+        with self._async_lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                for dead in [l for l in self._async_clients if l.is_closed()]:
+                    self._async_clients.pop(dead, None)
+                client = redis.asyncio.Redis(**self._conn, decode_responses=True)
+                self._async_clients[loop] = client
+        return client
 
     def publish(self, topic: Topic, payload: Dict[str, Any]) -> str:
         """
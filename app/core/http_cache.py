@@ -0,0 +1,282 @@
+# app/core/http_cache.py
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit, urlunsplit
+
+from app.core.config import settings
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 不参与缓存 Key 的参数（鉴权信息不影响响应内容）
+_IGNORED_PARAMS = {"api_key"}
+# 只保留这些响应头；正文已解压存储，Content-Encoding / Length 不再适用
+_KEPT_HEADERS = {"content-type", "etag", "last-modified", "date"}
+
+_READ_CHUNK = 64 * 1024
+
+
+class CacheMissError(RuntimeError):
+    """replay 模式下请求未命中缓存"""
+
+
+class HttpResponseCache:
+    """
+    磁盘 HTTP 响应缓存（位于各数据源客户端之下，由 http_pool 调用）。
+      - Key：规范化请求（方法 + URL + 排序后的参数）的 sha256
+      - 存储：{root}/{key[:2]}/{key}.gz 为 gzip 压缩的正文，同目录 {key}.json 为头信息（状态码、响应头、写入时间）；
+        304 重新验证只改写 .json，不重写正文
+      - 新鲜度：按数据源配置 TTL；过期后带 ETag / Last-Modified 条件请求重新验证
+      - 容量：总大小超过上限时按最近访问时间（LRU）淘汰
+      - 模式：off 关闭 | on 正常读写 | replay 只读缓存、未命中直接报错（离线复现）
+    方法都是阻塞的文件 I/O，协程里经 asyncio.to_thread 调用（见 http_pool）。
+    """
+
+    def __init__(self, root: str, max_bytes: int, mode: str = "on"):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, Tuple[int, float]]] = None  # key -> (size, last_access)
+        self._total = 0
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "stores": 0, "evictions": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in ("on", "replay")
+
+    @property
+    def replay(self) -> bool:
+        return self.mode == "replay"
+
+    # ------------------------------------------------------------
+    # Key & 新鲜度
+    # ------------------------------------------------------------
+    @staticmethod
+    def make_key(method: str, url: str, params: Optional[Dict[str, Any]] = None) -> str:
+        parts = urlsplit(url)
+        query = parse_qsl(parts.query, keep_blank_values=True)
+        query += [(k, str(v)) for k, v in (params or {}).items() if v is not None]
+        query = sorted((k, v) for k, v in query if k not in _IGNORED_PARAMS)
+        base = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, "", ""))
+        raw = json.dumps([method.upper(), base, query], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def ttl_for(source: Optional[str]) -> float:
+        return {
+            "pubmed": settings.http_cache_ttl_pubmed_s,
+            "arxiv": settings.http_cache_ttl_arxiv_s,
+            "github": settings.http_cache_ttl_github_s,
+            "github_search": settings.http_cache_ttl_github_s,
+            "trials": settings.http_cache_ttl_trials_s,
+        }.get(source or "", settings.http_cache_ttl_default_s)
+
+    @staticmethod
+    def is_fresh(entry: Dict[str, Any], source: Optional[str], ttl: Optional[float] = None) -> bool:
+        ttl = HttpResponseCache.ttl_for(source) if ttl is None else ttl
+        return time.time() - entry["stored_at"] < ttl
+
+    @staticmethod
+    def conditional_headers(entry: Dict[str, Any]) -> Dict[str, str]:
+        headers = {}
+        if entry["headers"].get("etag"):
+            headers["If-None-Match"] = entry["headers"]["etag"]
+        if entry["headers"].get("last-modified"):
+            headers["If-Modified-Since"] = entry["headers"]["last-modified"]
+        return headers
+
+    # ------------------------------------------------------------
+    # 读
+    # ------------------------------------------------------------
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.gz")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def load_meta(self, key: str) -> Optional[Dict[str, Any]]:
+        """只读头信息（状态码、响应头、写入时间），不读正文"""
+        path = self._meta_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"[HttpCache] 缓存文件损坏，已删除: {path} ({e})")
+            self._remove(key)
+            return None
+        if not os.path.exists(self._path(key)):
+            self._remove(key)
+            return None
+        return meta
+
+    def iter_body(self, key: str) -> Iterator[bytes]:
+        """分块读取正文（流式场景，内存占用恒定）"""
+        self._touch(key)
+        with gzip.open(self._path(key), "rb") as f:
+            while True:
+                chunk = f.read(_READ_CHUNK)
+                if not chunk:
+                    break
+                yield chunk
+
+    def read_body(self, key: str) -> bytes:
+        return b"".join(self.iter_body(key))
+
+    # ------------------------------------------------------------
+    # 写
+    # ------------------------------------------------------------
+    def open_writer(self, key: str, status: int, headers: Dict[str, str]) -> "_CacheWriter":
+        meta = {
+            "status": status,
+            "headers": {k.lower(): v for k, v in headers.items() if k.lower() in _KEPT_HEADERS},
+            "stored_at": time.time(),
+        }
+        return _CacheWriter(self, key, meta)
+
+    def store(self, key: str, status: int, headers: Dict[str, str], body: bytes):
+        with self.open_writer(key, status, headers) as w:
+            w.write(body)
+
+    def refresh(self, key: str):
+        """304 重新验证成功：只改写头信息里的写入时间，正文文件不动"""
+        meta = self.load_meta(key)
+        if meta is None:
+            return
+        _write_json_atomic(self._meta_path(key), {**meta, "stored_at": time.time()})
+        self._touch(key)
+        self.stats["revalidated"] += 1
+
+    def _committed(self, key: str, size: int):
+        with self._lock:
+            index = self._load_index()
+            old = index.get(key)
+            if old:
+                self._total -= old[0]
+            index[key] = (size, time.time())
+            self._total += size
+            self.stats["stores"] += 1
+            self._evict_locked()
+
+    # ------------------------------------------------------------
+    # LRU 索引
+    # ------------------------------------------------------------
+    def _load_index(self) -> Dict[str, Tuple[int, float]]:
+        """首次使用时扫描缓存目录，建立 key -> (大小, 最近访问时间) 索引（调用方需持有 _lock）"""
+        if self._index is None:
+            self._index = {}
+            self._total = 0
+            if os.path.isdir(self.root):
+                for dirpath, _, files in os.walk(self.root):
+                    for name in files:
+                        if not name.endswith(".gz"):
+                            continue
+                        st = os.stat(os.path.join(dirpath, name))
+                        self._index[name[:-3]] = (st.st_size, st.st_mtime)
+                        self._total += st.st_size
+        return self._index
+
+    def _touch(self, key: str):
+        """记录访问时间；同时更新文件 mtime，重启后重建索引时仍保留 LRU 顺序"""
+        now = time.time()
+        with self._lock:
+            index = self._load_index()
+            if key in index:
+                index[key] = (index[key][0], now)
+        try:
+            os.utime(self._path(key), (now, now))
+        except FileNotFoundError:
+            pass
+
+    def _evict_locked(self):
+        if self._total <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        for key, (size, _) in sorted(self._index.items(), key=lambda kv: kv[1][1]):
+            if self._total <= target:
+                break
+            self._unlink(key)
+            del self._index[key]
+            self._total -= size
+            self.stats["evictions"] += 1
+
+    def _remove(self, key: str):
+        with self._lock:
+            index = self._load_index()
+            entry = index.pop(key, None)
+            if entry:
+                self._total -= entry[0]
+        self._unlink(key)
+
+    def _unlink(self, key: str):
+        """删除条目的正文与头信息文件；先删头信息，读方不会看到缺正文的条目"""
+        for path in (self._meta_path(key), self._path(key)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            index = self._load_index()
+            return {**self.stats, "mode": self.mode, "entries": len(index), "bytes": self._total}
+
+
+def _write_json_atomic(path: str, data: Dict[str, Any]):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+class _CacheWriter:
+    """增量写入缓存正文：先写临时文件，完整结束后原子替换，最后写头信息（头信息存在即条目完整）"""
+
+    def __init__(self, cache: HttpResponseCache, key: str, meta: Dict[str, Any]):
+        self.cache = cache
+        self.key = key
+        self.meta = meta
+        self.path = cache._path(key)
+        self.tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._f = gzip.open(self.tmp, "wb")
+
+    def write(self, chunk: bytes):
+        self._f.write(chunk)
+
+    def abort(self):
+        self._f.close()
+        try:
+            os.remove(self.tmp)
+        except FileNotFoundError:
+            pass
+
+    def commit(self):
+        self._f.close()
+        os.replace(self.tmp, self.path)
+        _write_json_atomic(self.cache._meta_path(self.key), self.meta)
+        self.cache._committed(self.key, os.path.getsize(self.path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+
+# 全局单例
+response_cache = HttpResponseCache(
+    root=settings.http_cache_dir,
+    max_bytes=settings.http_cache_max_mb * 1024 * 1024,
+    mode=settings.http_cache_mode,
+)
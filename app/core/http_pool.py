@@ -0,0 +1,273 @@
+# app/core/http_pool.py
+import asyncio
+import threading
+from collections import defaultdict
+from functools import partial
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.rate_limiter import get_limiter
+from app.core.http_cache import response_cache, CacheMissError
+
+logger = get_logger(__name__)
+
+
+def _http2_available() -> bool:
+    """HTTP/2 依赖 h2 包，没装时自动降级到 HTTP/1.1"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class HttpSessionManager:
+    """
+    进程级 HTTP 会话管理器：每个 host 复用一个 httpx.AsyncClient（keep-alive 连接池）。
+
+    httpx 的连接绑定在创建它的事件循环上，而各个 Worker 线程各自跑自己的 loop，
+    所以客户端按 (event loop, host) 维度缓存。
+    """
+
+    def __init__(self):
+        self._clients: Dict[Tuple[asyncio.AbstractEventLoop, str], httpx.AsyncClient] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"requests": 0, "connections_opened": 0})
+        self._http2 = settings.http_http2 and _http2_available()
+        if settings.http_http2 and not self._http2:
+            logger.warning("HTTP_HTTP2=true 但未安装 h2，回退到 HTTP/1.1")
+
+    # ------------------------------------------------------------
+    # 客户端获取
+    # ------------------------------------------------------------
+    def get_client(self, url: str) -> httpx.AsyncClient:
+        """取出（或创建）当前事件循环下该 host 的共享客户端"""
+        loop = asyncio.get_running_loop()
+        host = urlsplit(url).netloc
+        key = (loop, host)
+
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None or client.is_closed:
+                self._drop_dead_loops()
+                client = httpx.AsyncClient(
+                    timeout=float(settings.request_timeout_s),
+                    http2=self._http2,
+                    limits=httpx.Limits(
+                        max_connections=settings.http_max_connections,
+                        max_keepalive_connections=settings.http_max_keepalive,
+                        keepalive_expiry=settings.http_keepalive_expiry_s,
+                    ),
+                    follow_redirects=True,
+                )
+                self._clients[key] = client
+                logger.info(f"[HttpPool] 新建连接池: {host} (http2={self._http2})")
+        return client
+
+    def _drop_dead_loops(self):
+        """清理已关闭事件循环遗留的客户端（调用方需持有 _lock）"""
+        for key in [k for k in self._clients if k[0].is_closed()]:
+            self._clients.pop(key, None)
+
+    # ------------------------------------------------------------
+    # 请求入口：所有 fetch_* 都走这里
+    #   缓存（新鲜命中直接返回）→ 限流 → 发送（过期条目带条件请求）→ 写缓存
+    #   缓存读写是磁盘 I/O + gzip，一律放到线程里执行，不阻塞事件循环
+    # ------------------------------------------------------------
+    async def request(self, method: str, url: str, limiter: Optional[str] = None, **kwargs) -> httpx.Response:
+        """
+        limiter: 数据源名称（pubmed / arxiv / github / trials），
+                 发请求前从对应令牌桶取令牌，收到响应后按限流响应头自适应调整；
+                 同时决定该请求的响应缓存 TTL
+        cache_params: 用来代替 params 计算缓存 Key（参数里含会话令牌时使用，如 PubMed WebEnv）
+        cache_ttl: 覆盖数据源默认 TTL；0 表示每次都回源，但仍写缓存供 replay 使用
+        """
+        cache_params = kwargs.pop("cache_params", None)
+        cache_ttl = kwargs.pop("cache_ttl", None)
+        key, entry = await self._cache_lookup(method, url, cache_params or kwargs.get("params"))
+        if entry is not None and (response_cache.replay or response_cache.is_fresh(entry, limiter, cache_ttl)):
+            response_cache.stats["hits"] += 1
+            body = await asyncio.to_thread(response_cache.read_body, key)
+            return self._cached_response(method, url, entry, body)
+        if entry is not None:
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), **response_cache.conditional_headers(entry)}
+
+        resp = await self._send(method, url, limiter, **kwargs)
+
+        if entry is not None and resp.status_code == 304:
+            await asyncio.to_thread(response_cache.refresh, key)
+            body = await asyncio.to_thread(response_cache.read_body, key)
+            return self._cached_response(method, url, entry, body)
+        if key and resp.status_code == 200:
+            await asyncio.to_thread(response_cache.store, key, resp.status_code, resp.headers, resp.content)
+        return resp
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def stream_bytes(self, method: str, url: str, limiter: Optional[str] = None, **kwargs) -> AsyncIterator[bytes]:
+        """
+        流式请求：逐块 yield 响应体，不整体读入内存。
+        未命中缓存时边下载边写入缓存文件；命中时从缓存文件分块读出。
+        非 2xx 响应抛出 httpx.HTTPStatusError。cache_params / cache_ttl 含义同 request()。
+        """
+        cache_params = kwargs.pop("cache_params", None)
+        cache_ttl = kwargs.pop("cache_ttl", None)
+        key, entry = await self._cache_lookup(method, url, cache_params or kwargs.get("params"))
+        if entry is not None and (response_cache.replay or response_cache.is_fresh(entry, limiter, cache_ttl)):
+            response_cache.stats["hits"] += 1
+            async for chunk in self._iter_cached(key):
+                yield chunk
+            return
+        if entry is not None:
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), **response_cache.conditional_headers(entry)}
+
+        host = urlsplit(url).netloc
+        client = self.get_client(url)
+        extensions = kwargs.pop("extensions", None) or {}
+        extensions.setdefault("trace", partial(self._trace, host))
+
+        bucket = get_limiter(limiter) if limiter else None
+        if bucket:
+            await bucket.acquire()
+        self._stats[host]["requests"] += 1
+        async with client.stream(method, url, extensions=extensions, **kwargs) as resp:
+            if bucket:
+                bucket.observe(resp.status_code, resp.headers)
+            if entry is not None and resp.status_code == 304:
+                await asyncio.to_thread(response_cache.refresh, key)
+                async for chunk in self._iter_cached(key):
+                    yield chunk
+                return
+            resp.raise_for_status()
+
+            writer = None
+            if key:
+                writer = await asyncio.to_thread(response_cache.open_writer, key, resp.status_code, resp.headers)
+            try:
+                async for chunk in resp.aiter_bytes():
+                    if writer:
+                        await asyncio.to_thread(writer.write, chunk)
+                    yield chunk
+            except BaseException:
+                if writer:
+                    writer.abort()
+                raise
+            if writer:
+                await asyncio.to_thread(writer.commit)
+
+    @staticmethod
+    async def _iter_cached(key: str) -> AsyncIterator[bytes]:
+        """在线程里逐块解压缓存正文"""
+        chunks = response_cache.iter_body(key)
+        try:
+            while True:
+                chunk = await asyncio.to_thread(next, chunks, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            chunks.close()
+
+    async def _send(self, method: str, url: str, limiter: Optional[str], **kwargs) -> httpx.Response:
+        host = urlsplit(url).netloc
+        client = self.get_client(url)
+        extensions = kwargs.pop("extensions", None) or {}
+        extensions.setdefault("trace", partial(self._trace, host))
+
+        bucket = get_limiter(limiter) if limiter else None
+        if bucket:
+            await bucket.acquire()
+        self._stats[host]["requests"] += 1
+        resp = await client.request(method, url, extensions=extensions, **kwargs)
+        if bucket:
+            bucket.observe(resp.status_code, resp.headers)
+        return resp
+
+    async def _cache_lookup(self, method: str, url: str, params) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """返回 (缓存 Key, 缓存头信息)；不缓存的请求返回 (None, None)；replay 模式未命中抛 CacheMissError"""
+        if not response_cache.enabled or method.upper() != "GET":
+            return None, None
+        key = response_cache.make_key(method, url, params)
+        entry = await asyncio.to_thread(response_cache.load_meta, key)
+        if entry is None:
+            response_cache.stats["misses"] += 1
+            if response_cache.replay:
+                raise CacheMissError(f"replay 模式缓存未命中: {method} {url} {params}")
+        return key, entry
+
+    @staticmethod
+    def _cached_response(method: str, url: str, entry: Dict[str, Any], body: bytes) -> httpx.Response:
+        return httpx.Response(
+            status_code=entry["status"],
+            headers={**entry["headers"], "x-cache": "HIT"},
+            content=body,
+            request=httpx.Request(method, url),
+        )
+
+    async def _trace(self, host: str, event_name: str, info: Dict[str, Any]):
+        """httpcore trace 回调：只有真正新建 TCP 连接时才会触发 connect_tcp"""
+        if event_name == "connection.connect_tcp.complete":
+            self._stats[host]["connections_opened"] += 1
+
+    # ------------------------------------------------------------
+    # 统计
+    # ------------------------------------------------------------
+    def _open_connections(self, host: str) -> int:
+        total = 0
+        with self._lock:
+            clients = [c for (loop, h), c in self._clients.items() if h == host and not c.is_closed]
+        for client in clients:
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            total += len(getattr(pool, "connections", []) or [])
+        return total
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        连接池统计：
+          reuse_ratio = 1 - 新建连接数 / 请求数（越接近 1 说明 keep-alive 复用越好）
+        """
+        hosts = {}
+        total_req, total_conn, total_open = 0, 0, 0
+        for host, s in list(self._stats.items()):
+            opened = self._open_connections(host)
+            hosts[host] = {
+                "requests": s["requests"],
+                "connections_opened": s["connections_opened"],
+                "reuse_ratio": round(1 - s["connections_opened"] / s["requests"], 4) if s["requests"] else 0.0,
+                "open_connections": opened,
+            }
+            total_req += s["requests"]
+            total_conn += s["connections_opened"]
+            total_open += opened
+
+        return {
+            "http2": self._http2,
+            "requests": total_req,
+            "connections_opened": total_conn,
+            "reuse_ratio": round(1 - total_conn / total_req, 4) if total_req else 0.0,
+            "open_connections": total_open,
+            "hosts": hosts,
+        }
+
+    # ------------------------------------------------------------
+    # 关闭钩子
+    # ------------------------------------------------------------
+    async def aclose(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """关闭某个事件循环（默认当前 loop）下的全部客户端"""
+        loop = loop or asyncio.get_running_loop()
+        with self._lock:
+            keys = [k for k in self._clients if k[0] is loop]
+            clients = [self._clients.pop(k) for k in keys]
+        for client in clients:
+            await client.aclose()
+        if clients:
+            logger.info(f"[HttpPool] 已关闭 {len(clients)} 个连接池")
+
+
+# 全局单例
+http_pool = HttpSessionManager()
@@ -1,71 +1,148 @@
-import uuid
-import json
+import hashlib
+import time
 from datetime import datetime
 from typing import Optional, Dict, Any
+from app.core.config import settings
+from app.core.data_clean import normalize_topic
 from app.core.logger import get_logger
-import chromadb
-from chromadb.config import Settings
+from app.core.metrics import tracker
+from app.tools.chroma_client import client
+from app.tools.embedding_service import embedder
 
 logger = get_logger("Memory")
 
-DB_DIR = "./chroma_db"
+
+def topic_id(topic: str) -> str:
+    """规范化主题的 hash，作为记忆的文档 ID：同一主题只保留一条，精确回忆直接按 ID 取"""
+    return "topic_" + hashlib.sha1(normalize_topic(topic).encode("utf-8")).hexdigest()[:24]
+
 
 class TaskMemory:
+    """
+    任务级长期记忆（Chroma 集合 task_memory，与 medical_docs 共用一个客户端）。
+      - 精确路径：规范化主题的 hash 即文档 ID，collection.get 一次取到，不做向量检索；
+      - 近似路径：精确未命中时才做向量检索，只在新鲜的记忆里找；
+      - 新鲜度：按请求的模式（light / deep）各有最长存活时间，deep 请求只复用 deep 记忆；
+      - 容量：超过 MEMORY_MAX_ENTRIES 时按写入时间淘汰最旧的记忆。
+    """
+
     def __init__(self):
-        self.client = chromadb.PersistentClient(path=DB_DIR)
         # 专门的集合，用于存储任务级别的记忆
-        self.collection = self.client.get_or_create_collection(name="task_memory")
+        self.collection = client.get_or_create_collection(name="task_memory")
+        self.stats = {"recalls": 0, "exact_hits": 0, "vector_hits": 0, "misses": 0, "stale": 0,
+                      "evicted": 0, "recall_time_s": 0.0}
 
-    def remember_task(self, topic: str, summary: str, artifact_path: str, tags: str = ""):
+    def remember_task(self, topic: str, summary: str, artifact_path: str, tags: str = "", depth: str = "light"):
         """
-        任务完成后，将任务主题与结果摘要存入向量库
+        任务完成后，将任务主题与结果摘要存入向量库（同一规范化主题覆盖旧记忆）
         """
         try:
-            doc_id = str(uuid.uuid4())
             # 存入：Topic 作为向量内容，Metadata 存摘要和文件路径
-            self.collection.add(
-                ids=[doc_id],
+            self.collection.upsert(
+                ids=[topic_id(topic)],
                 documents=[topic],
+                embeddings=embedder.embed_queries([topic]).tolist(),  # 与 recall 共用查询向量 LRU
                 metadatas=[{
                     "topic": topic,
                     "summary": summary[:1000], # 限制长度
-                    "artifact_path": artifact_path,
+                    "artifact_path": artifact_path or "",
                     "tags": tags,
+                    "depth": depth,
+                    "created_at": time.time(),
                     "timestamp": datetime.now().isoformat()
                 }]
             )
             logger.info(f"🧠 已记住任务: {topic}")
+            self._evict()
         except Exception as e:
             logger.error(f"🧠 保存任务记忆失败: {e}")
 
-    def recall_task(self, topic: str, threshold: float = 0.3) -> Optional[Dict[str, Any]]:
+    def recall_task(self, topic: str, depth: str = "light", threshold: float = 0.3) -> Optional[Dict[str, Any]]:
         """
-        回忆：查找是否有相似的任务已完成
+        回忆：查找是否有相似且仍然新鲜的任务已完成
+        depth: 当前请求的模式，决定可接受的记忆年龄与模式
         threshold: 距离阈值（越小越相似），Chroma 默认 L2 距离
         """
+        start = time.time()
+        self.stats["recalls"] += 1
         try:
-            results = self.collection.query(
-                query_texts=[topic],
-                n_results=1
-            )
-            
-            if not results["ids"] or not results["ids"][0]:
-                return None
-
-            distance = results["distances"][0][0]
-            metadata = results["metadatas"][0][0]
-
-            logger.info(f"🧠 回忆查询: '{topic}' | 最佳匹配: '{metadata['topic']}' (L2距离={distance:.4f})")
+            with tracker.track("memory_recall"):
+                return self._recall(topic, depth, threshold)
+        except Exception as e:
+            logger.warning(f"🧠 回忆任务失败: {e}")
+            return None
+        finally:
+            self.stats["recall_time_s"] += time.time() - start
 
-            # 如果距离小于阈值，认为是同一个任务
-            if distance < threshold:
+    def _recall(self, topic: str, depth: str, threshold: float) -> Optional[Dict[str, Any]]:
+        # 1. 精确路径：按规范化主题 hash 直接取
+        got = self.collection.get(ids=[topic_id(topic)], include=["metadatas"])
+        if got["ids"]:
+            metadata = got["metadatas"][0]
+            if self._is_fresh(metadata, depth):
+                self.stats["exact_hits"] += 1
+                logger.info(f"🧠 精确回忆命中: '{topic}'")
                 return metadata
-            
-            return None
+            self.stats["stale"] += 1
+            logger.info(f"🧠 记忆已过期: '{topic}' (depth={metadata.get('depth')})")
 
-        except Exception as e:
-            logger.warning(f"🧠 回忆任务失败: {e}")
+        # 2. 近似路径：只在新鲜的记忆里做向量检索
+        results = self.collection.query(
+            query_embeddings=embedder.embed_queries([topic]).tolist(),
+            n_results=1,
+            where=self._fresh_where(depth),
+        )
+        if not results["ids"] or not results["ids"][0]:
+            self.stats["misses"] += 1
             return None
 
+        distance = results["distances"][0][0]
+        metadata = results["metadatas"][0][0]
+
+        logger.info(f"🧠 回忆查询: '{topic}' | 最佳匹配: '{metadata['topic']}' (L2距离={distance:.4f})")
+
+        # 如果距离小于阈值，认为是同一个任务
+        if distance < threshold:
+            self.stats["vector_hits"] += 1
+            return metadata
+
+        self.stats["misses"] += 1
+        return None
+
+    # ------------------------------------------------------------
+    # 新鲜度与淘汰
+    # ------------------------------------------------------------
+    @staticmethod
+    def _max_age(depth: str) -> float:
+        return settings.memory_ttl_deep_s if depth == "deep" else settings.memory_ttl_light_s
+
+    def _is_fresh(self, metadata: Dict[str, Any], depth: str) -> bool:
+        if depth == "deep" and metadata.get("depth") != "deep":
+            return False  # 轻量模式的记忆不足以回答深度请求
+        return time.time() - metadata.get("created_at", 0) <= self._max_age(depth)
+
+    def _fresh_where(self, depth: str) -> Dict[str, Any]:
+        conds = [{"created_at": {"$gte": time.time() - self._max_age(depth)}}]
+        if depth == "deep":
+            conds.append({"depth": "deep"})
+        return conds[0] if len(conds) == 1 else {"$and": conds}
+
+    def _evict(self):
+        """超过容量时删除最旧的记忆，一次删到容量的 90%，避免每次写入都全量扫描"""
+        cap = settings.memory_max_entries
+        if cap <= 0 or self.collection.count() <= cap:
+            return
+        everything = self.collection.get(include=["metadatas"])
+        by_age = sorted(zip(everything["ids"], everything["metadatas"]),
+                        key=lambda item: (item[1] or {}).get("created_at", 0))
+        victims = [doc_id for doc_id, _ in by_age[:len(by_age) - int(cap * 0.9)]]
+        if victims:
+            self.collection.delete(ids=victims)
+            self.stats["evicted"] += len(victims)
+            logger.info(f"🧠 记忆超过容量 {cap}，淘汰最旧的 {len(victims)} 条")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "entries": self.collection.count()}
+
 # 全局单例
-task_memory = TaskMemory()
\ No newline at end of file
+task_memory = TaskMemory()
@@ -1,4 +1,7 @@
 # app/core/metrics.py
+import bisect
+import json
+import threading
 import time
 from collections import defaultdict
 from contextlib import contextmanager
@@ -54,5 +57,75 @@ class MetricsTracker:
             print(f"{name:<15} | {avg_time:<10.4f} | {status}")
         print("="*50 + "\n")
 
+class Histogram:
+    """固定桶的延迟直方图（线程安全），快照中给出各桶计数与按桶估算的 p50 / p95 / p99"""
+
+    DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个桶为 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """返回第 q 分位所在桶的上界（+Inf 桶返回观测到的最大值）"""
+        if self.count == 0:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            labels = [f"le_{b:g}" for b in self.buckets] + ["le_inf"]
+            return {
+                "count": self.count,
+                "sum_s": round(self.sum, 4),
+                "avg_s": round(self.sum / self.count, 4) if self.count else 0.0,
+                "max_s": round(self.max, 4),
+                "p50_s": self.quantile(0.5),
+                "p95_s": self.quantile(0.95),
+                "p99_s": self.quantile(0.99),
+                "buckets": dict(zip(labels, self.counts)),
+            }
+
+
 # 全局单例
-tracker = MetricsTracker()
\ No newline at end of file
+tracker = MetricsTracker()
+
+
+# ============================================================
+# 跨进程指标快照：Worker 与 API 是不同进程，统计通过 Redis 汇总
+# ============================================================
+METRICS_KEY = "metrics:snapshot"
+
+def export_stats(component: str, stats: Dict[str, Any]):
+    """把组件的统计快照写入 Redis Hash，供 API 的 /metrics 读取"""
+    from app.core.event_bus import bus
+    try:
+        bus.redis.hset(METRICS_KEY, component, json.dumps(stats, default=str))
+    except Exception as e:
+        print(f"⚠️ [Metrics] 指标导出失败: {e}")
+
+def load_exported_stats() -> Dict[str, Any]:
+    """读取所有进程导出的统计快照"""
+    from app.core.event_bus import bus
+    try:
+        raw = bus.redis.hgetall(METRICS_KEY)
+    except Exception as e:
+        print(f"⚠️ [Metrics] 指标读取失败: {e}")
+        return {}
+    return {k: json.loads(v) for k, v in raw.items()}
\ No newline at end of file
@@ -0,0 +1,261 @@
+# app/core/rate_limiter.py
+import asyncio
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Mapping, Optional
+
+from app.core.config import settings
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Redis 端令牌桶：用 Redis 服务器时间计算补充量，多进程共享同一个桶。
+# 允许令牌数为负（预约制）：返回值是调用方需要等待的毫秒数。
+_ACQUIRE_LUA = """
+local now_t = redis.call('TIME')
+local now = tonumber(now_t[1]) * 1000 + math.floor(tonumber(now_t[2]) / 1000)
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'paused_until')
+local tokens = tonumber(data[1]) or capacity
+local ts = tonumber(data[2]) or now
+local paused = tonumber(data[3]) or 0
+tokens = math.min(capacity, tokens + (now - ts) / 1000 * rate)
+tokens = tokens - requested
+local wait = 0
+if paused > now then wait = paused - now end
+if tokens < 0 then wait = math.max(wait, -tokens / rate * 1000) end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], 3600000)
+return math.floor(wait)
+"""
+
+_PAUSE_LUA = """
+local now_t = redis.call('TIME')
+local now = tonumber(now_t[1]) * 1000 + math.floor(tonumber(now_t[2]) / 1000)
+local until_ms = now + tonumber(ARGV[1])
+local cur = tonumber(redis.call('HGET', KEYS[1], 'paused_until')) or 0
+if until_ms > cur then redis.call('HSET', KEYS[1], 'paused_until', until_ms) end
+redis.call('PEXPIRE', KEYS[1], 3600000)
+return until_ms
+"""
+
+# Redis 不可用时退回本地桶，隔一段时间再尝试
+_REDIS_RETRY_S = 30.0
+
+
+class TokenBucketLimiter:
+    """
+    按数据源命名的令牌桶限流器。
+      - 同一进程内跨协程、跨线程（各 Worker 的事件循环）共享；
+      - 通过 Redis 在多个 Worker 进程间共享配额；
+      - 根据响应头（Retry-After / X-RateLimit-*）自适应：暂停、降速、逐步恢复。
+    """
+
+    def __init__(self, name: str, rate: float, capacity: float = None):
+        self.name = name
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._ts = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._redis_key = f"ratelimit:{name}"
+        self._redis_down_until = 0.0
+        self._acquire_script = None
+        self._pause_script = None
+        self._pending = set()  # 进行中的异步 Redis 写入，保留引用防止任务被回收
+        self.stats = {"acquired": 0, "waited_s": 0.0, "throttled": 0, "pauses": 0}
+
+    # ------------------------------------------------------------
+    # 令牌预约
+    # ------------------------------------------------------------
+    def _reserve_local(self, tokens: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._ts) * self.rate)
+            self._ts = now
+            self._tokens -= tokens
+            wait = max(0.0, self._paused_until - now)
+            if self._tokens < 0:
+                wait = max(wait, -self._tokens / self.rate)
+            return wait
+
+    def _redis_enabled(self) -> bool:
+        return settings.rate_limit_backend == "redis" and time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, e: Exception, action: str):
+        logger.warning(f"[RateLimit] Redis 不可用（{action}），{self.name} 退回本地令牌桶: {e}")
+        self._redis_down_until = time.monotonic() + _REDIS_RETRY_S
+
+    async def _reserve_redis(self, tokens: float) -> Optional[float]:
+        """在 Redis 桶上预约令牌：走 redis.asyncio，等待网络往返时不阻塞事件循环"""
+        if not self._redis_enabled():
+            return None
+        from app.core.event_bus import bus
+        try:
+            r = bus.async_redis()
+            if self._acquire_script is None:
+                self._acquire_script = r.register_script(_ACQUIRE_LUA)
+            # 脚本对象只缓存 SHA，实际执行用当前事件循环自己的连接
+            wait_ms = await self._acquire_script(
+                keys=[self._redis_key], args=[self.rate, self.capacity, tokens], client=r)
+            return float(wait_ms) / 1000.0
+        except Exception as e:
+            self._redis_failed(e, "预约令牌")
+            return None
+
+    async def acquire(self, tokens: float = 1.0):
+        """取令牌，不够时异步等待（不阻塞事件循环）"""
+        wait = await self._reserve_redis(tokens)
+        if wait is None:
+            wait = self._reserve_local(tokens)
+        self.stats["acquired"] += 1
+        if wait > 0:
+            self.stats["waited_s"] += wait
+            await asyncio.sleep(wait)
+
+    # ------------------------------------------------------------
+    # 自适应
+    # ------------------------------------------------------------
+    def pause(self, seconds: float):
+        """
+        在 seconds 秒内暂停发放令牌（本地 + Redis）。
+        observe() 在协程里被调用：有运行中的事件循环时 Redis 写入作为后台任务异步完成。
+        """
+        if seconds <= 0:
+            return
+        self.stats["pauses"] += 1
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        if self._redis_enabled():
+            pause_ms = int(seconds * 1000)
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            if loop is not None:
+                task = loop.create_task(self._pause_redis_async(pause_ms))
+                self._pending.add(task)
+                task.add_done_callback(self._pending.discard)
+            else:
+                self._pause_redis_sync(pause_ms)
+        logger.warning(f"[RateLimit] {self.name} 暂停 {seconds:.1f}s")
+
+    async def _pause_redis_async(self, pause_ms: int):
+        from app.core.event_bus import bus
+        try:
+            r = bus.async_redis()
+            if self._pause_script is None:
+                self._pause_script = r.register_script(_PAUSE_LUA)
+            await self._pause_script(keys=[self._redis_key], args=[pause_ms], client=r)
+        except Exception as e:
+            self._redis_failed(e, "写入暂停状态")
+
+    def _pause_redis_sync(self, pause_ms: int):
+        from app.core.event_bus import bus
+        try:
+            bus.redis.eval(_PAUSE_LUA, 1, self._redis_key, pause_ms)
+        except Exception as e:
+            self._redis_failed(e, "写入暂停状态")
+
+    def observe(self, status_code: int, headers: Mapping[str, str]):
+        """
+        根据上游响应调整速率：
+          - 429/503 + Retry-After：按要求暂停；无 Retry-After 时速率减半（乘性减）
+          - X-RateLimit-Remaining 为 0：暂停到 X-RateLimit-Reset
+          - X-RateLimit-Limit 无 Reset（NCBI 的每秒配额）：直接采用服务端给出的速率
+          - 有 Reset 窗口（GitHub）：额度不足 10% 时按 剩余额度 / 剩余时间 降到可持续速率
+          - 其余成功响应：速率缓慢恢复到基准值（加性增）
+        """
+        retry_after = _parse_retry_after(headers.get("Retry-After"))
+        remaining = _to_float(headers.get("X-RateLimit-Remaining"))
+        limit = _to_float(headers.get("X-RateLimit-Limit"))
+        reset = _to_float(headers.get("X-RateLimit-Reset"))
+
+        if status_code in (429, 503) or retry_after is not None:
+            self.stats["throttled"] += 1
+            if retry_after is not None:
+                self.pause(retry_after)
+            else:
+                self.rate = max(self.base_rate / 16, self.rate / 2)
+                self.pause(1.0 / self.rate)
+            return
+
+        if remaining is not None and reset is not None:
+            window = max(1.0, reset - time.time())
+            if remaining <= 0:
+                self.stats["throttled"] += 1
+                self.pause(window)
+                return
+            if limit and remaining < limit * 0.1:
+                sustainable = remaining / window
+                self.rate = max(0.01, min(self.base_rate, sustainable))
+                return
+
+        if limit is not None and reset is None and limit > 0:
+            # NCBI：X-RateLimit-Limit 即每秒配额（有 API Key 时为 10）
+            self.base_rate = limit
+            self.capacity = max(1.0, limit)
+
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate + self.base_rate / 10)
+
+
+def _to_float(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After 可以是秒数，也可以是 HTTP 日期"""
+    if value is None:
+        return None
+    seconds = _to_float(value)
+    if seconds is not None:
+        return max(0.0, seconds)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# ============================================================
+# 注册表：按数据源名称取全局共享的限流器
+# ============================================================
+def _default_rates() -> Dict[str, float]:
+    pubmed_rate = settings.pubmed_rate_per_s
+    if settings.ncbi_api_key:
+        pubmed_rate = max(pubmed_rate, 10.0)  # NCBI 有 API Key 时 10 次/秒
+    return {
+        "pubmed": pubmed_rate,
+        "arxiv": settings.arxiv_rate_per_s,
+        "github": settings.github_rate_per_s,
+        # 搜索 API 有单独且低得多的配额，单独一个桶，避免搜索限流拖慢其它 GitHub 请求
+        "github_search": settings.github_search_rate_per_s,
+        "trials": settings.trials_rate_per_s,
+    }
+
+_limiters: Dict[str, TokenBucketLimiter] = {}
+_registry_lock = threading.Lock()
+
+def get_limiter(name: str) -> TokenBucketLimiter:
+    """取出（或创建）名为 name 的共享限流器"""
+    with _registry_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            rate = _default_rates().get(name, float(settings.max_concurrency))
+            limiter = TokenBucketLimiter(name, rate=rate)
+            _limiters[name] = limiter
+        return limiter
+
+def limiter_stats() -> Dict[str, Dict]:
+    return {
+        name: {**l.stats, "rate": round(l.rate, 3), "base_rate": l.base_rate}
+        for name, l in list(_limiters.items())
+    }
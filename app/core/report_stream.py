@@ -0,0 +1,128 @@
+# app/core/report_stream.py
+import json
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+from app.core.config import settings
+from app.core.event_bus import bus
+from app.core.logger import get_logger
+from app.core.metrics import tracker
+
+logger = get_logger("ReportStream")
+
+END_SECTION = "__end__"
+
+
+def stream_key(task_id: str) -> str:
+    return f"stream:report:{task_id}"
+
+
+class ReportStream:
+    """
+    按任务的报告分节 Stream（stream:report:{task_id}）：
+      - Writer 每生成一节就 XADD 一条 {section, index, markdown}，最后一条 section=__end__；
+      - API 的 SSE 接口从 Stream 读取并转发，前端边生成边渲染；断线重连时按 Last-Event-ID 续读；
+      - 首节发布时记录首内容时间（TTFC）：距任务提交、距 Writer 开始两种口径。
+    """
+
+    def __init__(self):
+        self.stats = {"tasks": 0, "sections": 0, "errors": 0,
+                      "ttfc_count": 0, "ttfc_last_s": None, "ttfc_max_s": 0.0, "ttfc_total_s": 0.0,
+                      "writer_ttfc_last_s": None}
+        self._started: Dict[str, Dict[str, Any]] = {}
+
+    # ------------------------------------------------------------
+    # 写（Writer 进程）
+    # ------------------------------------------------------------
+    def start(self, task_id: str, submitted_at: Optional[float] = None):
+        """Writer 开始处理任务：清掉重试留下的旧分节，记录计时起点"""
+        self._started[task_id] = {"writer_start": time.time(), "submitted_at": submitted_at, "index": 0}
+        try:
+            bus.redis.delete(stream_key(task_id))
+        except Exception as e:
+            logger.warning(f"清理报告 Stream 失败: {e}")
+
+    def publish(self, task_id: str, section: str, markdown: str):
+        state = self._started.setdefault(task_id, {"writer_start": time.time(), "submitted_at": None, "index": 0})
+        key = stream_key(task_id)
+        try:
+            pipe = bus.redis.pipeline(transaction=False)
+            pipe.xadd(key, {"section": section, "index": state["index"], "markdown": markdown})
+            pipe.expire(key, settings.report_stream_ttl_s)
+            pipe.execute()
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"报告分节发布失败 ({section}): {e}")
+            return
+        if state["index"] == 0:
+            self._record_ttfc(task_id, state)
+        state["index"] += 1
+        self.stats["sections"] += 1
+
+    def finish(self, task_id: str, status: str = "done", **extra):
+        """发布结束标记（SSE 收到后关闭连接）"""
+        self._started.pop(task_id, None)
+        self.stats["tasks"] += 1
+        key = stream_key(task_id)
+        try:
+            pipe = bus.redis.pipeline(transaction=False)
+            pipe.xadd(key, {"section": END_SECTION, "status": status, "extra": json.dumps(extra, default=str)})
+            pipe.expire(key, settings.report_stream_ttl_s)
+            pipe.execute()
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"报告结束标记发布失败: {e}")
+
+    def _record_ttfc(self, task_id: str, state: Dict[str, Any]):
+        now = time.time()
+        writer_ttfc = now - state["writer_start"]
+        ttfc = now - state["submitted_at"] if state["submitted_at"] else writer_ttfc
+        self.stats["writer_ttfc_last_s"] = round(writer_ttfc, 4)
+        self.stats["ttfc_last_s"] = round(ttfc, 4)
+        self.stats["ttfc_max_s"] = max(self.stats["ttfc_max_s"], ttfc)
+        self.stats["ttfc_total_s"] += ttfc
+        self.stats["ttfc_count"] += 1
+        tracker.record_success("report_ttfc", ttfc)
+        logger.info(f"⏱️ [Report] {task_id} 首节已发布：TTFC={ttfc:.2f}s（Writer 内 {writer_ttfc:.2f}s）")
+
+    def snapshot(self) -> Dict[str, Any]:
+        count = self.stats["ttfc_count"]
+        return {**self.stats, "ttfc_avg_s": round(self.stats["ttfc_total_s"] / count, 4) if count else None}
+
+    # ------------------------------------------------------------
+    # 读（API 进程）
+    # ------------------------------------------------------------
+    async def iter_sse(self, task_id: str, last_id: str = "0") -> AsyncIterator[str]:
+        """
+        以 SSE 文本格式逐条产出分节；用 redis.asyncio 阻塞读取，等待期间不占用线程池，
+        空闲时发送注释行保活。事件 ID 即 Stream 消息 ID，客户端重连时带 Last-Event-ID 从断点继续。
+        """
+        key = stream_key(task_id)
+        deadline = time.time() + settings.report_stream_timeout_s
+        while time.time() < deadline:
+            try:
+                resp = await bus.async_redis().xread({key: last_id}, count=50, block=settings.report_stream_block_ms)
+            except Exception as e:
+                logger.warning(f"读取报告 Stream 失败: {e}")
+                yield _sse("error", {"detail": "stream unavailable"})
+                return
+            if not resp:
+                yield ": keep-alive\n\n"
+                continue
+            for msg_id, fields in resp[0][1]:
+                last_id = msg_id
+                if fields.get("section") == END_SECTION:
+                    yield _sse("end", {"status": fields.get("status"), **json.loads(fields.get("extra") or "{}")}, msg_id)
+                    return
+                yield _sse("section", {"section": fields.get("section"), "index": int(fields.get("index", 0)),
+                                       "markdown": fields.get("markdown", "")}, msg_id)
+        yield _sse("timeout", {"detail": "report stream timed out"})
+
+
+def _sse(event: str, data: Dict[str, Any], event_id: Optional[str] = None) -> str:
+    head = f"id: {event_id}\n" if event_id else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+# 全局单例
+report_stream = ReportStream()
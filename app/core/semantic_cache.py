@@ -0,0 +1,183 @@
+# app/core/semantic_cache.py
+import hashlib
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.cache import _MISS, cache_engine, make_cache_key
+from app.core.config import settings
+from app.core.data_clean import normalize_topic
+from app.core.event_bus import bus
+from app.core.logger import get_logger
+from app.tools.chroma_client import client
+from app.tools.embedding_service import embedder
+
+logger = get_logger("SemanticCache")
+
+# 每次查找的相似度与命中决策写入这个 Stream，供离线调阈值（app/eval/tune_semantic_cache.py）
+DECISION_STREAM = "stream:semantic_cache"
+
+
+class SemanticCache:
+    """
+    语义近重复缓存："polyp segmentation" / "colon polyp segmentation" / "Polyp Segmentation "
+    这类说法不同但含义相同的查询复用同一份结果。
+      - 查询向量（复用 embedder 的查询 LRU）存进专用的小集合 semantic_cache（cosine 空间）；
+      - 查找时取最近邻，余弦相似度 ≥ SEMANTIC_CACHE_THRESHOLD 且其它参数 / 代际号一致才算命中；
+      - 结果本身存在 cache_engine（本地 LRU → Redis），向量索引只保存指向结果的 key；
+      - 每次查找的 (查询, 最近邻, 相似度, 是否命中) 记录到 Redis Stream，阈值可离线调优。
+    """
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self._collection = None
+        self._purged: Dict[str, int] = {}
+        self.stats = {"lookups": 0, "hits": 0, "exact_hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            self._collection = client.get_or_create_collection(
+                name="semantic_cache", metadata={"hnsw:space": "cosine"})
+        return self._collection
+
+    # ------------------------------------------------------------
+    # 查找 / 写入
+    # ------------------------------------------------------------
+    def lookup(self, namespace: str, query: str, params_key: str = "", generation: Optional[str] = None) -> Any:
+        """返回缓存结果；未命中返回 _MISS"""
+        if not settings.semantic_cache_enabled:
+            return _MISS
+        self.stats["lookups"] += 1
+        normalized = normalize_topic(query)
+        try:
+            where = self._where(namespace, params_key, generation)
+            res = self.collection.query(
+                query_embeddings=embedder.embed_queries([normalized]).tolist(),
+                n_results=1, where=where, include=["metadatas", "distances"])
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"语义缓存查找失败: {e}")
+            return _MISS
+        if not res["ids"] or not res["ids"][0]:
+            self._record(namespace, normalized, None, None, False)
+            self.stats["misses"] += 1
+            return _MISS
+
+        meta = res["metadatas"][0][0]
+        similarity = 1.0 - float(res["distances"][0][0])  # cosine 空间：distance = 1 - cos
+        hit = similarity >= self.threshold
+        value = cache_engine.get(meta["result_key"], prefix=f"semantic:{namespace}") if hit else _MISS
+        hit = value is not _MISS  # 向量还在、结果已过期也算未命中
+        self._record(namespace, normalized, meta.get("query"), similarity, hit)
+        if not hit:
+            self.stats["misses"] += 1
+            return _MISS
+        self.stats["hits"] += 1
+        if meta.get("query") == normalized:
+            self.stats["exact_hits"] += 1
+        else:
+            logger.info(f"🧲 [SemanticCache] '{normalized}' ≈ '{meta.get('query')}' (cos={similarity:.3f})")
+        return value
+
+    def store(self, namespace: str, query: str, value: Any, ttl: float,
+              params_key: str = "", generation: Optional[str] = None):
+        if not settings.semantic_cache_enabled:
+            return
+        normalized = normalize_topic(query)
+        gen = cache_engine.generation(generation) if generation else 0
+        entry_id = hashlib.sha1(f"{namespace}\x1f{params_key}\x1f{gen}\x1f{normalized}".encode()).hexdigest()
+        result_key = f"semantic:{namespace}:{entry_id}"
+        try:
+            cache_engine.set(result_key, value, ttl, prefix=f"semantic:{namespace}")
+            self.collection.upsert(
+                ids=[entry_id],
+                embeddings=embedder.embed_queries([normalized]).tolist(),
+                metadatas=[{"namespace": namespace, "params": params_key, "generation": gen,
+                            "query": normalized, "result_key": result_key,
+                            "expires_at": time.time() + ttl}],
+            )
+            self.stats["stores"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"语义缓存写入失败: {e}")
+            return
+        if generation:
+            self._purge_old_generations(generation, gen)
+
+    def get_or_compute(self, namespace: str, query: str, fn: Callable[[], Any], ttl: float,
+                       params_key: str = "", generation: Optional[str] = None) -> Any:
+        value = self.lookup(namespace, query, params_key, generation)
+        if value is not _MISS:
+            return value
+        value = fn()
+        if value is not None:
+            self.store(namespace, query, value, ttl, params_key, generation)
+        return value
+
+    # ------------------------------------------------------------
+    # 内部
+    # ------------------------------------------------------------
+    def _where(self, namespace: str, params_key: str, generation: Optional[str]) -> Dict:
+        conds: List[Dict] = [{"namespace": namespace}, {"params": params_key}]
+        if generation:
+            conds.append({"generation": cache_engine.generation(generation)})
+        return {"$and": conds}
+
+    def _purge_old_generations(self, generation: str, gen: int):
+        """数据代际更新后，旧代际的向量已不可能命中，顺手删掉，集合保持很小"""
+        if self._purged.get(generation) == gen:
+            return
+        self._purged[generation] = gen
+        try:
+            self.collection.delete(where={"generation": {"$lt": gen}})
+        except Exception as e:
+            logger.warning(f"清理旧代际语义缓存失败: {e}")
+
+    def _record(self, namespace: str, query: str, matched: Optional[str], similarity: Optional[float], hit: bool):
+        """记录一次决策（相似度 + 是否命中），Stream 按 SEMANTIC_CACHE_LOG_MAXLEN 近似截断"""
+        if settings.semantic_cache_log_maxlen <= 0:
+            return
+        try:
+            bus.redis.xadd(DECISION_STREAM, {
+                "namespace": namespace,
+                "query": query,
+                "matched": matched or "",
+                "similarity": "" if similarity is None else f"{similarity:.4f}",
+                "threshold": f"{self.threshold:.4f}",
+                "hit": int(hit),
+                "ts": f"{time.time():.3f}",
+            }, maxlen=settings.semantic_cache_log_maxlen, approximate=True)
+        except Exception as e:
+            logger.warning(f"语义缓存决策记录失败: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["lookups"]
+        return {**self.stats, "threshold": self.threshold,
+                "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0}
+
+
+# 全局单例
+semantic_cache = SemanticCache(settings.semantic_cache_threshold)
+
+
+def semantic_cached(namespace: str, ttl_seconds: float = 3600, generation: Optional[str] = None,
+                    query_arg: str = "query"):
+    """
+    装饰器：按第一个参数（或名为 query_arg 的参数）做语义近重复缓存，其余参数必须完全一致。
+    一般叠在 cache_result 内层：完全相同的调用先由外层 cache_result 命中（不做向量检索），
+    说法不同的近重复查询才走到这里。
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if args:
+                query, rest_args, rest_kwargs = args[0], args[1:], kwargs
+            else:
+                rest_kwargs = dict(kwargs)
+                query, rest_args = rest_kwargs.pop(query_arg), ()
+            params_key = make_cache_key(namespace, func.__name__, rest_args, rest_kwargs)
+            return semantic_cache.get_or_compute(
+                namespace, query, lambda: func(*args, **kwargs), ttl_seconds, params_key, generation)
+        return wrapper
+    return decorator
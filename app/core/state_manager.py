@@ -59,6 +59,13 @@ class StateManager:
             }
         )
 
+    def save_report_meta(self, task_id: str, meta: dict):
+        """记录报告元数据（Markdown 路径、内容 hash、大小等），PDF 按需生成"""
+        db.tasks.update_one(
+            {"task_id": task_id},
+            {"$set": {"report": meta, "updated_at": datetime.utcnow()}}
+        )
+
     def mark_task_done(self, task_id: str, artifact_path: str = None):
         """任务结束"""
         update_doc = {
@@ -0,0 +1,75 @@
+# app/core/watermark.py
+from datetime import datetime
+from typing import Any, Dict
+from app.core.data_clean import normalize_topic
+from app.core.logger import get_logger
+
+logger = get_logger("Watermark")
+
+
+class WatermarkStore:
+    """
+    增量抓取水位线：每个 (数据源, 规范化主题) 记录上次抓取到的位置，
+    下次只抓水位线之后的新内容。持久化在 MongoDB 的 watermarks 集合。
+
+    各数据源的水位线字段：
+      - pubmed: last_edat      上次抓取日期（Entrez 日期，YYYY/MM/DD）
+      - arxiv:  published      已入库论文的最新 published 时间
+      - github: crawled_at     上次抓取时间（与仓库 updated_at 比较）
+      - trials: last_update    已入库试验的最新 LastUpdatePostDate
+
+    水位线同时记录覆盖深度 depth（抓取条数上限 max_results / top_n）：
+    浅抓取（depth=5）留下的水位线只保证最新 5 条已入库，之后的深抓取（depth=50）
+    不能据此跳过更早的内容，因此 get() 在已记录深度不足时返回空（按全量抓取）。
+    """
+
+    def get(self, source: str, topic: str, depth: int) -> Dict[str, Any]:
+        from app.core.db import db
+        try:
+            doc = db.watermarks.find_one(
+                {"source": source, "topic_key": normalize_topic(topic)},
+                {"_id": 0},
+            )
+        except Exception as e:
+            logger.warning(f"读取水位线失败，按全量抓取: {e}", source=source)
+            return {}
+        mark = (doc or {}).get("mark", {})
+        if mark.get("depth", 0) < depth:
+            if mark:
+                logger.info(f"水位线深度 {mark.get('depth', 0)} < {depth}，按全量抓取", source=source)
+            return {}
+        return mark
+
+    def set(self, source: str, topic: str, depth: int, capped: bool = True, **mark):
+        """
+        合并写入水位线字段（只在本次入库成功后调用）。
+        capped: 本次抓取是否因达到 depth 条上限而停止。没有截断说明已经接上旧水位线，
+                原有的覆盖深度仍然有效（取较大值）；截断时旧水位线与本次结果之间可能有遗漏，
+                覆盖深度只能记为本次的 depth。
+        """
+        from app.core.db import db
+        if not mark:
+            return
+        update = {
+            "$set": {
+                **{f"mark.{k}": v for k, v in mark.items()},
+                "updated_at": datetime.utcnow(),
+            }
+        }
+        if capped:
+            update["$set"]["mark.depth"] = depth
+        else:
+            update["$max"] = {"mark.depth": depth}
+        try:
+            db.watermarks.update_one(
+                {"source": source, "topic_key": normalize_topic(topic)},
+                update,
+                upsert=True,
+            )
+            logger.info(f"更新水位线: {mark}", source=source, topic=normalize_topic(topic))
+        except Exception as e:
+            logger.warning(f"写入水位线失败: {e}", source=source)
+
+
+# 全局单例
+watermarks = WatermarkStore()
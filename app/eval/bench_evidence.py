@@ -0,0 +1,66 @@
+# app/eval/bench_evidence.py
+"""
+证据合并评测：分块矩阵乘法 + 并查集的余弦聚类在不同句子数下的耗时与聚类质量。
+
+用法:
+    python -m app.eval.bench_evidence                       # 合成向量：1000 / 2000 / 5000 / 10000 句
+    python -m app.eval.bench_evidence --sizes 5000 --dim 768 --block 512
+    python -m app.eval.bench_evidence --real 2000           # 用真实嵌入模型嵌入 2000 个合成分块的事实句
+
+合成向量：K 个随机"事实中心"，每个句子 = 中心 + 高斯噪声（同一事实的句子余弦约 0.9，不同事实约 0），
+模拟"换了说法的同一事实"。只计时聚类阶段（嵌入由 EmbeddingService 批量完成并有磁盘缓存）。
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.agents.evidence import consolidate_evidence, similarity_clusters
+from app.core.config import settings
+from app.eval.bench_fact_clustering import pairwise_quality, synthetic_chunks
+
+
+def synthetic_vectors(n: int, dim: int, seed: int = 0, noise: float = 0.3):
+    rng = np.random.default_rng(seed)
+    k = max(2, n // 4)
+    centers = rng.standard_normal((k, dim)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    labels = rng.integers(0, k, size=n)
+    vectors = centers[labels] + noise * rng.standard_normal((n, dim)).astype(np.float32) / np.sqrt(dim)
+    return vectors, labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="嵌入相似度证据合并：耗时与质量")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 2000, 5000, 10000])
+    parser.add_argument("--dim", type=int, default=384, help="向量维度（all-MiniLM-L6-v2 为 384）")
+    parser.add_argument("--block", type=int, default=settings.evidence_block_size)
+    parser.add_argument("--threshold", type=float, default=settings.evidence_similarity)
+    parser.add_argument("--real", type=int, default=0, help="用真实嵌入评测的合成分块数，0 跳过")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'句子数':<7} | {'簇数':<6} | {'precision':<9} | {'recall':<6} | 聚类耗时(ms, 取 {args.repeat} 次最小)")
+    for n in args.sizes:
+        vectors, labels = synthetic_vectors(n, args.dim)
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            clusters = similarity_clusters(vectors, args.threshold, args.block)
+            best = min(best, time.perf_counter() - start)
+        sentences = [str(i) for i in range(n)]
+        precision, recall = pairwise_quality(sentences, clusters, dict(zip(sentences, labels.tolist())))
+        print(f"{n:<7} | {len(clusters):<6} | {precision:<9.3f} | {recall:<6.3f} | {best * 1000:.1f}")
+
+    if args.real:
+        chunks, _ = synthetic_chunks(args.real, 3)
+        start = time.perf_counter()
+        fact_map = consolidate_evidence(chunks, args.threshold)
+        elapsed = time.perf_counter() - start
+        multi = sum(len({c["metadata"]["source"] for c in items}) >= 2 for items in fact_map.values())
+        print(f"\n真实嵌入：{args.real} 个分块 → {len(fact_map)} 个事实簇，其中 {multi} 个有 ≥2 个来源支持，"
+              f"总耗时 {elapsed:.2f}s（含嵌入）")
+
+
+if __name__ == "__main__":
+    main()
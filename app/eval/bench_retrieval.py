@@ -0,0 +1,146 @@
+# app/eval/bench_retrieval.py
+"""
+检索评测：对比纯向量检索与混合检索（向量 + BM25，RRF 融合）的 recall@k 与单次查询延迟。
+
+用法:
+    python -m app.eval.bench_retrieval                  # 默认从 ./chroma_db 的 medical_docs 抽样，库为空时用合成语料
+    python -m app.eval.bench_retrieval --synthetic      # 强制使用合成语料
+    python -m app.eval.bench_retrieval -n 300 -k 1 5 10
+
+评测方式（known-item）：每个抽样分块生成一条查询 = 分块中最罕见的 2 个词 + 随机 3 个普通词，
+期望返回该分块本身。罕见词模拟药名 / NCT 号 / 基因符号这类精确术语。
+语料写入临时的 EphemeralClient 集合与临时 BM25 索引，不会改动线上数据。
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import chromadb
+
+from app.tools.bm25_index import Bm25Index, _terms
+from app.tools.embedding_service import embedder
+from app.tools.rag_query import query_rag_many
+
+_DRUGS = ["pembrolizumab", "nivolumab", "atezolizumab", "trastuzumab", "osimertinib", "olaparib",
+          "bevacizumab", "semaglutide", "tirzepatide", "dapagliflozin", "empagliflozin", "rituximab"]
+_GENES = ["BRCA1", "BRCA2", "EGFR", "KRAS", "TP53", "ALK", "HER2", "PIK3CA", "BRAF", "ROS1", "MET", "RET"]
+_DISEASES = ["non-small cell lung cancer", "breast cancer", "colorectal polyps", "type 2 diabetes",
+             "heart failure", "melanoma", "ovarian cancer", "diabetic retinopathy"]
+_METHODS = ["U-Net segmentation", "transformer classifier", "gradient boosting model",
+            "self-supervised pretraining", "diffusion model", "graph neural network"]
+
+
+def synthetic_corpus(n: int, seed: int = 0) -> List[Tuple[str, str, Dict]]:
+    """合成语料：每条文档带一个唯一 NCT 号，疾病 / 药物 / 基因 / 方法随机组合"""
+    rng = random.Random(seed)
+    docs = []
+    for i in range(n):
+        nct = f"NCT{rng.randint(10**7, 10**8 - 1):08d}"
+        drug, gene = rng.choice(_DRUGS), rng.choice(_GENES)
+        disease, method = rng.choice(_DISEASES), rng.choice(_METHODS)
+        text = (f"Trial {nct} evaluates {drug} in patients with {gene}-mutant {disease}. "
+                f"Imaging endpoints were analysed with a {method}. "
+                f"Enrollment target is {rng.randint(20, 900)} participants across {rng.randint(1, 40)} sites.")
+        source = rng.choice(["pubmed", "arxiv", "clinical_trials", "github"])
+        docs.append((f"syn_{i}", text, {"source": source}))
+    return docs
+
+
+def chroma_corpus(n: int, seed: int = 0) -> List[Tuple[str, str, Dict]]:
+    """从本地 medical_docs 集合抽样"""
+    from app.tools.chroma_client import collection
+    total = collection.count()
+    if total == 0:
+        return []
+    page = collection.get(limit=min(total, max(n * 5, 2000)), include=["documents", "metadatas"])
+    rows = [(i, d, m or {}) for i, d, m in zip(page["ids"], page["documents"], page["metadatas"]) if d]
+    random.Random(seed).shuffle(rows)
+    return rows
+
+
+def make_queries(docs: List[Tuple[str, str, Dict]], n: int, seed: int = 0) -> List[Tuple[str, str]]:
+    """known-item 查询：(查询文本, 期望命中的分块 ID)"""
+    rng = random.Random(seed)
+    df = Counter()
+    for _, text, _ in docs:
+        df.update(set(_terms(text)))
+    queries = []
+    for doc_id, text, _ in rng.sample(docs, min(n, len(docs))):
+        terms = list(dict.fromkeys(_terms(text)))
+        if len(terms) < 5:
+            continue
+        rare = sorted(terms, key=lambda t: (df[t], rng.random()))[:2]
+        common = rng.sample([t for t in terms if t not in rare], 3)
+        words = rare + common
+        rng.shuffle(words)
+        queries.append((" ".join(words), doc_id))
+    return queries
+
+
+def run(mode: str, queries: List[Tuple[str, str]], ks: List[int], coll, index) -> Dict:
+    # 每种模式都从空的查询向量 LRU 开始，否则后跑的模式直接命中前一轮的查询向量，延迟偏低
+    embedder.query_cache.clear()
+    hits = {k: 0 for k in ks}
+    latencies = []
+    for q, expected in queries:
+        start = time.perf_counter()
+        results = query_rag_many([q], top_k=max(ks), hybrid=(mode == "hybrid"), coll=coll, index=index)[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        ranked = [r["id"] for r in results]
+        for k in ks:
+            hits[k] += expected in ranked[:k]
+    latencies.sort()
+    return {
+        "recall": {k: hits[k] / len(queries) for k in ks},
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量检索 vs 混合检索 recall@k / 延迟评测")
+    parser.add_argument("-n", "--num-queries", type=int, default=200)
+    parser.add_argument("-k", "--ks", type=int, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--corpus-size", type=int, default=1000, help="合成语料条数")
+    parser.add_argument("--synthetic", action="store_true", help="使用合成语料")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    docs = [] if args.synthetic else chroma_corpus(args.corpus_size, args.seed)
+    corpus_name = "medical_docs"
+    if not docs:
+        docs = synthetic_corpus(args.corpus_size, args.seed)
+        corpus_name = "synthetic"
+    print(f"📚 语料: {corpus_name}，{len(docs)} 个分块")
+
+    coll = chromadb.EphemeralClient().get_or_create_collection(name="bench_retrieval", embedding_function=embedder)
+    index = Bm25Index(os.path.join(tempfile.mkdtemp(prefix="bench_bm25_"), "bm25.sqlite3"))
+    step = 1000
+    for i in range(0, len(docs), step):
+        part = docs[i:i + step]
+        coll.add(ids=[d[0] for d in part], documents=[d[1] for d in part], metadatas=[d[2] or {"source": "unknown"} for d in part])
+        index.upsert((d[0], d[1], (d[2] or {}).get("source"), (d[2] or {}).get("date_int")) for d in part)
+
+    queries = make_queries(docs, args.num_queries, args.seed)
+    print(f"🔎 查询: {len(queries)} 条 known-item 查询\n")
+
+    # 预热：加载模型、建立 SQLite 连接
+    run("vector", queries[:3], args.ks, coll, index)
+    run("hybrid", queries[:3], args.ks, coll, index)
+
+    header = f"{'模式':<8} | " + " | ".join(f"R@{k:<4}" for k in args.ks) + " | p50(ms) | p95(ms)"
+    print(header)
+    print("-" * len(header))
+    for mode in ("vector", "hybrid"):
+        r = run(mode, queries, args.ks, coll, index)
+        recalls = " | ".join(f"{r['recall'][k]:<6.3f}" for k in args.ks)
+        print(f"{mode:<8} | {recalls} | {r['p50_ms']:<7.1f} | {r['p95_ms']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
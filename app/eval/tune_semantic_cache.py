@@ -0,0 +1,72 @@
+# app/eval/tune_semantic_cache.py
+"""
+语义缓存阈值调优：读取 semantic_cache 记录在 Redis Stream 中的查找决策，
+统计不同阈值下的命中率，并列出阈值附近的 (查询, 最近邻) 对，供人工判断是否真的是同一个问题。
+
+用法:
+    python -m app.eval.tune_semantic_cache                       # 最近 10000 条决策
+    python -m app.eval.tune_semantic_cache --namespace report -t 0.85 0.9 0.95
+    python -m app.eval.tune_semantic_cache --border 0.03 --show 30
+"""
+import argparse
+import statistics
+from typing import Dict, List
+
+from app.core.event_bus import bus
+from app.core.semantic_cache import DECISION_STREAM
+
+
+def load_decisions(count: int, namespace: str = None) -> List[Dict]:
+    rows = []
+    for _, fields in bus.redis.xrevrange(DECISION_STREAM, count=count):
+        if namespace and fields.get("namespace") != namespace:
+            continue
+        rows.append({
+            "namespace": fields.get("namespace"),
+            "query": fields.get("query"),
+            "matched": fields.get("matched") or None,
+            "similarity": float(fields["similarity"]) if fields.get("similarity") else None,
+            "hit": fields.get("hit") == "1",
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="语义缓存阈值调优")
+    parser.add_argument("-n", "--count", type=int, default=10000, help="读取最近多少条决策")
+    parser.add_argument("--namespace", default=None, help="只看某个分区（rag / report）")
+    parser.add_argument("-t", "--thresholds", type=float, nargs="+", default=[0.8, 0.85, 0.9, 0.92, 0.95, 0.98])
+    parser.add_argument("--border", type=float, default=0.02, help="列出与当前阈值相差不超过该值的样本")
+    parser.add_argument("--show", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = load_decisions(args.count, args.namespace)
+    if not rows:
+        print("📭 没有决策记录（SEMANTIC_CACHE_LOG_MAXLEN=0 或尚无查询）")
+        return
+    sims = [r["similarity"] for r in rows if r["similarity"] is not None and r["matched"] != r["query"]]
+    exact = sum(r["matched"] == r["query"] for r in rows)
+    print(f"📊 决策 {len(rows)} 条：实际命中 {sum(r['hit'] for r in rows)}，完全相同 {exact}，"
+          f"有最近邻且不同 {len(sims)}")
+    if sims:
+        q = statistics.quantiles(sims, n=20) if len(sims) >= 20 else sims
+        print(f"   相似度 min={min(sims):.3f} p50={statistics.median(sims):.3f} "
+              f"p95={q[-1]:.3f} max={max(sims):.3f}\n")
+
+    print(f"{'阈值':<6} | 近重复命中 | 命中率(含完全相同)")
+    for t in sorted(args.thresholds):
+        near = sum(s >= t for s in sims)
+        print(f"{t:<6.3f} | {near:<10} | {(near + exact) / len(rows):.3f}")
+
+    from app.core.config import settings
+    current = settings.semantic_cache_threshold
+    border = sorted((r for r in rows if r["similarity"] is not None and r["matched"] != r["query"]
+                     and abs(r["similarity"] - current) <= args.border),
+                    key=lambda r: -r["similarity"])
+    print(f"\n🔍 当前阈值 {current} 附近 ±{args.border} 的样本（✅ 命中 / ❌ 未命中）:")
+    for r in border[:args.show]:
+        print(f"  {'✅' if r['hit'] else '❌'} {r['similarity']:.3f}  '{r['query']}'  ≈  '{r['matched']}'")
+
+
+if __name__ == "__main__":
+    main()
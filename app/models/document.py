@@ -1,16 +1,29 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Union
 from datetime import datetime
 
 class DocumentMetadata(BaseModel):
     """统一的文档元数据"""
     source: str
+    source_id: Optional[str] = None  # 源文档 ID（PMID / arXiv URL / 仓库名 / NCT 号）
     url: Optional[str] = None
     date: Optional[str] = Field(default=None, strict=True)
     section: Optional[str] = None # 章节、段落标题等
+    # 各数据源特有字段（检索结果展示、数据分析、日期过滤要用；未声明的字段会被丢弃）
+    title: Optional[str] = None                        # pubmed / arxiv
+    doi: Optional[str] = None                          # arxiv
+    pmid: Optional[str] = None                         # pubmed
+    repo: Optional[str] = None                         # github：owner/name
+    stars: Optional[int] = None                        # github
+    updated_at: Optional[str] = None                   # github：ISO-8601，入库时换算成 date_int
+    trial_id: Optional[str] = None                     # clinical_trials：NCT 号
+    trial_title: Optional[str] = None
+    trial_status: Optional[str] = None
+    trial_enrollment: Optional[Union[int, str]] = None  # 缺失时为 "unknown"
 
 class DocumentChunk(BaseModel):
     """单个分块（Chunk）"""
     chunk_id: str
     content: str
+    content_hash: Optional[str] = None  # 内容 sha1，入库时据此跳过未变化的分块
     metadata: DocumentMetadata
\ No newline at end of file
@@ -6,6 +6,13 @@ class TaskState(str, Enum):
     done    = "DONE"
     failed  = "FAILED"
 
+class SourceType(str, Enum):
+    """向量库中的数据源标签（metadata["source"]）"""
+    pubmed          = "pubmed"
+    arxiv           = "arxiv"
+    github          = "github"
+    clinical_trials = "clinical_trials"
+
 class ArtifactType(str, Enum):
     markdown = "MARKDOWN"
     pdf      = "PDF"
@@ -1,14 +1,17 @@
 # app\tools\arxiv_client.py
-import httpx
-from typing import List, Dict
+from typing import List, Dict, Optional
+from app.core.config import settings
 from app.core.logger import get_logger
-from app.tools.chunking import chunk_text
+from app.core.http_pool import http_pool
+from app.core.watermark import watermarks
+from app.models.enums import SourceType
+from app.tools.chunking import sentence_chunk
 from app.models.document import DocumentChunk
 from app.core.chaos import chaos  # 导入混沌
 
 logger = get_logger(__name__)
 
-async def fetch_arxiv(topic: str, max_results: int = 10) -> List[Dict]:
+async def fetch_arxiv(topic: str, max_results: int = 10, since: Optional[str] = None) -> List[Dict]:
     # === 埋雷 ===
     try:
         chaos.simulate("ArXiv_API") 
@@ -19,6 +22,7 @@ async def fetch_arxiv(topic: str, max_results: int = 10) -> List[Dict]:
     """
     搜索 arXiv 文献，返回 title/abstract/date/url/doi 等信息。
     arXiv 使用 Atom XML，需要手动解析。
+    since: 增量模式，按提交时间倒序检索，只保留 published 晚于该时间的论文
     """
     try:
         ARXIV_API = "https://export.arxiv.org/api/query"
@@ -31,19 +35,23 @@ async def fetch_arxiv(topic: str, max_results: int = 10) -> List[Dict]:
             "start": 0,
             "max_results": max_results,
         }
-
-        async with httpx.AsyncClient(timeout=10.0, headers=headers) as client:
-            resp = await client.get(ARXIV_API, params=params)
-            print(f"📡 [ArXiv] HTTP 状态码: {resp.status_code}")
-            if resp.status_code != 200:
-                print(f"❌ ArXiv 返回错误状态码。内容摘要: {resp.text[:200]}")
-                return []
-            xml_text = resp.text
-
-            papers = parse_arxiv_xml(xml_text)
-            logger.info(f"[arXiv] 状态码：{resp.status_code}，解析到 {len(papers)} 篇论文（topic='{topic}'）")
-
-            return papers
+        if since:
+            params.update({"sortBy": "submittedDate", "sortOrder": "descending"})
+
+        resp = await http_pool.get(ARXIV_API, limiter="arxiv", params=params, headers=headers)
+        print(f"📡 [ArXiv] HTTP 状态码: {resp.status_code}")
+        if resp.status_code != 200:
+            print(f"❌ ArXiv 返回错误状态码。内容摘要: {resp.text[:200]}")
+            return []
+        xml_text = resp.text
+
+        papers = parse_arxiv_xml(xml_text)
+        if since:
+            # published 为 ISO-8601（...Z），可以直接按字符串比较
+            papers = [p for p in papers if p["date"] > since]
+        logger.info(f"[arXiv] 状态码：{resp.status_code}，解析到 {len(papers)} 篇论文（topic='{topic}'）")
+
+        return papers
             
     except Exception as e:
         logger.error(f"ArXiv 请求失败: {e}")
@@ -88,20 +96,29 @@ def parse_arxiv_xml(xml_text: str) -> List[Dict]:
     return results
 
 
-async def ingest_arxiv(topic: str, max_results: int = 5) -> int:
-    """arXiv → 分块 → 入库"""
-    papers = await fetch_arxiv(topic, max_results)
+async def ingest_arxiv(topic: str, max_results: int = 5, incremental: bool = None) -> int:
+    """arXiv → 分块 → 入库（增量模式只抓水位线之后发布的论文）"""
+    incremental = settings.incremental_ingest if incremental is None else incremental
+    mark = watermarks.get("arxiv", topic, depth=max_results) if incremental else {}
+
+    papers = await fetch_arxiv(topic, max_results, since=mark.get("published"))
     all_chunks: List[DocumentChunk] = []
 
     for paper in papers:
-        chunks = chunk_text(
+        chunks = sentence_chunk(
             text=paper["abstract"],
-            source="arxiv",
+            source=SourceType.arxiv.value,
             metadata_extra=paper,
+            source_id=paper["url"],
         )
         all_chunks.extend(chunks)
 
-    from app.tools.chroma_client import ingest
-    ingest(all_chunks)
+    from app.tools.ingest_queue import ingest_queue
+    await ingest_queue.ingest_async(all_chunks)
+
+    if papers:
+        latest = max(p["date"] for p in papers)
+        watermarks.set("arxiv", topic, depth=max_results, capped=len(papers) >= max_results,
+                       published=max(latest, mark.get("published") or ""))
 
     return len(all_chunks)
@@ -0,0 +1,174 @@
+# app/tools/bm25_index.py
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.tools.chunking import tokenize
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunk_ids (
+    rowid  INTEGER PRIMARY KEY,
+    doc_id TEXT NOT NULL UNIQUE,
+    source TEXT,
+    date_int INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_chunk_ids_source ON chunk_ids(source);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunk_fts USING fts5(body, tokenize='unicode61 remove_diacritics 2');
+"""
+
+
+def _terms(text: str) -> List[str]:
+    """与分块器一致的分词（中文逐字），去掉标点，统一小写"""
+    return [t.lower() for t in tokenize(text) if t[0].isalnum()]
+
+
+def _match_expr(query: str) -> Optional[str]:
+    """把查询转成 FTS5 的 OR 表达式；每个词加引号，避免 AND / NOT / 冒号等被当作语法"""
+    terms = list(dict.fromkeys(_terms(query)))
+    if not terms:
+        return None
+    return " OR ".join('"{}"'.format(t.replace('"', '""')) for t in terms)
+
+
+class Bm25Index:
+    """
+    与 medical_docs 集合同步的持久化倒排索引（SQLite FTS5，bm25 打分）。
+      - chroma_client.ingest 写入 / 删除分块时增量更新，ID 与 Chroma 分块 ID 一致；
+      - 文本先用 chunking.tokenize 分词再写入，中文逐字、英文按词，药名 / NCT 号 / 基因符号按原样匹配；
+      - chunk_ids 表记录 doc_id、source 与 date_int，检索时可按数据源与日期范围过滤。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.stats = {"searches": 0, "search_time_s": 0.0, "upserts": 0, "deletes": 0}
+
+    def _db(self) -> sqlite3.Connection:
+        """首次使用时建库（调用方需持有 _lock）"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            cols = {row[1] for row in conn.execute("PRAGMA table_info(chunk_ids)")}
+            if "date_int" not in cols:  # 旧版索引没有日期列
+                conn.execute("ALTER TABLE chunk_ids ADD COLUMN date_int INTEGER")
+            self._conn = conn
+        return self._conn
+
+    # ------------------------------------------------------------
+    # 写
+    # ------------------------------------------------------------
+    def upsert(self, items: Iterable[Tuple[str, str, Optional[str], Optional[int]]]):
+        """items: (doc_id, 文本, source, date_int)；已存在的 doc_id 覆盖"""
+        items = list(items)
+        if not items:
+            return
+        with self._lock:
+            db = self._db()
+            with db:
+                for doc_id, text, source, date_int in items:
+                    row = db.execute("SELECT rowid FROM chunk_ids WHERE doc_id = ?", (doc_id,)).fetchone()
+                    if row:
+                        rowid = row[0]
+                        db.execute("DELETE FROM chunk_fts WHERE rowid = ?", (rowid,))
+                        db.execute("UPDATE chunk_ids SET source = ?, date_int = ? WHERE rowid = ?",
+                                   (source, date_int, rowid))
+                    else:
+                        rowid = db.execute("INSERT INTO chunk_ids(doc_id, source, date_int) VALUES (?, ?, ?)",
+                                           (doc_id, source, date_int)).lastrowid
+                    db.execute("INSERT INTO chunk_fts(rowid, body) VALUES (?, ?)", (rowid, " ".join(_terms(text))))
+        self.stats["upserts"] += len(items)
+
+    def delete(self, doc_ids: Sequence[str]):
+        if not doc_ids:
+            return
+        with self._lock:
+            db = self._db()
+            with db:
+                for doc_id in doc_ids:
+                    row = db.execute("SELECT rowid FROM chunk_ids WHERE doc_id = ?", (doc_id,)).fetchone()
+                    if row:
+                        db.execute("DELETE FROM chunk_fts WHERE rowid = ?", (row[0],))
+                        db.execute("DELETE FROM chunk_ids WHERE rowid = ?", (row[0],))
+        self.stats["deletes"] += len(doc_ids)
+
+    # ------------------------------------------------------------
+    # 读
+    # ------------------------------------------------------------
+    def search(self, query: str, top_k: int = 10, sources: Optional[Sequence[str]] = None,
+               date_from: Optional[int] = None, date_to: Optional[int] = None) -> List[Tuple[str, float]]:
+        """返回 [(doc_id, bm25 分数)]，分数越大越相关；date_from / date_to 为 YYYYMMDD 闭区间"""
+        expr = _match_expr(query)
+        if expr is None:
+            return []
+        sql = ("SELECT i.doc_id, bm25(chunk_fts) AS s FROM chunk_fts "
+               "JOIN chunk_ids i ON i.rowid = chunk_fts.rowid WHERE chunk_fts MATCH ?")
+        args: list = [expr]
+        if sources:
+            sql += f" AND i.source IN ({','.join('?' * len(sources))})"
+            args.extend(sources)
+        if date_from is not None:
+            sql += " AND i.date_int >= ?"
+            args.append(date_from)
+        if date_to is not None:
+            sql += " AND i.date_int <= ?"
+            args.append(date_to)
+        sql += " ORDER BY s LIMIT ?"
+        args.append(top_k)
+
+        start = time.time()
+        with self._lock:
+            rows = self._db().execute(sql, args).fetchall()
+        self.stats["searches"] += 1
+        self.stats["search_time_s"] += time.time() - start
+        # SQLite 的 bm25() 越小越相关，这里取负数
+        return [(doc_id, -score) for doc_id, score in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db().execute("SELECT count(*) FROM chunk_ids").fetchone()[0]
+
+    def snapshot(self) -> Dict:
+        return {**self.stats, "documents": self.count()}
+
+    # ------------------------------------------------------------
+    # 全量重建（索引是后加的、或与 Chroma 不一致时）
+    # ------------------------------------------------------------
+    def rebuild_from(self, collection, page_size: int = 1000) -> int:
+        with self._lock:
+            db = self._db()
+            with db:
+                db.execute("DELETE FROM chunk_fts")
+                db.execute("DELETE FROM chunk_ids")
+        total, offset = 0, 0
+        while True:
+            page = collection.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+            if not page["ids"]:
+                break
+            self.upsert(
+                (i, doc or "", (meta or {}).get("source"), (meta or {}).get("date_int"))
+                for i, doc, meta in zip(page["ids"], page["documents"], page["metadatas"])
+            )
+            total += len(page["ids"])
+            offset += page_size
+        logger.info(f"[BM25] 重建完成，共 {total} 个分块")
+        return total
+
+
+# 全局单例
+bm25_index = Bm25Index(settings.bm25_index_path)
+
+
+if __name__ == "__main__":
+    # 用法: python -m app.tools.bm25_index  （从 medical_docs 全量重建倒排索引）
+    from app.tools.chroma_client import collection
+    bm25_index.rebuild_from(collection)
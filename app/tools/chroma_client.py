@@ -1,25 +1,32 @@
 # app\tools\chroma_client.py
+import threading
 import chromadb
-from chromadb.utils import embedding_functions
 from app.core.config import settings
 from app.core.logger import get_logger
 from app.models.document import DocumentChunk
-from app.core.data_clean import clean_metadata, is_valid_chunk
+from app.core.data_clean import clean_metadata, is_valid_chunk, date_to_int
+from app.tools.embedding_service import embedder, embedding_fn  # noqa: F401  (embedding_fn 供旧代码导入)
+from app.tools.bm25_index import bm25_index
+from app.core.cache import cache_engine
 
 logger = get_logger(__name__)
 
-# 初始化嵌入模型（这里可替换成 Qwen Embedding 模型）
-embedding_fn = embedding_functions.DefaultEmbeddingFunction()
-
 # 连接本地或远程 Chroma
 client = chromadb.PersistentClient(path="./chroma_db")
 collection = client.get_or_create_collection(
     name="medical_docs",
-    embedding_function=embedding_fn
+    embedding_function=embedder  # 带缓存与微批的嵌入服务
 )
 
 def ingest(chunks: list[DocumentChunk]):
-    """将分块内容写入 Chroma 向量库"""
+    """
+    将分块内容写入 Chroma 向量库（幂等）：
+      - 分块 ID 由源文档 ID + 内容 hash 确定，已存在且 hash 相同的分块不再嵌入，只刷新元数据；
+      - 新分块 / 内容变化的分块走 upsert；
+      - 同一源文档本次不再出现的旧分块（内容已变化）被删除，集合不会无限增长；
+      - BM25 倒排索引同步增量更新（新写入、元数据更新与删除的分块）；索引为空时先从 Chroma 全量回填；
+      - 集合有变化时 medical_docs 代际号 +1，RAG 结果缓存随之失效并在后台预热热点查询。
+    """
     if not chunks:
         print("⚠️ [Chroma] 收到空数据列表，跳过入库。")
         return
@@ -36,18 +43,101 @@ def ingest(chunks: list[DocumentChunk]):
             continue
         
         c.metadata = clean_metadata(c.metadata.model_dump(exclude_none=True))
+        if c.content_hash:
+            c.metadata["content_hash"] = c.content_hash
+        # 整数日期（YYYYMMDD），检索时可直接在 where 中按日期范围过滤
+        date_int = date_to_int(c.metadata.get("date")) or date_to_int(c.metadata.get("updated_at"))
+        if date_int:
+            c.metadata["date_int"] = date_int
         clean_chunks.append(c)
 
+    if not clean_chunks:
+        logger.info("Chroma 入库跳过：没有有效分块")
+        return
+
     ids = [c.chunk_id for c in clean_chunks]
-    docs = [c.content for c in clean_chunks]
-    metas = [c.metadata for c in clean_chunks] #model_dump() 方法将 Pydantic 模型转换为字典
-    collection.add(ids=ids, documents=docs, metadatas=metas)
-    logger.info(f"Chroma 入库完成，共写入 {len(clean_chunks)} 个分块")
+    existing = collection.get(ids=ids, include=["metadatas"])
+    known = dict(zip(existing["ids"], existing["metadatas"]))
+
+    fresh, unchanged = [], []
+    for c in clean_chunks:
+        old_meta = known.get(c.chunk_id)
+        if old_meta is not None and old_meta.get("content_hash") == c.content_hash:
+            if old_meta != c.metadata:
+                unchanged.append(c)
+        else:
+            fresh.append(c)
+
+    if unchanged:
+        # 只更新元数据（不传 documents，不会触发嵌入）
+        collection.update(ids=[c.chunk_id for c in unchanged], metadatas=[c.metadata for c in unchanged])
+    # 单次写入不能超过 Chroma 的 max_batch_size
+    step = client.get_max_batch_size()
+    for i in range(0, len(fresh), step):
+        part = fresh[i:i + step]
+        collection.upsert(
+            ids=[c.chunk_id for c in part],
+            documents=[c.content for c in part],
+            metadatas=[c.metadata for c in part],  #model_dump() 方法将 Pydantic 模型转换为字典
+        )
+
+    stale = _remove_stale(clean_chunks)
+
+    try:
+        if not ensure_bm25_backfilled():
+            # 元数据更新的分块正文没变，但 source / date_int 可能变了，过滤列要跟着更新
+            bm25_index.upsert((c.chunk_id, c.content, c.metadata.get("source"), c.metadata.get("date_int"))
+                              for c in fresh + unchanged)
+            bm25_index.delete(stale)
+    except Exception as e:
+        logger.warning(f"BM25 索引更新失败（可用 python -m app.tools.bm25_index 重建）: {e}")
+
+    if fresh or unchanged or stale:
+        cache_engine.bump_generation(collection.name)
+
+    logger.info(
+        f"Chroma 入库完成：新写入 {len(fresh)}，已存在 {len(clean_chunks) - len(fresh)}"
+        f"（元数据更新 {len(unchanged)}），清理旧分块 {len(stale)}"
+    )
+
+_bm25_checked = False
+_bm25_lock = threading.Lock()
+
+def ensure_bm25_backfilled() -> bool:
+    """
+    进程内首次调用时检查 BM25 索引：索引为空而集合里已有分块（索引文件是后加的或被删了）时，
+    从 Chroma 全量回填。返回本次是否做了回填（回填已包含集合当前的全部分块）。
+    """
+    global _bm25_checked
+    if _bm25_checked:
+        return False
+    with _bm25_lock:
+        if _bm25_checked:
+            return False
+        rebuilt = False
+        if bm25_index.count() == 0 and collection.count() > 0:
+            logger.info("BM25 索引为空，从 Chroma 全量回填")
+            bm25_index.rebuild_from(collection)
+            rebuilt = True
+        _bm25_checked = True
+        return rebuilt
+
+def _remove_stale(chunks: list[DocumentChunk]) -> list[str]:
+    """删除本批次源文档下不再出现的旧分块（同一文档的分块总是在同一批次入库），返回被删除的 ID"""
+    source_ids = sorted({c.metadata.get("source_id") for c in chunks} - {None, "unknown"})
+    if not source_ids:
+        return []
+    current = {c.chunk_id for c in chunks}
+    old = collection.get(where={"source_id": {"$in": source_ids}}, include=[])
+    stale = [i for i in old["ids"] if i not in current]
+    if stale:
+        collection.delete(ids=stale)
+    return stale
 
 def query(text: str, n_results: int = 3):
     """从 Chroma 中查询相似内容"""
     logger.info(f"查询向量相似内容: {text[:30]}...")
-    res = collection.query(query_texts=[text], n_results=n_results)
+    res = collection.query(query_embeddings=embedder.embed_queries([text]).tolist(), n_results=n_results)
     return [
         {
             "content": doc,
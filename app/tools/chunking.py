@@ -1,7 +1,23 @@
-from typing import List
+from typing import Iterator, List, Tuple
+from app.core.config import settings
 from app.models.document import DocumentChunk, DocumentMetadata
-from app.models.base import gen_id
+import hashlib
 import re
+
+
+def content_hash(text: str) -> str:
+    """分块内容的 sha1（用于判断同一分块内容是否变化）"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def make_chunk_id(source: str, source_id: str, digest: str) -> str:
+    """
+    确定性分块 ID：source + sha1(源文档 ID + 内容 hash)。
+    同一篇文献重复抓取得到相同的 ID，入库时可直接跳过，不再产生重复向量。
+    """
+    key = hashlib.sha1(f"{source_id}\x1f{digest}".encode("utf-8")).hexdigest()[:16]
+    return f"{source}_{key}"
+
 def simple_chunk(text: str, source: str, url: str = None) -> List[DocumentChunk]:#保留给test_chroma.py使用
     """
     简单分块器：按双换行或句号分段。
@@ -19,11 +35,12 @@ def simple_chunk(text: str, source: str, url: str = None) -> List[DocumentChunk]
             metadata=meta
         ))
     return chunks
-def chunk_text(text: str, source: str, metadata_extra: dict = None) -> List[DocumentChunk]:
+def chunk_text(text: str, source: str, metadata_extra: dict = None, source_id: str = None) -> List[DocumentChunk]:
     """
     基于固定长度的分块器：每 300 字为一块。
     返回若干 DocumentChunk 对象。
     text: 待分块的abstract
+    source_id: 源文档的稳定 ID（PMID / arXiv URL / 仓库名 / NCT 号），缺省时用 url，再缺省用全文 hash
     其余参数用于构造 DocumentMetadata
     """
 
@@ -36,19 +53,136 @@ def chunk_text(text: str, source: str, metadata_extra: dict = None) -> List[Docu
         for k, v in (metadata_extra or {}).items()
     }
 
+    source_id = str(source_id or safe_meta_extra.get("url") or content_hash(text))
+    safe_meta_extra.pop("source_id", None)
+
     for i in range(0, len(text), CHUNK_SIZE):
         content = text[i:i+CHUNK_SIZE]
 
         meta = DocumentMetadata(
             source=source,
+            source_id=source_id,
             section="abstract",
             **safe_meta_extra
         )
 
+        digest = content_hash(content)
         chunks.append(DocumentChunk(
-            chunk_id=gen_id("chunk"),
+            chunk_id=make_chunk_id(source, source_id, digest),
             content=content,
+            content_hash=digest,
             metadata=meta
         ))
 
     return chunks
+
+
+
+# ============================================================
+# 按 token 计数的句子分块器
+# ============================================================
+# 中日韩字符逐字计 1 个 token；英文按单词 / 数字计；其余标点各计 1 个
+_CJK = r"\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_TOKEN_RE = re.compile(rf"[{_CJK}]|[A-Za-z0-9]+(?:[-'.][A-Za-z0-9]+)*|[^\s{_CJK}A-Za-z0-9]")
+# 句子边界：中文句末标点后直接切；英文句末标点后需跟空白 + 大写 / 引号 / 中文开头（避免在 e.g. 3.5 处断开）；换行也视为边界
+_SENT_END_RE = re.compile(rf"(?<=[。！？；])|(?<=[.!?])(?=\s+[A-Z\"'(\[{_CJK}])|\n+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text)
+
+
+def count_tokens(text: str) -> int:
+    return sum(1 for _ in _TOKEN_RE.finditer(text))
+
+
+def split_sentences(text: str) -> Iterator[str]:
+    """按中英文句末标点与换行切句（惰性产出，去掉空句）"""
+    start = 0
+    for m in _SENT_END_RE.finditer(text):
+        if m.end() == start:
+            continue
+        sent = text[start:m.start()].strip()
+        if sent:
+            yield sent
+        start = m.end()
+    tail = text[start:].strip()
+    if tail:
+        yield tail
+
+
+def _split_long(sentence: str, max_tokens: int) -> Iterator[Tuple[str, int]]:
+    """超过 max_tokens 的超长句（如无标点的 README 列表）按 token 边界硬切"""
+    spans = [m.span() for m in _TOKEN_RE.finditer(sentence)]
+    for i in range(0, len(spans), max_tokens):
+        part = spans[i:i + max_tokens]
+        yield sentence[part[0][0]:part[-1][1]], len(part)
+
+
+def _join(sentences: List[str]) -> str:
+    # 中文句子之间不加空格，英文句子之间用空格连接
+    out = sentences[0]
+    for s in sentences[1:]:
+        cjk_boundary = re.match(rf"[{_CJK}]", s[:1]) or re.search(rf"[{_CJK}。！？；]$", out)
+        out += s if cjk_boundary else " " + s
+    return out
+
+
+def iter_chunks(text: str, source: str, metadata_extra: dict = None, source_id: str = None,
+                section: str = "abstract", max_tokens: int = None,
+                overlap_tokens: int = None) -> Iterator[DocumentChunk]:
+    """
+    句子级分块器（生成器）：把整句装进分块直到 token 数达到 max_tokens，
+    相邻分块之间重叠末尾若干整句（不超过 overlap_tokens）。
+    长文档（如 GitHub README）边切边产出；DocumentMetadata 每篇文档只构造一次，所有分块共用。
+    """
+    max_tokens = max_tokens or settings.chunk_max_tokens
+    overlap_tokens = settings.chunk_overlap_tokens if overlap_tokens is None else overlap_tokens
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+
+    safe_meta_extra = {
+        k: (str(v) if not isinstance(v, (str, int, float, bool, type(None))) else v)
+        for k, v in (metadata_extra or {}).items()
+    }
+    source_id = str(source_id or safe_meta_extra.get("url") or content_hash(text))
+    safe_meta_extra.pop("source_id", None)
+    meta = DocumentMetadata(source=source, source_id=source_id, section=section, **safe_meta_extra)
+
+    def make(sents: List[str]) -> DocumentChunk:
+        content = _join(sents)
+        digest = content_hash(content)
+        return DocumentChunk(
+            chunk_id=make_chunk_id(source, source_id, digest),
+            content=content,
+            content_hash=digest,
+            metadata=meta,
+        )
+
+    window: List[Tuple[str, int]] = []  # 当前分块内的 (句子, token 数)
+    size = 0
+    fresh = False  # 窗口中是否有尚未产出过的句子
+    for sentence in split_sentences(text):
+        n = count_tokens(sentence)
+        pieces = _split_long(sentence, max_tokens) if n > max_tokens else [(sentence, n)]
+        for piece, n in pieces:
+            if size + n > max_tokens and fresh:
+                yield make([s for s, _ in window])
+                # 保留末尾若干整句作为下一个分块的开头
+                keep, kept = [], 0
+                for s, k in reversed(window):
+                    if kept + k > overlap_tokens or kept + k + n > max_tokens:
+                        break
+                    keep.insert(0, (s, k))
+                    kept += k
+                window, size, fresh = keep, kept, False
+            window.append((piece, n))
+            size += n
+            fresh = True
+    if fresh:
+        yield make([s for s, _ in window])
+
+
+def sentence_chunk(text: str, source: str, metadata_extra: dict = None, source_id: str = None,
+                   section: str = "abstract") -> List[DocumentChunk]:
+    """iter_chunks 的列表版本"""
+    return list(iter_chunks(text, source, metadata_extra, source_id=source_id, section=section))
@@ -0,0 +1,337 @@
+# app/tools/embedding_service.py
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from chromadb.utils import embedding_functions
+
+from app.core.config import settings
+from app.core.data_clean import normalize_topic
+from app.core.logger import get_logger
+
+try:
+    import fcntl  # 多进程共享缓存文件时加文件锁（Windows 下只用线程锁）
+except ImportError:
+    fcntl = None
+
+logger = get_logger(__name__)
+
+# 底层嵌入模型（这里可替换成 Qwen Embedding 模型）
+embedding_fn = embedding_functions.DefaultEmbeddingFunction()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+# ============================================================
+# 进程池 worker：每个子进程各自加载一份模型
+# ============================================================
+_worker_fn = None
+
+def _init_worker():
+    global _worker_fn
+    _worker_fn = embedding_functions.DefaultEmbeddingFunction()
+
+def _embed_in_worker(texts: List[str]) -> np.ndarray:
+    return np.asarray(_worker_fn(texts), dtype=np.float32)
+
+
+# ============================================================
+# 持久化向量缓存：float32 memmap + 追加式索引
+# ============================================================
+class EmbeddingCache:
+    """
+    按内容 hash 缓存嵌入向量，跨主题、跨重复抓取共享。
+      - {dir}/vectors.f32：float32 矩阵（memmap），按行存向量，容量不足时倍增
+      - {dir}/index.txt：每行一个内容 hash，第 i 行对应矩阵第 i 行
+      - {dir}/meta.json：模型名与向量维度
+    先写向量再追加索引行，进程中途退出也不会出现指向空向量的索引。
+    """
+
+    def __init__(self, root: str, model_id: str):
+        self.dir = os.path.join(root, model_id.replace("/", "_"))
+        os.makedirs(self.dir, exist_ok=True)
+        self.vec_path = os.path.join(self.dir, "vectors.f32")
+        self.index_path = os.path.join(self.dir, "index.txt")
+        self.meta_path = os.path.join(self.dir, "meta.json")
+        self.model_id = model_id
+        self.dim: Optional[int] = None
+        self._rows: Dict[str, int] = {}
+        self._index_pos = 0
+        self._mm: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+        with self._lock:
+            self._sync_locked()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    # ---------------- 读 ----------------
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        with self._lock:
+            if any(k not in self._rows for k in keys):
+                self._sync_locked()  # 其他进程可能刚写入
+            found = {}
+            for k in keys:
+                row = self._rows.get(k)
+                if row is not None and self._mm is not None and row < self._mm.shape[0]:
+                    found[k] = np.array(self._mm[row])
+            return found
+
+    # ---------------- 写 ----------------
+    def put_many(self, items: Dict[str, np.ndarray]):
+        if not items:
+            return
+        with self._lock, self._file_lock():
+            self._sync_locked()
+            items = {k: v for k, v in items.items() if k not in self._rows}
+            if not items:
+                return
+            if self.dim is None:
+                self.dim = int(next(iter(items.values())).shape[-1])
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model_id, "dim": self.dim}, f)
+
+            start = len(self._rows)
+            self._ensure_capacity(start + len(items))
+            keys = list(items)
+            self._mm[start:start + len(keys)] = np.stack([items[k] for k in keys]).astype(np.float32)
+            self._mm.flush()
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{k}\n" for k in keys))
+            self._sync_locked()
+
+    # ---------------- 内部 ----------------
+    @contextmanager
+    def _file_lock(self):
+        """跨进程互斥：追加写期间锁住索引文件"""
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _sync_locked(self):
+        """读入索引文件新增的完整行（调用方需持有 _lock）"""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_pos)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].decode("utf-8").splitlines():
+            if line:
+                self._rows.setdefault(line, len(self._rows))
+        self._index_pos += end
+        if self.dim and (self._mm is None or self._mm.shape[0] < len(self._rows)):
+            self._open_mm()
+
+    def _open_mm(self):
+        size = os.path.getsize(self.vec_path) if os.path.exists(self.vec_path) else 0
+        capacity = size // (4 * self.dim)
+        self._mm = np.memmap(self.vec_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim)) if capacity else None
+
+    def _ensure_capacity(self, rows: int):
+        capacity = self._mm.shape[0] if self._mm is not None else 0
+        if rows <= capacity:
+            return
+        new_capacity = max(rows, capacity * 2, 1024)
+        self._mm = None
+        with open(self.vec_path, "ab") as f:
+            f.truncate(new_capacity * self.dim * 4)
+        self._open_mm()
+
+
+# ============================================================
+# 查询向量 LRU（进程内）
+# ============================================================
+class QueryEmbeddingCache:
+    """
+    查询文本的嵌入向量 LRU：key 为 (模型 ID, 规范化文本)，线程安全、容量有界。
+    同一个主题在 RAG 检索、TaskMemory 回忆、chroma_client.query 之间只嵌入一次。
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> Optional[np.ndarray]:
+        with self._lock:
+            vec = self._data.get(key)
+            if vec is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return vec
+
+    def put(self, key: tuple, vec: np.ndarray):
+        with self._lock:
+            self._data[key] = vec
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data),
+                    "hit_ratio": round(self.hits / total, 4) if total else 0.0}
+
+
+# ============================================================
+# 嵌入服务：缓存 → 微批 → 线程池 / 进程池推理
+# ============================================================
+class EmbeddingService(EmbeddingFunction[Documents]):
+    """
+    包装底层 embedding_fn，可直接作为 Chroma 集合的 embedding_function：
+      - 先按内容 hash 查持久化缓存，同一段文本永远只嵌入一次；
+      - 未命中的文本去重后按 EMBEDDING_BATCH_SIZE 切成微批；
+      - 微批提交到线程池（默认）或进程池并行推理，结果写回缓存。
+    """
+
+    def __init__(self, base_fn=None):
+        self.base_fn = base_fn or embedding_fn
+        self.model_id = settings.embedding_model_id
+        self.batch_size = settings.embedding_batch_size
+        self.cache = EmbeddingCache(settings.embedding_cache_dir, self.model_id) if settings.embedding_cache else None
+        self.query_cache = QueryEmbeddingCache(settings.query_embedding_cache_size)
+        self._executor: Optional[Executor] = None
+        self._executor_lock = threading.Lock()
+        self.stats = {"texts": 0, "cache_hits": 0, "embedded": 0, "batches": 0, "embed_time_s": 0.0}
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return list(self.embed(list(input)))
+
+    # Chroma 把集合的 embedding function 名字与配置持久化，重新打开时校验是否一致。
+    # 底层模型就是 Chroma 的 DefaultEmbeddingFunction，按 "default" 登记：
+    # 已有的 chroma_db（用默认函数创建）可以直接打开，向量也与默认函数兼容
+    @staticmethod
+    def name() -> str:
+        return "default"
+
+    def get_config(self) -> Dict:
+        return {}
+
+    @staticmethod
+    def build_from_config(config: Dict) -> "EmbeddingService":
+        return embedder
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """返回 (len(texts), dim) 的 float32 矩阵，顺序与输入一致"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        keys = [text_hash(t) for t in texts]
+        self.stats["texts"] += len(texts)
+
+        vectors = self.cache.get_many(keys) if self.cache is not None else {}
+        self.stats["cache_hits"] += sum(1 for k in keys if k in vectors)
+
+        # 未命中的文本去重（同一批里重复的分块只算一次）
+        missing: Dict[str, str] = {}
+        for k, t in zip(keys, texts):
+            if k not in vectors and k not in missing:
+                missing[k] = t
+        if missing:
+            computed = self._embed_uncached(list(missing.values()))
+            new = dict(zip(missing.keys(), computed))
+            # EmbeddingCache 定义了 __len__，空缓存为假值，这里必须判断 None
+            if self.cache is not None:
+                self.cache.put_many(new)
+            vectors.update(new)
+
+        return np.stack([vectors[k] for k in keys])
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        查询向量：先规范化（小写、合并空白）再查进程内 LRU，未命中的一次批量嵌入。
+        查询不写入磁盘缓存（磁盘缓存留给文档分块）。
+        """
+        normalized = [normalize_topic(q) for q in queries]
+        found: Dict[str, np.ndarray] = {}
+        missing: List[str] = []
+        for q in normalized:
+            if q in found or q in missing:
+                continue
+            vec = self.query_cache.get((self.model_id, q))
+            if vec is None:
+                missing.append(q)
+            else:
+                found[q] = vec
+        if missing:
+            for q, vec in zip(missing, self._embed_uncached(missing)):
+                self.query_cache.put((self.model_id, q), vec)
+                found[q] = vec
+        return np.stack([found[q] for q in normalized])
+
+    def _embed_uncached(self, texts: List[str]) -> List[np.ndarray]:
+        start = time.time()
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1:
+            results = [self._embed_batch(batches[0])]
+        else:
+            executor = self._get_executor()
+            if isinstance(executor, ProcessPoolExecutor):
+                results = list(executor.map(_embed_in_worker, batches))
+            else:
+                results = list(executor.map(self._embed_batch, batches))
+        self.stats["batches"] += len(batches)
+        self.stats["embedded"] += len(texts)
+        self.stats["embed_time_s"] += time.time() - start
+        logger.info(f"[Embedding] 嵌入 {len(texts)} 段文本（{len(batches)} 个批次，{time.time() - start:.2f}s）")
+        return [row for batch in results for row in batch]
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.base_fn(texts), dtype=np.float32)
+
+    def _get_executor(self) -> Executor:
+        with self._executor_lock:
+            if self._executor is None:
+                workers = settings.embedding_workers
+                if settings.embedding_executor == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed")
+            return self._executor
+
+    def snapshot(self) -> Dict:
+        texts = self.stats["texts"]
+        return {
+            **self.stats,
+            "hit_ratio": round(self.stats["cache_hits"] / texts, 4) if texts else 0.0,
+            "cache_entries": len(self.cache) if self.cache is not None else 0,
+            "query_cache": self.query_cache.snapshot(),
+        }
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+# 全局单例
+embedder = EmbeddingService()
@@ -1,15 +1,23 @@
-import httpx
+import asyncio
 import base64
-from typing import List, Dict
+from datetime import datetime
+from typing import List, Dict, Optional
 from app.core.logger import get_logger
-from app.tools.chunking import chunk_text
+from app.core.http_pool import http_pool
+from app.models.enums import SourceType
+from app.tools.chunking import sentence_chunk
 from app.models.document import DocumentChunk
 from app.core.config import settings
+from app.core.watermark import watermarks
 
 logger = get_logger(__name__)
 
 GITHUB_API = "https://api.github.com"
 
+# commit_activity 统计：GitHub 首次请求时返回 202 并在后台计算，由轮询任务补齐。
+# 轮询拿到的 200 响应进入 HTTP 响应缓存，下次抓取直接命中，不需要另外保存结果
+_stats_pollers: Dict[str, asyncio.Task] = {}
+
 
 def _auth_headers():
     """如果你在 .env 设置了 GITHUB_TOKEN，这里会启用认证，避免频繁限流。"""
@@ -30,10 +38,9 @@ async def search_repos(keyword: str, limit: int = 10) -> List[Dict]:
         "per_page": limit,
     }
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        resp = await client.get(url, params=params, headers=_auth_headers())
-        resp.raise_for_status()#HTTP 响应状态码不是成功（非 2xx），就主动抛出异常
-        data = resp.json()
+    resp = await http_pool.get(url, limiter="github_search", params=params, headers=_auth_headers())
+    resp.raise_for_status()#HTTP 响应状态码不是成功（非 2xx），就主动抛出异常
+    data = resp.json()
 
     repos = []
     for repo in data.get("items", []):
@@ -52,17 +59,17 @@ async def search_repos(keyword: str, limit: int = 10) -> List[Dict]:
 async def fetch_readme(full_name: str) -> str:
     """
     获取 README（base64 编码，需要解码）
+    缓存过期后 http_pool 会带 ETag 条件请求，未变化时 GitHub 返回 304，不消耗限流额度。
     """
     url = f"{GITHUB_API}/repos/{full_name}/readme"
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        resp = await client.get(url, headers=_auth_headers())
-        # print("fetch_readme status:", resp.status_code)     # 调试
-        # print("fetch_readme headers:", resp.headers)        # 调试
-        # print("fetch_readme text preview:", resp.text[:200])# 调试
-        if resp.status_code != 200:
-            return ""
-        data = resp.json()
+    resp = await http_pool.get(url, limiter="github", headers=_auth_headers())
+    # print("fetch_readme status:", resp.status_code)     # 调试
+    # print("fetch_readme headers:", resp.headers)        # 调试
+    # print("fetch_readme text preview:", resp.text[:200])# 调试
+    if resp.status_code != 200:
+        return ""
+    data = resp.json()
 
     content = data.get("content", "")
     if not content:
@@ -83,27 +90,76 @@ async def fetch_latest_release(full_name: str) -> str:
     """
     url = f"{GITHUB_API}/repos/{full_name}/releases/latest"
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        resp = await client.get(url, headers=_auth_headers())
-        if resp.status_code != 200:
-            return ""
-        data = resp.json()
+    resp = await http_pool.get(url, limiter="github", headers=_auth_headers())
+    if resp.status_code != 200:
+        return ""
+    data = resp.json()
 
     body = data.get("body", "")
     return body or ""
 
 
-async def fetch_commit_frequency(full_name: str, weeks: int = 12) -> int:
+async def _poll_commit_activity(full_name: str) -> Optional[list]:
+    """
+    后台轮询 stats/commit_activity：GitHub 计算统计期间返回 202，
+    按指数退避重试，拿到 200 后返回统计数据（响应同时写入 HTTP 响应缓存）。
+    """
+    url = f"{GITHUB_API}/repos/{full_name}/stats/commit_activity"
+    delay = 1.0
+
+    for _ in range(settings.github_stats_poll_attempts):
+        await asyncio.sleep(delay)
+        resp = await http_pool.get(url, limiter="github", headers=_auth_headers())
+        if resp.status_code == 200:
+            data = resp.json()
+            logger.info(f"[GitHub] commit_activity 统计就绪: {full_name}")
+            return data
+        if resp.status_code != 202:
+            return None
+        delay = min(delay * 2, 16.0)
+
+    logger.warning(f"[GitHub] commit_activity 轮询超时: {full_name}")
+    return None
+
+
+def _ensure_poller(full_name: str) -> asyncio.Task:
+    """同一仓库只保留一个轮询任务（按事件循环区分）"""
+    task = _stats_pollers.get(full_name)
+    if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+        task = asyncio.create_task(_poll_commit_activity(full_name))
+        _stats_pollers[full_name] = task
+
+        def _cleanup(t: asyncio.Task):
+            if _stats_pollers.get(full_name) is t:
+                _stats_pollers.pop(full_name, None)
+
+        task.add_done_callback(_cleanup)
+    return task
+
+
+async def fetch_commit_frequency(full_name: str, weeks: int = 12) -> Optional[int]:
     """
     用 GitHub API 统计最近 X 周 commit 数。
+    统计尚在计算（202）时启动后台轮询，最多等待 github_stats_wait_s 秒；
+    仍未就绪则返回 None（未知），而不是误报 0。
     """
     url = f"{GITHUB_API}/repos/{full_name}/stats/commit_activity"
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        resp = await client.get(url, headers=_auth_headers())
-        if resp.status_code != 200:
-            return 0
+    resp = await http_pool.get(url, limiter="github", headers=_auth_headers())
+    if resp.status_code == 200:
         data = resp.json()
+    elif resp.status_code == 202:
+        poller = _ensure_poller(full_name)
+        try:
+            # shield：等待超时只放弃本次等待，后台轮询继续
+            data = await asyncio.wait_for(asyncio.shield(poller), timeout=settings.github_stats_wait_s)
+        except asyncio.TimeoutError:
+            logger.info(f"[GitHub] commit_activity 仍在计算，后台继续轮询: {full_name}")
+            return None
+        if data is None:
+            return None
+    else:
+        return 0
 
     # 最近 N 周的 commit 总数
     return sum(week["total"] for week in data[-weeks:])
@@ -123,43 +179,76 @@ def clean_text(text: str, max_len: int = 5000) -> str:
     return text
 
 
-async def ingest_github(keyword: str, top_n: int = 5) -> int:
+async def _collect_repo(repo: Dict, sem: asyncio.Semaphore) -> List[DocumentChunk]:
+    """并发获取单个仓库的 README / Release / Commit 频率，并分块"""
+    full = repo["full_name"]
+
+    async def bounded(coro):
+        async with sem:
+            return await coro
+
+    readme, release, commits = await asyncio.gather(
+        bounded(fetch_readme(full)),
+        bounded(fetch_latest_release(full)),
+        bounded(fetch_commit_frequency(full)),
+        return_exceptions=True,
+    )
+    for name, res in (("readme", readme), ("release", release), ("commits", commits)):
+        if isinstance(res, Exception):
+            logger.warning(f"[GitHub] {full} 获取 {name} 失败: {res}")
+    readme = readme if isinstance(readme, str) else ""
+    release = release if isinstance(release, str) else ""
+    commits = commits if isinstance(commits, int) else "computing"
+
+    summary_text = (
+        f"# Repo: {full}\n"
+        f"Stars: {repo['stars']}\n"
+        f"Updated at: {repo['updated_at']}\n"
+        f"Commit Frequency (12 weeks): {commits}\n\n"
+    )
+
+    combined_text = summary_text + "\n## README\n" + readme + "\n\n## Release Notes\n" + release
+    combined_text = clean_text(combined_text)
+    return sentence_chunk(
+        text=combined_text,
+        source=SourceType.github.value,
+        source_id=full,
+        section="readme",
+        metadata_extra={
+            "repo": full,
+            "url": repo["url"],
+            "stars": repo["stars"],
+            "updated_at": repo["updated_at"],
+        }
+    )
+
+
+async def ingest_github(keyword: str, top_n: int = 5, incremental: bool = None) -> int:
     """
     GitHub → 分块 → 入库
+    所有仓库的 README / Release / Commit 请求一起并发，由信号量限制同时在途的请求数；
+    每个仓库处理完立即提交给后台入库队列，不等其余仓库。
+    增量模式下只处理上次抓取之后 updated_at 有变化的仓库，其余仓库不再发起 3 次详情请求。
     """
+    incremental = settings.incremental_ingest if incremental is None else incremental
+    mark = watermarks.get("github", keyword, depth=top_n) if incremental else {}
+    crawled_at = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+
     repos = await search_repos(keyword, limit=top_n)
-    all_chunks: List[DocumentChunk] = []
-
-    from app.tools.chroma_client import ingest
-
-    for repo in repos:
-        full = repo["full_name"]
-
-        readme = await fetch_readme(full)
-        release = await fetch_latest_release(full)
-        commits = await fetch_commit_frequency(full)
-
-        summary_text = (
-            f"# Repo: {full}\n"
-            f"Stars: {repo['stars']}\n"
-            f"Updated at: {repo['updated_at']}\n"
-            f"Commit Frequency (12 weeks): {commits}\n\n"
-        )
-
-        combined_text = summary_text + "\n## README\n" + readme + "\n\n## Release Notes\n" + release
-        combined_text = clean_text(combined_text)
-        chunks = chunk_text(
-            text=combined_text,
-            source="github",
-            metadata_extra={
-                "repo": full,
-                "url": repo["url"],
-                "stars": repo["stars"],
-                "updated_at": repo["updated_at"],
-            }
-        )
-
-        all_chunks.extend(chunks)
-
-    ingest(all_chunks)
-    return len(all_chunks)
\ No newline at end of file
+    if mark.get("crawled_at"):
+        # updated_at 为 ISO-8601（...Z），可以直接按字符串比较
+        fresh = [r for r in repos if r["updated_at"] > mark["crawled_at"]]
+        logger.info(f"[GitHub] 增量抓取：{len(repos)} 个仓库中 {len(fresh)} 个有更新")
+        repos = fresh
+    from app.tools.ingest_queue import ingest_queue
+
+    sem = asyncio.Semaphore(settings.github_max_concurrency)
+    writes = []
+    for done in asyncio.as_completed([_collect_repo(repo, sem) for repo in repos]):
+        chunks: List[DocumentChunk] = await done
+        writes.append(await ingest_queue.submit_async(chunks))
+
+    total = sum(await asyncio.gather(*writes))
+    # 搜索结果按 Star 排序而非时间，本次只覆盖前 top_n 个仓库，深度不能沿用更大的旧值
+    watermarks.set("github", keyword, depth=top_n, crawled_at=crawled_at)
+    return total
@@ -0,0 +1,146 @@
+# app/tools/ingest_queue.py
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.models.document import DocumentChunk
+
+logger = get_logger(__name__)
+
+_STOP = object()
+
+
+class IngestQueue:
+    """
+    后台入库队列：抓取协程只负责把分块批次放进有界队列，
+    由专门的写入线程合并批次（不超过 Chroma 的 max_batch_size）后调用 chroma_client.ingest。
+      - 队列满时提交方等待（背压），不会无限堆积内存；
+      - 每次提交返回一个 Future，入库完成（或失败）时结束，可 await；
+      - 嵌入和 SQLite 写入不再占用爬虫的事件循环，抓取与入库交替进行变为重叠进行。
+    """
+
+    def __init__(self, maxsize: int):
+        self._queue: "queue.Queue" = queue.Queue(maxsize=maxsize)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.stats = {"submitted": 0, "writes": 0, "chunks": 0, "failed": 0,
+                      "write_time_s": 0.0, "enqueue_wait_s": 0.0}
+
+    # ------------------------------------------------------------
+    # 提交
+    # ------------------------------------------------------------
+    def submit(self, chunks: List[DocumentChunk]) -> Future:
+        """同步提交（队列满时阻塞调用线程）"""
+        fut: Future = Future()
+        if not chunks:
+            fut.set_result(0)
+            return fut
+        self._ensure_writer()
+        start = time.time()
+        self._queue.put((list(chunks), fut))
+        self.stats["enqueue_wait_s"] += time.time() - start
+        self.stats["submitted"] += 1
+        return fut
+
+    async def submit_async(self, chunks: List[DocumentChunk]) -> "asyncio.Future":
+        """
+        异步提交：队列满时在线程里等待入队，不阻塞事件循环。
+        返回可 await 的 Future（结果为写入的分块数），调用方可以先继续抓取，最后统一等待。
+        """
+        loop = asyncio.get_running_loop()
+        fut = await loop.run_in_executor(None, self.submit, chunks)
+        return asyncio.wrap_future(fut)
+
+    async def ingest_async(self, chunks: List[DocumentChunk]) -> int:
+        """提交并等待入库完成"""
+        return await (await self.submit_async(chunks))
+
+    # ------------------------------------------------------------
+    # 写入线程
+    # ------------------------------------------------------------
+    def _ensure_writer(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="chroma-writer", daemon=True)
+                self._thread.start()
+
+    def _max_batch(self) -> int:
+        if settings.ingest_max_batch > 0:
+            return settings.ingest_max_batch
+        from app.tools.chroma_client import client
+        try:
+            return client.get_max_batch_size()
+        except Exception:
+            return 5000
+
+    def _run(self):
+        from app.tools.chroma_client import ingest
+
+        max_batch = self._max_batch()
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch: List[Tuple[List[DocumentChunk], Future]] = [item]
+            size = len(item[0])
+            stop = False
+            # 合并已在排队的批次，直到达到 max_batch_size
+            while size < max_batch:
+                try:
+                    nxt = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is _STOP:
+                    stop = True
+                    break
+                if size + len(nxt[0]) > max_batch:
+                    self._write(batch, ingest)
+                    batch, size = [], 0
+                batch.append(nxt)
+                size += len(nxt[0])
+            self._write(batch, ingest)
+            if stop:
+                break
+
+    def _write(self, batch: List[Tuple[List[DocumentChunk], Future]], ingest):
+        if not batch:
+            return
+        chunks = [c for part, _ in batch for c in part]
+        start = time.time()
+        try:
+            ingest(chunks)
+        except Exception as e:
+            self.stats["failed"] += len(batch)
+            logger.error(f"[IngestQueue] 入库失败（{len(chunks)} 个分块）: {e}")
+            for _, fut in batch:
+                fut.set_exception(e)
+            return
+        self.stats["writes"] += 1
+        self.stats["chunks"] += len(chunks)
+        self.stats["write_time_s"] += time.time() - start
+        for part, fut in batch:
+            fut.set_result(len(part))
+
+    # ------------------------------------------------------------
+    # 统计 & 关闭
+    # ------------------------------------------------------------
+    def snapshot(self) -> Dict:
+        return {**self.stats, "queued": self._queue.qsize()}
+
+    def close(self, timeout: float = None):
+        """写完队列中剩余的批次后停止写入线程"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+
+# 全局单例
+ingest_queue = IngestQueue(maxsize=settings.ingest_queue_size)
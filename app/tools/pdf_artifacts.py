@@ -0,0 +1,156 @@
+# app/tools/pdf_artifacts.py
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from app.core.artifact_store import artifact_store
+from app.core.logger import get_logger
+from app.models.artifact import Artifact
+from app.models.enums import ArtifactType
+from app.tools.pdf_exporter import ARTIFACT_DIR
+from app.tools.pdf_render_service import pdf_render_service
+
+try:
+    import fcntl  # 多个 API 进程同时下载时用文件锁保证只渲染一次（Windows 下只用线程锁）
+except ImportError:
+    fcntl = None
+
+logger = get_logger(__name__)
+
+PDF_MIME = "application/pdf"
+MARKDOWN_MIME = "text/markdown; charset=utf-8"
+
+
+def markdown_sha256(markdown_text: str) -> str:
+    return hashlib.sha256(markdown_text.encode("utf-8")).hexdigest()
+
+
+def markdown_path(task_id: str) -> str:
+    """旧版本 Writer 保存 Markdown 的位置（现在保存在产物存储里）"""
+    return os.path.join(ARTIFACT_DIR, f"{task_id}.md")
+
+
+def markdown_for_task(task_id: str) -> Optional[Artifact]:
+    """任务的 Markdown 产物；旧任务的 {task_id}.md 首次访问时导入存储"""
+    md = artifact_store.get(task_id, ArtifactType.markdown)
+    if md is not None and os.path.exists(md.uri):
+        return md
+    legacy = markdown_path(task_id)
+    if not os.path.exists(legacy):
+        return None
+    with open(legacy, "rb") as f:
+        return artifact_store.save(task_id, ArtifactType.markdown, f.read(), MARKDOWN_MIME)
+
+
+class PdfArtifacts:
+    """
+    按需生成 PDF：Writer 只保存 Markdown，第一次下载时才渲染。
+      - 渲染结果存进产物存储（app/core/artifact_store.py），索引 meta.source_sha256 记录来源 Markdown 的 hash，
+        内容相同的报告（如记忆复用）直接登记已有的 PDF 对象，不再渲染；
+      - single-flight：同一份内容并发下载时，进程内按 hash 加锁、进程间加文件锁，只渲染一次，其余请求等待后直接命中；
+      - 先渲染到临时文件再原子移入存储，不会读到渲染到一半的 PDF；
+      - 旧任务的 {task_id}.pdf / {task_id}.md 首次下载时导入存储；
+      - 统计命中、渲染、等待次数与渲染耗时。
+    """
+
+    def __init__(self, lock_dir: str):
+        self.lock_dir = lock_dir
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+        self.stats = {"requests": 0, "hits": 0, "renders": 0, "waits": 0, "legacy_hits": 0,
+                      "failed": 0, "render_time_s": 0.0}
+
+    def pdf_for_markdown(self, task_id: str, markdown_text: str, digest: Optional[str] = None) -> Artifact:
+        """返回该任务 Markdown 对应的 PDF 产物，没有时渲染"""
+        self.stats["requests"] += 1
+        digest = digest or markdown_sha256(markdown_text)
+        found = artifact_store.find_by_source(ArtifactType.pdf, digest)
+        if found is not None:
+            self.stats["hits"] += 1
+            return self._register(task_id, found.meta, digest)
+
+        with self._flight(digest) as waited:
+            found = artifact_store.find_by_source(ArtifactType.pdf, digest)
+            if found is not None:  # 等锁期间别的请求已经渲染好
+                self.stats["waits" if waited else "hits"] += 1
+                return self._register(task_id, found.meta, digest)
+            os.makedirs(self.lock_dir, exist_ok=True)
+            tmp = os.path.join(self.lock_dir, f"{digest}.{os.getpid()}.{threading.get_ident()}.pdf.tmp")
+            start = time.time()
+            try:
+                pdf_render_service.render(task_id, markdown_text, pdf_path=tmp)
+                info = artifact_store.put_file(tmp, PDF_MIME)
+            except Exception:
+                self.stats["failed"] += 1
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+            self.stats["renders"] += 1
+            self.stats["render_time_s"] += time.time() - start
+            logger.info(f"[PDF] 渲染完成 {digest[:12]}（{time.time() - start:.2f}s）")
+            return self._register(task_id, info, digest)
+
+    def pdf_for_task(self, task_id: str) -> Optional[Artifact]:
+        """任务的 PDF 产物；任务没有 Markdown 时返回 None。Markdown 被重写（任务重试）后已登记的 PDF 失效"""
+        md = markdown_for_task(task_id)
+        pdf = artifact_store.get(task_id, ArtifactType.pdf)
+        if pdf is not None and os.path.exists(pdf.uri) and \
+                (md is None or pdf.meta.get("source_sha256") in (None, md.meta["sha256"])):
+            self.stats["requests"] += 1
+            self.stats["hits"] += 1
+            return pdf
+
+        legacy = os.path.join(ARTIFACT_DIR, f"{task_id}.pdf")
+        if pdf is None and os.path.exists(legacy):  # 旧任务已渲染好的 PDF
+            self.stats["requests"] += 1
+            self.stats["legacy_hits"] += 1
+            with open(legacy, "rb") as f:
+                info = artifact_store.put_bytes(f.read(), PDF_MIME)
+            return artifact_store.register(task_id, ArtifactType.pdf, PDF_MIME, info)
+
+        if md is None:
+            return None
+        return self.pdf_for_markdown(task_id, artifact_store.read_text(md), md.meta["sha256"])
+
+    def _register(self, task_id: str, info: Dict, digest: str) -> Artifact:
+        info = {k: info[k] for k in ("sha256", "size", "gz_size")}
+        return artifact_store.register(task_id, ArtifactType.pdf, PDF_MIME, info, {"source_sha256": digest})
+
+    @contextmanager
+    def _flight(self, digest: str):
+        """进程内线程锁 + 进程间文件锁；yield 是否等待过其它渲染"""
+        with self._guard:
+            lock = self._locks.setdefault(digest, threading.Lock())
+        waited = not lock.acquire(blocking=False)
+        if waited:
+            lock.acquire()
+        try:
+            if fcntl is None:
+                yield waited
+                return
+            os.makedirs(self.lock_dir, exist_ok=True)
+            with open(os.path.join(self.lock_dir, f"{digest}.lock"), "w") as lf:
+                try:
+                    fcntl.flock(lf, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    waited = True
+                    fcntl.flock(lf, fcntl.LOCK_EX)
+                try:
+                    yield waited
+                finally:
+                    fcntl.flock(lf, fcntl.LOCK_UN)
+        finally:
+            lock.release()
+            with self._guard:
+                if not lock.locked():
+                    self._locks.pop(digest, None)
+
+    def snapshot(self) -> Dict:
+        return dict(self.stats)
+
+
+# 全局单例
+pdf_artifacts = PdfArtifacts(os.path.join(artifact_store.root, "locks"))
@@ -1,6 +1,6 @@
 import os
+from functools import lru_cache
 import markdown
-from weasyprint import HTML, CSS
 
 # 确保工件目录存在
 ARTIFACT_DIR = "app/artifacts"
@@ -64,16 +64,13 @@ pre {
 }
 """
 
-def save_markdown_as_pdf(task_id: str, markdown_text: str) -> str:
-    """
-    将 Markdown 转换为带样式的 PDF 报告
-    """
-    # 1. Markdown -> HTML
+def markdown_to_html(task_id: str, markdown_text: str) -> str:
+    """Markdown -> 完整 HTML 文档"""
     # extensions: 'extra' 支持表格、脚注等；'nl2br' 将换行符转换为 <br>
     html_body = markdown.markdown(markdown_text, extensions=['extra', 'nl2br'])
 
-    # 2. 包装完整的 HTML 结构
-    full_html = f"""
+    # 包装完整的 HTML 结构
+    return f"""
     <!DOCTYPE html>
     <html>
     <head>
@@ -82,18 +79,40 @@ def save_markdown_as_pdf(task_id: str, markdown_text: str) -> str:
     </head>
     <body>
         {html_body}
-        <div class="footer">Generated by Medical AI TechRadar | Task ID: {task_id}</div>
+        <div class="footer">Generated by Medical AI TechRadar | Report ID: {task_id}</div>
     </body>
     </html>
     """
 
-    # 3. 生成 PDF
-    pdf_path = os.path.join(ARTIFACT_DIR, f"{task_id}.pdf")
-    
+
+@lru_cache(maxsize=1)
+def report_stylesheet():
+    """解析一次的报告样式与字体配置（同一进程内复用，不必每份报告重新解析 CSS）"""
+    # weasyprint 依赖 pango 等系统库，延迟到真正渲染时再导入：
+    # pdf_artifacts / API 只用到 ARTIFACT_DIR，不应因为缺系统库而无法启动
+    from weasyprint import CSS
+    from weasyprint.text.fonts import FontConfiguration
+
+    font_config = FontConfiguration()
+    return CSS(string=REPORT_CSS, font_config=font_config), font_config
+
+
+def save_markdown_as_pdf(task_id: str, markdown_text: str, pdf_path: str = None) -> str:
+    """
+    将 Markdown 转换为带样式的 PDF 报告（在当前线程同步渲染）。
+    pdf_path: 输出路径，默认 ARTIFACT_DIR/{task_id}.pdf
+    Worker 中请使用 app/tools/pdf_render_service.py 的进程池，避免渲染占住 GIL。
+    """
+    from weasyprint import HTML
+
+    pdf_path = pdf_path or os.path.join(ARTIFACT_DIR, f"{task_id}.pdf")
+    stylesheet, font_config = report_stylesheet()
+
     # 使用 WeasyPrint 渲染
-    HTML(string=full_html).write_pdf(
+    HTML(string=markdown_to_html(task_id, markdown_text)).write_pdf(
         pdf_path, 
-        stylesheets=[CSS(string=REPORT_CSS)]
+        stylesheets=[stylesheet],
+        font_config=font_config,
     )
 
-    return pdf_path
\ No newline at end of file
+    return pdf_path
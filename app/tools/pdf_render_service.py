@@ -0,0 +1,266 @@
+# app/tools/pdf_render_service.py
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.metrics import Histogram
+
+logger = get_logger(__name__)
+
+
+class RenderQueueFull(RuntimeError):
+    """渲染队列已满（排队 + 渲染中的任务数达到上限）"""
+
+
+# ============================================================
+# 子进程侧：initializer 预先解析样式、加载字体，之后每个任务直接复用
+# ============================================================
+_started_queue = None
+
+
+def _init_worker(started_queue, warmup: Optional[Callable[[], None]] = None):
+    global _started_queue
+    _started_queue = started_queue
+    if warmup is not None:
+        warmup()
+
+
+def _warm_stylesheet():
+    from app.tools.pdf_exporter import report_stylesheet
+    report_stylesheet()
+
+
+def _render_markdown(task_id: str, markdown_text: str, pdf_path: Optional[str] = None) -> str:
+    from app.tools.pdf_exporter import save_markdown_as_pdf
+    return save_markdown_as_pdf(task_id, markdown_text, pdf_path)
+
+
+def _run_job(render_fn: Callable[..., str], job_id: int, task_id: str, markdown_text: str,
+             pdf_path: Optional[str] = None) -> Tuple[str, float]:
+    """
+    子进程真正开始执行任务时先上报 (job_id, 开始时间)，看门狗据此计时。
+    不能用 Future.running() 判断：进程池会提前把排队的任务搬进调用队列并标记为 running。
+    """
+    _started_queue.put((job_id, time.time()))
+    start = time.perf_counter()
+    path = render_fn(task_id, markdown_text, pdf_path)
+    return path, time.perf_counter() - start
+
+
+class _Job:
+    __slots__ = ("job_id", "task_id", "inner", "outer", "submitted", "started")
+
+    def __init__(self, job_id: int, task_id: str, inner: Future, outer: Future):
+        self.job_id = job_id
+        self.task_id = task_id
+        self.inner = inner
+        self.outer = outer
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+
+
+class PdfRenderService:
+    """
+    PDF 渲染服务：WeasyPrint 在独立的进程池里运行，不再占用 Worker 线程与 GIL。
+      - 每个子进程启动时解析一次 REPORT_CSS 与字体配置，之后的任务直接复用；
+      - 排队 + 渲染中的任务数不超过 workers + PDF_RENDER_MAX_QUEUE，满时等待 PDF_SUBMIT_WAIT_S 后拒绝；
+      - 单个任务开始渲染后超过 PDF_RENDER_TIMEOUT_S 视为卡死：任务失败，进程池整体重建；
+        开始时间由子进程上报（排队等待的时间不计入超时）；
+      - submit 立即返回 Future，调用方可以继续处理下一个任务；
+      - 渲染耗时（子进程内）与端到端耗时（含排队）分别记入直方图。
+    """
+
+    def __init__(self, workers: int, max_queue: int, timeout_s: float,
+                 render_fn: Callable[..., str] = _render_markdown,
+                 warmup: Optional[Callable[[], None]] = _warm_stylesheet):
+        """render_fn / warmup 须是模块级函数（spawn 子进程按名字导入）"""
+        self.workers = workers
+        self.timeout_s = timeout_s
+        self.render_fn = render_fn
+        self.warmup = warmup
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._started_queue = None
+        self._lock = threading.Lock()
+        self._job_ids = itertools.count(1)
+        self._jobs: Dict[int, _Job] = {}
+        self._watchdog: Optional[threading.Thread] = None
+        self._closed = False
+        self.render_latency = Histogram()
+        self.total_latency = Histogram()
+        self.stats = {"submitted": 0, "done": 0, "failed": 0, "timeouts": 0, "rejected": 0, "pool_restarts": 0}
+
+    # ------------------------------------------------------------
+    # 提交
+    # ------------------------------------------------------------
+    def submit(self, task_id: str, markdown_text: str,
+               on_done: Optional[Callable[[Future], None]] = None, pdf_path: Optional[str] = None) -> Future:
+        """提交渲染任务，返回结果为 PDF 路径的 Future；队列满且等待超时抛 RenderQueueFull"""
+        if not self._slots.acquire(timeout=settings.pdf_submit_wait_s):
+            self.stats["rejected"] += 1
+            raise RenderQueueFull(f"PDF 渲染队列已满（{task_id}）")
+        outer: Future = Future()
+        if on_done is not None:
+            outer.add_done_callback(on_done)
+        try:
+            with self._lock:
+                job_id = next(self._job_ids)
+                args = (_run_job, self.render_fn, job_id, task_id, markdown_text, pdf_path)
+                try:
+                    inner = self._get_executor().submit(*args)
+                except BrokenProcessPool:
+                    # 子进程异常退出后进程池不可再用，重建一次
+                    self._discard_executor()
+                    self.stats["pool_restarts"] += 1
+                    inner = self._get_executor().submit(*args)
+                job = _Job(job_id, task_id, inner, outer)
+                self._jobs[job_id] = job
+        except Exception:
+            self._slots.release()
+            raise
+        self.stats["submitted"] += 1
+        inner.add_done_callback(lambda f, job=job: self._on_inner_done(job, f))
+        self._ensure_watchdog()
+        return outer
+
+    def render(self, task_id: str, markdown_text: str, pdf_path: Optional[str] = None) -> str:
+        """同步渲染（等待结果）"""
+        return self.submit(task_id, markdown_text, pdf_path=pdf_path).result()
+
+    # ------------------------------------------------------------
+    # 内部
+    # ------------------------------------------------------------
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """调用方需持有 _lock"""
+        if self._executor is None:
+            # spawn：Worker 进程里有多个线程（Redis / 事件循环），fork 出的子进程可能继承被占用的锁
+            ctx = multiprocessing.get_context("spawn")
+            # 每个进程池一个开始时间上报队列，重建进程池时一并换新（旧子进程可能在写入时被终止）
+            self._started_queue = ctx.Queue()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=ctx,
+                initializer=_init_worker,
+                initargs=(self._started_queue, self.warmup),
+            )
+        return self._executor
+
+    def _discard_executor(self) -> Optional[ProcessPoolExecutor]:
+        """调用方需持有 _lock；摘下当前进程池与上报队列，返回旧进程池"""
+        old, self._executor = self._executor, None
+        if self._started_queue is not None:
+            self._started_queue.close()
+            self._started_queue = None
+        return old
+
+    def _drain_started(self):
+        """调用方需持有 _lock；读取子进程上报的开始时间"""
+        while self._started_queue is not None:
+            try:
+                job_id, started = self._started_queue.get_nowait()
+            except (queue.Empty, OSError, ValueError):
+                return
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.started = started
+
+    def _finish(self, job: _Job) -> bool:
+        """从在途表移除并释放名额；已处理过返回 False（超时与完成回调可能先后到达）"""
+        with self._lock:
+            if self._jobs.pop(job.job_id, None) is None:
+                return False
+        self._slots.release()
+        return True
+
+    def _on_inner_done(self, job: _Job, fut: Future):
+        if not self._finish(job):
+            return
+        if fut.cancelled():
+            self.stats["failed"] += 1
+            job.outer.set_exception(RuntimeError(f"PDF 渲染被取消（{job.task_id}）"))
+            return
+        err = fut.exception()
+        if err is not None:
+            self.stats["failed"] += 1
+            logger.error(f"PDF 渲染失败 {job.task_id}: {err}")
+            job.outer.set_exception(err)
+            return
+        path, render_s = fut.result()
+        self.stats["done"] += 1
+        self.render_latency.observe(render_s)
+        self.total_latency.observe(time.time() - job.submitted)
+        job.outer.set_result(path)
+
+    def _ensure_watchdog(self):
+        with self._lock:
+            if self._watchdog is None or not self._watchdog.is_alive():
+                self._watchdog = threading.Thread(target=self._watch, name="pdf-watchdog", daemon=True)
+                self._watchdog.start()
+
+    def _watch(self):
+        """检查在途任务：按子进程上报的开始时间计时，超时的任务判失败并重建进程池（卡死的子进程无法单独取消）"""
+        interval = min(0.5, max(0.05, self.timeout_s / 4))
+        while not self._closed:
+            time.sleep(interval)
+            now = time.time()
+            with self._lock:
+                self._drain_started()
+                jobs = list(self._jobs.values())
+            if not jobs:
+                continue
+            expired = [job for job in jobs if job.started is not None and now - job.started > self.timeout_s]
+            if expired:
+                self._expire(expired)
+
+    def _expire(self, expired):
+        for job in expired:
+            if self._finish(job):
+                self.stats["timeouts"] += 1
+                logger.error(f"PDF 渲染超时（>{self.timeout_s}s）: {job.task_id}")
+                job.outer.set_exception(TimeoutError(f"PDF 渲染超时: {job.task_id}"))
+        with self._lock:
+            old = self._discard_executor()
+        if old is None:
+            return
+        self.stats["pool_restarts"] += 1
+        # 终止子进程；同一进程池上其余在途任务会以 BrokenProcessPool 失败
+        for proc in list((getattr(old, "_processes", None) or {}).values()):
+            proc.terminate()
+        old.shutdown(wait=False, cancel_futures=True)
+
+    # ------------------------------------------------------------
+    # 统计 & 关闭
+    # ------------------------------------------------------------
+    def snapshot(self) -> Dict:
+        with self._lock:
+            in_flight = len(self._jobs)
+        return {**self.stats, "in_flight": in_flight, "workers": self.workers,
+                "render_latency": self.render_latency.snapshot(),
+                "total_latency": self.total_latency.snapshot()}
+
+    def shutdown(self, wait: bool = True):
+        """等待在途任务完成后关闭进程池"""
+        self._closed = True
+        with self._lock:
+            executor = self._discard_executor()
+        if executor is not None:
+            try:
+                executor.shutdown(wait=wait)
+            except BrokenProcessPool:
+                pass
+
+
+# 全局单例
+pdf_render_service = PdfRenderService(
+    workers=settings.pdf_render_workers or max(1, min(2, (os.cpu_count() or 2) // 2)),
+    max_queue=settings.pdf_render_max_queue,
+    timeout_s=settings.pdf_render_timeout_s,
+)
@@ -1,8 +1,13 @@
-import httpx
-from typing import List, Dict
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from typing import List, Dict, Optional, AsyncIterator
+from app.core.config import settings
+from app.core.watermark import watermarks
 from app.core.logger import get_logger
-from app.models.document import DocumentChunk, DocumentMetadata
-from app.tools.chunking import chunk_text
+from app.core.http_pool import http_pool
+from app.models.document import DocumentChunk
+from app.models.enums import SourceType
+from app.tools.chunking import sentence_chunk
 import asyncio
 
 def clean_metadata(meta: dict) -> dict:
@@ -20,96 +25,251 @@ logger = get_logger(__name__)
 
 BASE_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
 
+def _ncbi_params(params: Dict) -> Dict:
+    """附加 NCBI API Key（有 Key 时限流器自动提升到 10 次/秒）"""
+    if settings.ncbi_api_key:
+        params["api_key"] = settings.ncbi_api_key
+    return params
+
+
+# ============================================================
+# 流式 XML 解析
+# ============================================================
+class PubmedStreamParser:
+    """
+    基于 XMLPullParser（iterparse 的增量版本）的 PubMed XML 流式解析器。
+    每解析完一个 <PubmedArticle> 就产出一条记录并清空已解析的节点，
+    内存占用与结果总数无关。
+    """
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+        self._root = None
+
+    def feed(self, data: bytes) -> List[Dict]:
+        self._parser.feed(data)
+        return self._drain()
+
+    def close(self) -> List[Dict]:
+        self._parser.close()
+        return self._drain()
+
+    def _drain(self) -> List[Dict]:
+        results = []
+        for event, elem in self._parser.read_events():
+            if event == "start":
+                if self._root is None:
+                    self._root = elem
+                continue
+            if elem.tag == "PubmedArticle":
+                paper = _article_to_dict(elem)
+                if paper:
+                    results.append(paper)
+            if elem.tag in ("PubmedArticle", "PubmedBookArticle") and self._root is not None:
+                # 文章之间是兄弟节点，此时根节点下没有未闭合的子树，可以整体清空
+                self._root.clear()
+        return results
+
+
+def _node_text(node: Optional[ET.Element]) -> str:
+    """取节点全部文本（包括 <i>/<sup> 等内联标签里的内容）"""
+    if node is None:
+        return ""
+    return "".join(node.itertext()).strip()
+
+
+def _article_to_dict(article: ET.Element) -> Optional[Dict]:
+    pmid = article.findtext(".//PMID")
+    title = _node_text(article.find(".//ArticleTitle"))
+    date = article.findtext(".//PubDate/Year") or ""
+    url = f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/"
+
+    # 结构化摘要会拆成多个 AbstractText（BACKGROUND / METHODS / RESULTS ...），全部保留
+    sections = []
+    for node in article.findall(".//Abstract/AbstractText"):
+        text = _node_text(node)
+        if not text:
+            continue
+        label = node.get("Label")
+        sections.append(f"{label}: {text}" if label else text)
+    abstract = "\n".join(sections)
+
+    if not abstract:
+        return None
+    return {
+        "pmid": pmid,
+        "title": title,
+        "abstract": abstract,
+        "date": date,
+        "url": url,
+    }
+
+
+def parse_pubmed_xml(xml_text: str) -> List[Dict]:
+    """解析完整的 PubMed XML 文本（内部复用流式解析器）"""
+    parser = PubmedStreamParser()
+    data = xml_text.encode("utf-8") if isinstance(xml_text, str) else xml_text
+    return parser.feed(data) + parser.close()
+
+
+# ============================================================
+# E-utilities: esearch (usehistory) + 分批 efetch
+# ============================================================
+async def esearch(topic: str, mindate: Optional[str] = None) -> Dict:
+    """
+    esearch 开启 usehistory=y：结果集保存在 NCBI History Server，
+    返回 WebEnv / query_key，后续 efetch 用 retstart 分页取，无需把 PMID 拼进 URL。
+    mindate: 只检索该 Entrez 日期（YYYY/MM/DD）之后收录的文献，用于增量抓取
+    """
+    params = {"db": "pubmed",
+              "term": topic,
+              "usehistory": "y",
+              "retmax": 0,
+              "retmode": "json"}
+    if mindate:
+        params.update({"datetype": "edat", "mindate": mindate, "maxdate": "3000"})
+
+    resp = await http_pool.get(
+        f"{BASE_URL}/esearch.fcgi",
+        limiter="pubmed",
+        cache_ttl=0,  # WebEnv 会过期：正常模式每次回源，只在 replay 模式使用缓存
+        params=_ncbi_params(params)
+    )
+    resp.raise_for_status()
+    result = resp.json()["esearchresult"]
+    return {
+        "term": topic,
+        "mindate": mindate,
+        "count": int(result.get("count", 0)),
+        "webenv": result.get("webenv"),
+        "query_key": result.get("querykey"),
+    }
+
+
+async def _efetch_batch(search: Dict, retstart: int, retmax: int) -> AsyncIterator[Dict]:
+    """按 retstart/retmax 流式拉取一批文献，边下载边解析"""
+    parser = PubmedStreamParser()
+    async for chunk in http_pool.stream_bytes(
+        "GET",
+        f"{BASE_URL}/efetch.fcgi",
+        limiter="pubmed",
+        # WebEnv 每次检索都不同，缓存 Key 改用检索词 + 分页位置
+        cache_params={"term": search["term"], "mindate": search["mindate"], "retstart": retstart, "retmax": retmax},
+        params=_ncbi_params({"db": "pubmed",
+                             "WebEnv": search["webenv"],
+                             "query_key": search["query_key"],
+                             "retstart": retstart,
+                             "retmax": retmax,
+                             "retmode": "xml"})
+    ):
+        for paper in parser.feed(chunk):
+            yield paper
+    for paper in parser.close():
+        yield paper
+
+
+async def iter_pubmed(topic: str, retmax: int = 10, batch_size: int = None, mindate: Optional[str] = None) -> AsyncIterator[Dict]:
+    """
+    流式检索 PubMed：逐篇 yield 论文。
+    多个 efetch 批次并发（受 pubmed_max_concurrency 限制，请求速率由 "pubmed" 令牌桶控制），
+    结果通过有界队列交给调用方，消费慢时生产者自动阻塞（背压）。
+    """
+    search = await esearch(topic, mindate=mindate)
+    total = min(search["count"], retmax)
+    logger.info(f"PubMed 命中 {search['count']} 条文献，计划拉取 {total} 条")
+    if total <= 0 or not search["webenv"]:
+        return
+
+    batch_size = batch_size or settings.pubmed_batch_size
+    sem = asyncio.Semaphore(settings.pubmed_max_concurrency)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=batch_size)
+    done = object()
+
+    async def producer(retstart: int):
+        try:
+            async with sem:
+                async for paper in _efetch_batch(search, retstart, min(batch_size, total - retstart)):
+                    await queue.put(paper)
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            await queue.put(done)
+
+    producers = [asyncio.create_task(producer(start)) for start in range(0, total, batch_size)]
+    finished = 0
+    try:
+        while finished < len(producers):
+            item = await queue.get()
+            if item is done:
+                finished += 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        for p in producers:
+            p.cancel()
+
+
 async def fetch_pubmed(topic: str, retmax: int = 10) -> List[Dict]:
     """搜索 PubMed 并返回论文摘要信息"""
-    async with httpx.AsyncClient(timeout=10.0) as client: # AsyncClient 是一个异步 HTTP 会话对象，用来发起 async 的网络请求。
-        try:
-            # 每次请求前 sleep，避免 PubMed 429
-            await asyncio.sleep(0.34)
-            
-            # Step1: esearch -> 找 PMIDs
-            search_resp = await client.get( # 去访问一个网站/接口，返回httpx.Response对象
-                f"{BASE_URL}/esearch.fcgi",
-                params={"db": "pubmed", 
-                        "term": topic, 
-                        "retmax": retmax, 
-                        "retmode": "json"}
-            )
-            ids = search_resp.json()["esearchresult"]["idlist"]
-            logger.info(f"PubMed 命中 {len(ids)} 条文献")
-
-            if not ids:
-                return []
-            
-            # 第二次请求前再 sleep
-            await asyncio.sleep(0.34)
-
-            # Step2: efetch -> 获取摘要等信息
-            fetch_resp = await client.get(
-                f"{BASE_URL}/efetch.fcgi",
-                params={"db": "pubmed", 
-                        "id": ",".join(ids), 
-                        "retmode": "xml"}
-            )
-
-            return parse_pubmed_xml(fetch_resp.text)
+    try:
+        return [paper async for paper in iter_pubmed(topic, retmax=retmax)]
+    except Exception as e:
+        logger.error(f"PubMed 请求失败: {e}")
+        return []
 
-        except Exception as e:
-            logger.error(f"PubMed 请求失败: {e}")
-            return []
 
+def _paper_to_chunks(paper: Dict) -> List[DocumentChunk]:
+    meta_raw = {
+        "pmid": str(paper["pmid"]),
+        "title": str(paper["title"]),
+        "date": str(paper["date"]),  # 强制转成字符串
+        "url": str(paper["url"]),
+    }
+    meta_safe = clean_metadata(meta_raw)
 
-def parse_pubmed_xml(xml_text: str) -> List[Dict]:
-    """解析 PubMed XML（MVP 简化版）"""
-    # 把XML内容解析成字典列表
-    import xml.etree.ElementTree as ET
-    root = ET.fromstring(xml_text)
-
-    results = []
-
-    for article in root.findall(".//PubmedArticle"):
-
-        pmid = article.findtext(".//PMID")
-        title = article.findtext(".//ArticleTitle")
-        abstract = article.findtext(".//AbstractText")
-        date = article.findtext(".//PubDate/Year") or ""
-        url = f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/"
-
-        if abstract:
-            results.append({
-                "pmid": pmid,
-                "title": title,
-                "abstract": abstract,
-                "date": date,
-                "url": url,
-            })
-
-    return results
-
-
-async def ingest_pubmed(topic: str, max_results: int = 5) -> int:
-    """抓取 PubMed → 分块 → 入库"""
-    papers = await fetch_pubmed(topic, retmax=max_results)
-
-    all_chunks: List[DocumentChunk] = []
-
-    for paper in papers:
-        meta_raw = {
-            "pmid": str(paper["pmid"]),
-            "title": str(paper["title"]),
-            "date": str(paper["date"]),  # 强制转成字符串
-            "url": str(paper["url"]),
-        }
-        meta_safe = clean_metadata(meta_raw)
-
-        chunks = chunk_text(
-            text=paper["abstract"],
-            source="pubmed",
-            metadata_extra=meta_safe,
-        )
-        all_chunks.extend(chunks)
-
-    from app.tools.chroma_client import ingest
-    ingest(all_chunks)
-
-    return len(all_chunks)
\ No newline at end of file
+    return sentence_chunk(
+        text=paper["abstract"],
+        source=SourceType.pubmed.value,
+        metadata_extra=meta_safe,
+        source_id=meta_raw["pmid"],
+    )
+
+
+async def ingest_pubmed(topic: str, max_results: int = 5, incremental: bool = None) -> int:
+    """
+    抓取 PubMed → 分块 → 入库（每攒满一个 batch 提交给后台入库队列，抓取与入库重叠进行）
+    增量模式下只检索上次抓取日期之后收录的文献（水位线当天重叠一天，重复分块由入库去重）。
+    """
+    from app.tools.ingest_queue import ingest_queue
+
+    incremental = settings.incremental_ingest if incremental is None else incremental
+    mark = watermarks.get("pubmed", topic, depth=max_results) if incremental else {}
+    crawl_date = datetime.utcnow().strftime("%Y/%m/%d")
+
+    batch_size = settings.pubmed_batch_size
+    pending: List[DocumentChunk] = []
+    writes = []
+    n_papers = 0
+
+    try:
+        async for paper in iter_pubmed(topic, retmax=max_results, batch_size=batch_size,
+                                       mindate=mark.get("last_edat")):
+            pending.extend(_paper_to_chunks(paper))
+            n_papers += 1
+            if n_papers % batch_size == 0:
+                writes.append(await ingest_queue.submit_async(pending))
+                pending = []
+    except Exception as e:
+        logger.error(f"PubMed 请求失败: {e}")
+        crawl_date = None  # 本次不完整，不推进水位线
+
+    if pending:
+        writes.append(await ingest_queue.submit_async(pending))
+    total = sum(await asyncio.gather(*writes))
+
+    if crawl_date:
+        watermarks.set("pubmed", topic, depth=max_results, capped=n_papers >= max_results,
+                       last_edat=crawl_date)
+    return total
@@ -1,37 +1,253 @@
-from typing import List, Dict, Any
-from app.tools.chroma_client import collection, embedding_fn
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+from app.core.config import settings
+from app.core.data_clean import date_to_int
+from app.core.logger import get_logger
+from app.models.enums import SourceType
+from app.tools.chroma_client import collection, ensure_bm25_backfilled
+from app.tools.bm25_index import bm25_index
+from app.tools.embedding_service import embedder
 from app.models.document import DocumentChunk
 from app.core.cache import cache_result
+from app.core.semantic_cache import semantic_cached
 
-# 缓存 24 小时 (86400秒)，因为向量库更新不频繁
-@cache_result(ttl_seconds=86400, key_prefix="rag")
-def query_rag(query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-    """RAG 查询：将结果按 trial / others 分组返回"""
-
-    # 编码 Query 得向量
-    query_embedding = embedding_fn(query)
-    
-    # 检索 top_k
-    results = collection.query(
-        query_embeddings=query_embedding,
-        n_results=top_k,
+logger = get_logger(__name__)
+
+# 混合检索时词法检索所用的线程池
+_search_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rag-search")
+# 按数据源并发检索所用的线程池（与 _search_pool 分开，避免互相等待导致死锁）
+_source_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rag-source")
+
+# RagAgent 的子查询模板：同一主题按模态 / 任务 / 各数据源的表述方式分别检索
+SUB_QUERY_TEMPLATES = [
+    "{topic}",
+    "{topic} deep learning model architecture",
+    "{topic} dataset benchmark evaluation results",
+    "{topic} open source implementation github repository",
+    "{topic} clinical trial patients enrollment",
+]
+
+
+def expand_queries(topic: str) -> List[str]:
+    """把主题展开成多个子查询（第一个是原始主题）"""
+    return [t.format(topic=topic) for t in SUB_QUERY_TEMPLATES]
+
+
+def query_rag_many(queries: List[str], top_k: int = 5, where: Optional[Dict] = None,
+                   hybrid: Optional[bool] = None, coll=None, index=None) -> List[List[Dict[str, Any]]]:
+    """
+    批量检索：所有查询一次性嵌入，用一次 collection.query（多个 query_embeddings）检索，
+    按输入顺序返回每个查询各自的 top_k 结果。
+    where: Chroma 元数据过滤条件，作用于所有查询
+    hybrid: 同时跑 BM25 词法检索（与向量检索并行），两路结果用 RRF 融合；默认取 RAG_HYBRID
+    coll / index: 指定集合与倒排索引（默认 medical_docs 与 bm25_index，评测脚本用）
+    """
+    if not queries:
+        return []
+    hybrid = settings.rag_hybrid if hybrid is None else hybrid
+    coll = coll if coll is not None else collection
+    index = index if index is not None else bm25_index
+
+    lexical_filter = _bm25_filter(where)
+    if not hybrid or lexical_filter is None:
+        return _vector_search(coll, queries, top_k, where)
+
+    n = max(top_k, settings.rag_hybrid_candidates)
+    # 词法检索在线程池里跑，同时在当前线程完成嵌入 + 向量检索
+    lexical_future = _search_pool.submit(_lexical_search, index, queries, n, lexical_filter)
+    vector = _vector_search(coll, queries, n, where)
+    try:
+        lexical = lexical_future.result()
+    except Exception as e:
+        logger.warning(f"BM25 检索失败，只使用向量结果: {e}")
+        return [hits[:top_k] for hits in vector]
+
+    fused_per_query = []
+    for vec_hits, lex_hits in zip(vector, lexical):
+        fused = rrf_fuse([[h["id"] for h in vec_hits], [doc_id for doc_id, _ in lex_hits]],
+                         k=settings.rag_rrf_k)[:top_k]
+        fused_per_query.append((fused, {h["id"]: h for h in vec_hits}))
+
+    # 只被 BM25 召回的分块，一次性补取正文与元数据
+    missing = sorted({doc_id for fused, by_id in fused_per_query for doc_id, _ in fused if doc_id not in by_id})
+    extra = {}
+    if missing:
+        got = coll.get(ids=missing, include=["documents", "metadatas"])
+        extra = {i: {"id": i, "content": doc, "metadata": meta, "score": None}
+                 for i, doc, meta in zip(got["ids"], got["documents"], got["metadatas"])}
+
+    results = []
+    for fused, by_id in fused_per_query:
+        hits = []
+        for doc_id, rrf in fused:
+            hit = by_id.get(doc_id) or extra.get(doc_id)
+            if hit is not None:
+                hits.append({**hit, "rrf": rrf})
+        results.append(hits)
+    return results
+
+
+def _lexical_search(index, queries: List[str], n: int, lexical_filter: Dict[str, Any]) -> List[List[Tuple[str, float]]]:
+    if index is bm25_index:
+        ensure_bm25_backfilled()  # 索引为空时（首次启用混合检索）先从 Chroma 回填
+    return [index.search(q, n, **lexical_filter) for q in queries]
+
+
+def _vector_search(coll, queries: List[str], n: int, where: Optional[Dict]) -> List[List[Dict[str, Any]]]:
+    query_embeddings = embedder.embed_queries(list(queries))
+    results = coll.query(
+        query_embeddings=query_embeddings.tolist(),
+        n_results=n,
+        where=where,
         include=["documents", "metadatas", "distances"]
     )
 
-    docs = results["documents"][0]
-    metas = results["metadatas"][0]
-    dists = results["distances"][0]
-
-    rag_chunks = []
-    for doc, meta, dist in zip(docs, metas, dists):
-        rag_chunks.append({
-            "content": doc,
-            "metadata": meta,
-            "score": float(dist),
-        })
-
-    # 按 trial / others 分组
-    trial_chunks = [c for c in rag_chunks if c["metadata"]["source"] == "ClinicalTrials"]
-    other_chunks = [c for c in rag_chunks if c["metadata"]["source"] != "ClinicalTrials"]
-    
-    return trial_chunks, other_chunks
+    per_query = []
+    for ids, docs, metas, dists in zip(results["ids"], results["documents"],
+                                       results["metadatas"], results["distances"]):
+        per_query.append([
+            {"id": i, "content": doc, "metadata": meta, "score": float(dist)}
+            for i, doc, meta, dist in zip(ids, docs, metas, dists)
+        ])
+    return per_query
+
+
+def _bm25_filter(where: Optional[Dict]) -> Optional[Dict[str, Any]]:
+    """
+    把 Chroma where 条件翻译成 BM25 检索参数（sources / date_from / date_to）。
+    只支持 source 相等 / $in 与 date_int 范围（可用 $and 组合）；其它条件返回 None，只走向量检索。
+    """
+    params: Dict[str, Any] = {}
+    conds = where.get("$and", []) if where and set(where) == {"$and"} else ([where] if where else [])
+    for cond in conds:
+        if len(cond) != 1:
+            return None
+        field, value = next(iter(cond.items()))
+        if field == "source":
+            if isinstance(value, str):
+                params["sources"] = [value]
+            elif isinstance(value, dict) and set(value) == {"$in"}:
+                params["sources"] = list(value["$in"])
+            else:
+                return None
+        elif field == "date_int" and isinstance(value, dict):
+            for op, bound in value.items():
+                if op in ("$gte", "$gt"):
+                    params["date_from"] = bound + (op == "$gt")
+                elif op in ("$lte", "$lt"):
+                    params["date_to"] = bound - (op == "$lt")
+                else:
+                    return None
+        else:
+            return None
+    return params
+
+
+def rrf_fuse(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Reciprocal Rank Fusion：score(d) = Σ 1 / (k + rank)，rank 从 1 开始；按分数降序返回"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+
+
+def merge_results(per_query: List[List[Dict[str, Any]]], limit: int) -> List[Dict[str, Any]]:
+    """合并多个查询的结果：同一分块只保留排名最好的一次，按相关度取前 limit 个"""
+    best: Dict[str, Dict[str, Any]] = {}
+    for chunks in per_query:
+        for c in chunks:
+            if c["id"] not in best or _rank_key(c) < _rank_key(best[c["id"]]):
+                best[c["id"]] = c
+    return sorted(best.values(), key=_rank_key)[:limit]
+
+
+def _rank_key(c: Dict[str, Any]) -> float:
+    """越小越相关：混合检索用 -RRF 分数，纯向量检索用距离"""
+    return -c["rrf"] if "rrf" in c else c["score"]
+
+
+def _split_trials(rag_chunks: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """
+    按 trial / others 分组，返回 [trial_chunks, other_chunks]。
+    用列表而不是元组：结果经 msgpack / JSON 缓存往返后元组会变成列表，命中与未命中要返回同一种形状
+    """
+    trial = SourceType.clinical_trials.value
+    trial_chunks = [c for c in rag_chunks if c["metadata"]["source"] == trial]
+    other_chunks = [c for c in rag_chunks if c["metadata"]["source"] != trial]
+    return [trial_chunks, other_chunks]
+
+
+# ============================================================
+# 按数据源配额检索
+# ============================================================
+def source_quotas() -> Dict[str, int]:
+    """解析 RAG_SOURCE_QUOTAS（"pubmed:4,arxiv:3,..."）"""
+    quotas = {}
+    for part in settings.rag_source_quotas.split(","):
+        name, _, n = part.partition(":")
+        if name.strip() and n.strip():
+            quotas[name.strip()] = int(n)
+    return quotas
+
+
+def build_where(source: Optional[str] = None, date_from=None, date_to=None) -> Optional[Dict]:
+    """
+    组装 Chroma where：数据源 + 日期范围（date_int 闭区间）。
+    date_from / date_to 可以是 "2023-01-01" 这类字符串，也可以是 YYYYMMDD 整数。
+    """
+    conds = []
+    if source:
+        conds.append({"source": source})
+    if date_from is not None:
+        conds.append({"date_int": {"$gte": date_to_int(date_from)}})
+    if date_to is not None:
+        conds.append({"date_int": {"$lte": date_to_int(date_to)}})
+    if not conds:
+        return None
+    return conds[0] if len(conds) == 1 else {"$and": conds}
+
+
+def query_rag_by_source(queries: List[str], quotas: Optional[Dict[str, int]] = None,
+                        date_from=None, date_to=None, hybrid: Optional[bool] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    每个数据源在自己的分区内检索（source / 日期条件下推到 where），各取配额条，多个数据源并发。
+    一个数据源结果再多也不会挤掉其它数据源。返回 {source: 结果列表}。
+    """
+    quotas = quotas or source_quotas()
+    embedder.embed_queries(list(queries))  # 先嵌入一次，各数据源的检索直接命中查询向量 LRU
+
+    futures = {
+        source: _source_pool.submit(query_rag_many, queries, n, build_where(source, date_from, date_to), hybrid)
+        for source, n in quotas.items() if n > 0
+    }
+    results = {}
+    for source, fut in futures.items():
+        try:
+            results[source] = merge_results(fut.result(), quotas[source])
+        except Exception as e:
+            logger.warning(f"[RAG] 数据源 {source} 检索失败: {e}")
+            results[source] = []
+    return results
+
+
+# 入库时 medical_docs 代际号 +1，缓存随之失效，所以 TTL 可以放长到 7 天；
+# 完全相同的调用由外层 cache_result 直接命中，不必嵌入查询；内层语义缓存让说法不同的近重复查询也能命中
+@cache_result(ttl_seconds=7 * 86400, key_prefix="rag", generation="medical_docs")
+@semantic_cached("rag", ttl_seconds=7 * 86400, generation="medical_docs")
+def query_rag(query: str, top_k: int = 5, hybrid: bool = None) -> List[List[Dict[str, Any]]]:
+    """RAG 查询：将结果按 trial / others 分组返回 [trial_chunks, other_chunks]（hybrid 见 query_rag_many）"""
+    return _split_trials(query_rag_many([query], top_k=top_k, hybrid=hybrid)[0])
+
+
+@cache_result(ttl_seconds=7 * 86400, key_prefix="rag", generation="medical_docs")
+@semantic_cached("rag", ttl_seconds=7 * 86400, generation="medical_docs", query_arg="topic")
+def query_rag_expanded(topic: str, quotas: Dict[str, int] = None, date_from=None,
+                       date_to=None) -> List[List[Dict[str, Any]]]:
+    """
+    多子查询 + 按数据源配额的 RAG：主题展开成若干子查询，每个数据源分区内批量检索并合并去重，
+    覆盖模型 / 数据集 / 代码 / 临床试验等不同侧面，且每个数据源都有固定名额。
+    返回与 query_rag 相同的 [trial_chunks, other_chunks]。
+    """
+    by_source = query_rag_by_source(expand_queries(topic), quotas, date_from, date_to)
+    return _split_trials([c for chunks in by_source.values() for c in chunks])
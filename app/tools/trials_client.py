@@ -1,30 +1,62 @@
-import requests
-from typing import List, Dict, Any
+import asyncio
+from typing import List, Dict, Any, AsyncIterator, Optional
 from app.models.document import DocumentChunk
+from app.core.config import settings
 from app.core.data_clean import clean_metadata
-from app.tools.chunking import chunk_text
+from app.core.http_pool import http_pool
+from app.core.logger import get_logger
+from app.core.watermark import watermarks
+from app.models.enums import SourceType
+from app.tools.chunking import sentence_chunk
 
-BASE_URL = "https://clinicaltrials.gov/api/v2/studies"
-
-
-def fetch_trials(topic: str, max_results: int = 10) -> List[Dict[str, Any]]:
-    """同步请求 ClinicalTrials.gov"""
-    params = {
-        "query.term": topic,
-        "pageSize": max_results,
-    }
-
-    resp = requests.get(
-        BASE_URL,
-        params=params,
-        headers={
-            "User-Agent": "Mozilla/5.0",
-            "Accept": "application/json",
-        },
-    )
+logger = get_logger(__name__)
 
-    resp.raise_for_status()
-    return resp.json().get("studies", [])
+BASE_URL = "https://clinicaltrials.gov/api/v2/studies"
+HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Accept": "application/json",
+}
+
+
+async def iter_trials(topic: str, max_results: int = 10, page_size: int = None,
+                      since: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    异步分页请求 ClinicalTrials.gov v2：沿 nextPageToken 翻页，逐条 yield study。
+    max_results 是跨页的总上限，最后一页只请求剩余数量。
+    since: 增量模式，只检索 LastUpdatePostDate >= since（YYYY-MM-DD）的试验，按更新时间倒序
+    """
+    page_size = page_size or settings.trials_page_size
+    remaining = max_results
+    page_token = None
+
+    while remaining > 0:
+        params = {
+            "query.term": topic,
+            "pageSize": min(page_size, remaining),
+        }
+        if since:
+            params["filter.advanced"] = f"AREA[LastUpdatePostDate]RANGE[{since},MAX]"
+            params["sort"] = "LastUpdatePostDate:desc"
+        if page_token:
+            params["pageToken"] = page_token
+
+        resp = await http_pool.get(BASE_URL, limiter="trials", params=params, headers=HEADERS)
+        resp.raise_for_status()
+        data = resp.json()
+
+        studies = data.get("studies", [])
+        for study in studies[:remaining]:
+            yield study
+        remaining -= min(len(studies), remaining)
+
+        page_token = data.get("nextPageToken")
+        if not page_token or not studies:
+            break
+
+
+async def fetch_trials(topic: str, max_results: int = 10) -> List[Dict[str, Any]]:
+    """异步请求 ClinicalTrials.gov，收集为列表返回"""
+    return [study async for study in iter_trials(topic, max_results=max_results)]
 
 
 def parse_trial_metadata(trial: Dict[str, Any]) -> Dict[str, Any]:
@@ -41,11 +73,18 @@ def parse_trial_metadata(trial: Dict[str, Any]) -> Dict[str, Any]:
         "trial_status": status.get("overallStatus"),
         "trial_enrollment": design.get("enrollmentInfo", {}).get("count"),
         "url": f"https://clinicaltrials.gov/study/{ident.get('nctId')}",
+        "date": last_update_date(trial),
     }
 
     return clean_metadata(meta)
 
 
+def last_update_date(trial: Dict[str, Any]) -> str:
+    """试验最近一次更新的发布日期（YYYY-MM-DD），缺失时返回空串"""
+    status = trial.get("protocolSection", {}).get("statusModule", {})
+    return status.get("lastUpdatePostDateStruct", {}).get("date") or ""
+
+
 def trial_to_chunk(trial: Dict[str, Any]) -> List[DocumentChunk]:
     """把一个 trial 转成 DocumentChunk"""
 
@@ -62,25 +101,49 @@ Enrollment: {design.get('enrollmentInfo', {}).get('count')}
 
     meta = parse_trial_metadata(trial)
 
-    chunks = chunk_text(
+    chunks = sentence_chunk(
         text=text,
-        source="clinical_trials",
+        source=SourceType.clinical_trials.value,
         metadata_extra=meta,
+        source_id=meta.get("trial_id"),
     )
 
     return chunks
 
 
-def ingest_trials(topic: str, max_results: int = 5) -> int:
-    """ClinicalTrials.gov → 分块 → 入库"""
-    from app.tools.chroma_client import ingest
-
-    trials = fetch_trials(topic, max_results=max_results)
-
-    all_chunks = []
-    for t in trials:
-        chunks = trial_to_chunk(t)
-        all_chunks.extend(chunks)
-
-    ingest(all_chunks)
-    return len(all_chunks)
\ No newline at end of file
+async def ingest_trials(topic: str, max_results: int = 5, incremental: bool = None) -> int:
+    """
+    ClinicalTrials.gov → 分块 → 入库
+    study 边到达边分块，每攒满一页就入库一次，不必等全部结果返回。
+    增量模式下只抓水位线（最新 LastUpdatePostDate）之后更新过的试验。
+    入库交给后台队列，翻下一页的同时写入上一页。
+    """
+    from app.tools.ingest_queue import ingest_queue
+
+    incremental = settings.incremental_ingest if incremental is None else incremental
+    mark = watermarks.get("trials", topic, depth=max_results) if incremental else {}
+    latest = mark.get("last_update") or ""
+
+    page_size = settings.trials_page_size
+    pending: List[DocumentChunk] = []
+    writes = []
+    n_studies = 0
+
+    async for t in iter_trials(topic, max_results=max_results, page_size=page_size,
+                               since=mark.get("last_update")):
+        pending.extend(trial_to_chunk(t))
+        latest = max(latest, last_update_date(t))
+        n_studies += 1
+        if n_studies % page_size == 0:
+            writes.append(await ingest_queue.submit_async(pending))
+            pending = []
+
+    if pending:
+        writes.append(await ingest_queue.submit_async(pending))
+    total = sum(await asyncio.gather(*writes))
+
+    if latest:
+        watermarks.set("trials", topic, depth=max_results, capped=n_studies >= max_results,
+                       last_update=latest)
+    logger.info(f"[Trials] 抓取 {n_studies} 个试验，入库 {total} 个分块（topic='{topic}'）")
+    return total
@@ -7,11 +7,23 @@ from app.tools.pubmed_client import ingest_pubmed
 from app.tools.arxiv_client import ingest_arxiv
 from app.tools.github_client import ingest_github
 from app.tools.trials_client import ingest_trials
-from app.tools.rag_query import query_rag
-from app.agents.writer import generate_markdown_report
-from app.tools.pdf_exporter import save_markdown_as_pdf
+from app.tools.rag_query import query_rag_expanded
+from app.agents.writer import iter_report_sections, report_header
+from app.tools.pdf_artifacts import MARKDOWN_MIME
+from app.core.artifact_store import artifact_store
+from app.models.enums import ArtifactType
 from app.core.state_manager import state_manager
 from app.core.memory import task_memory
+from app.core.http_pool import http_pool
+from app.core.http_cache import response_cache
+from app.core.rate_limiter import limiter_stats
+from app.core.metrics import export_stats
+from app.core.cache import cache_engine
+from app.core.semantic_cache import semantic_cache
+from app.core.report_stream import report_stream
+from app.core.config import settings
+from app.tools.embedding_service import embedder
+from app.tools.ingest_queue import ingest_queue
 from app.models.plan import ExecutionPlan 
 from app.tools.data_analyst import generate_comparison_tables
 
@@ -29,7 +41,8 @@ class PlannerAgent(BaseWorker):
 
         # 记忆检索
         # 尝试回忆是否做过类似任务
-        past_knowledge = task_memory.recall_task(topic)
+        past_knowledge = task_memory.recall_task(topic, depth=depth)
+        export_stats("memory", task_memory.snapshot())
         if past_knowledge:
             print(f"[Planner] 发现类似任务记忆: {past_knowledge['topic']}")
             print("[Planner] 策略调整: 跳过抓取，复用历史知识。")
@@ -58,6 +71,9 @@ class PlannerAgent(BaseWorker):
 class CrawlerAgent(BaseWorker):
     def __init__(self):
         super().__init__(Topic.CRAWLER, Topic.RAG)
+        # 常驻事件循环：跨任务复用 http_pool 中的 keep-alive 连接
+        # （asyncio.run 每次都会新建并关闭 loop，连接池也随之作废）
+        self.loop = asyncio.new_event_loop()
 
     def process(self, payload: TaskPayload) -> TaskPayload:
         topic = payload.topic
@@ -67,33 +83,45 @@ class CrawlerAgent(BaseWorker):
         print(f"🕷️ [Crawler] 执行计划: {plan.sources} (Limit: {plan.max_items})")
 
         async def run_crawlers():
-            tasks = []
+            tasks = {}
             # 动态构建 DAG (基于 Plan)
             if "pubmed" in plan.sources:
-                tasks.append(ingest_pubmed(topic, max_results=plan.max_items))
+                tasks["pubmed"] = ingest_pubmed(topic, max_results=plan.max_items)
             if "arxiv" in plan.sources:
-                tasks.append(ingest_arxiv(topic, max_results=plan.max_items))
+                tasks["arxiv"] = ingest_arxiv(topic, max_results=plan.max_items)
             if "github" in plan.sources:
-                tasks.append(ingest_github(topic, top_n=min(3, plan.max_items)))# GitHub 抓取数量不宜过多
-            
-
-            # 并发执行文献和代码抓取
-            if tasks:
-                await asyncio.gather(*tasks, return_exceptions=True)
-            # 试验抓取 (如果计划启用)
+                tasks["github"] = ingest_github(topic, top_n=min(3, plan.max_items))# GitHub 抓取数量不宜过多
+            # 试验抓取 (如果计划启用)：异步分页客户端，与其他来源一起并发
             if plan.enable_trials:
-                try:
-                    ingest_trials(topic) # 假设 ingest_trials 内部已支持 limit 或暂不支持
-                    print("✅ [Crawler] ClinicalTrials 抓取完成")
-                except Exception as e:
-                    print(f"⚠️ [Crawler] Trials 失败: {e}")
+                tasks["trials"] = ingest_trials(topic, max_results=plan.max_items)
             else:
                 print("⏭️ [Crawler] 跳过 ClinicalTrials (根据计划)")
 
-        asyncio.run(run_crawlers())
+            # 并发执行文献、代码和试验抓取
+            if tasks:
+                results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+                for name, res in zip(tasks.keys(), results):
+                    if isinstance(res, Exception):
+                        print(f"⚠️ [Crawler] {name} 失败: {res}")
+                    else:
+                        print(f"✅ [Crawler] {name} 抓取完成，入库 {res} 个分块")
+
+        self.loop.run_until_complete(run_crawlers())
+        export_stats("http_pool", http_pool.stats())
+        export_stats("rate_limiter", limiter_stats())
+        export_stats("http_cache", response_cache.snapshot())
+        export_stats("embedding", embedder.snapshot())
+        export_stats("ingest_queue", ingest_queue.snapshot())
         
         return payload.next_step("crawling_done", {"plan_executed": plan.mode})
 
+    def on_shutdown(self):
+        """写完入库队列，关闭连接池、嵌入线程池并释放事件循环"""
+        ingest_queue.close(timeout=60)
+        self.loop.run_until_complete(http_pool.aclose(self.loop))
+        self.loop.close()
+        embedder.shutdown()
+
 # 3. RAG Agent: 负责检索
 class RagAgent(BaseWorker):
     def __init__(self):
@@ -103,7 +131,11 @@ class RagAgent(BaseWorker):
         topic = payload.topic
         print(f"🔍 [RAG] 正在检索上下文...")
         
-        results = query_rag(topic, top_k=5)
+        # 原始主题 + 各侧面子查询，每个数据源按配额在各自分区内检索
+        results = query_rag_expanded(topic)
+        export_stats("embedding", embedder.snapshot())
+        export_stats("result_cache", cache_engine.snapshot())
+        export_stats("semantic_cache", semantic_cache.snapshot())
         # 将结果存入 data 传递给 Writer
         # 注意：results 是 dict 列表，可以直接序列化
         
@@ -117,31 +149,72 @@ class WriterAgent(BaseWorker):
     def process(self, payload: TaskPayload) -> TaskPayload:
         topic = payload.topic
         context = payload.data.get("rag_context", [])
-        
-        print(f"✍️ [Writer] 正在构建数据表格...")
-        # 1. 生成对比表
-        tables_md = generate_comparison_tables(context)
-
-        print(f"✍️ [Writer] 正在撰写报告...")
-        report = generate_markdown_report(topic, context)
-        final_report = report.replace(
-            "# 医学技术自动化报告：", 
-            f"# 医学技术自动化报告：{topic}\n\n{tables_md}\n\n## 自动生成报告正文" #将表格插在报告最前面
-        )
-
-
-        # 保存文件
         task_id = payload.task_id
-        md_path = f"report_{task_id}.md"
-        with open(md_path, "w", encoding="utf-8") as f:
-            f.write(final_report)
-            
-        # 导出 PDF
+        report_stream.start(task_id, payload.params.get("submitted_at"))
+        streamed = False
+
+        def render_header(tables_md: str) -> str:
+            # 开头一节含主题文字，每次按本任务的主题渲染，不进缓存
+            return report_header(topic).replace(
+                "# 医学技术自动化报告：",
+                f"# 医学技术自动化报告：{topic}\n\n{tables_md}\n\n## 自动生成报告正文" #将表格插在报告最前面
+            )
+
+        def compose_body():
+            nonlocal streamed
+            streamed = True
+            print(f"✍️ [Writer] 正在构建数据表格...")
+            # 1. 生成对比表
+            tables_md = generate_comparison_tables(context)
+            report_stream.publish(task_id, "header", render_header(tables_md))
+
+            print(f"✍️ [Writer] 正在撰写报告...")
+            # 2. 分节生成，每节写好立即推送到 stream:report:{task_id}，前端通过 SSE 边生成边渲染
+            sections = []
+            for name, md in iter_report_sections(topic, context):
+                if name == "header":
+                    continue
+                report_stream.publish(task_id, name, md)
+                sections.append([name, md])
+            return {"tables_md": tables_md, "sections": sections}
+
+        # 无论成功与否都要发布结束标记，否则 SSE 客户端会一直等到超时
+        status = "failed"
         try:
-            pdf_path = save_markdown_as_pdf(task_id, final_report)
-            print(f"🎉 [Writer] 任务完成！PDF: {pdf_path}")
-        except Exception:
-            print("⚠️ PDF 生成失败，但 MD 已保存")
+            # 语义缓存：同一数据代际下，近重复主题（大小写 / 空白 / 近义说法）直接复用已生成的报告正文；
+            # 只缓存与主题文字无关的部分（对比表 + 除开头以外的各节），标题按本次主题重新渲染。
+            # 记忆复用路径的上下文不同，单独分区
+            body = semantic_cache.get_or_compute(
+                "report", topic, compose_body, settings.report_cache_ttl_s,
+                params_key=f"body:{payload.params.get('depth', 'light')}:{payload.step}",
+                generation="medical_docs",
+            )
+            header = render_header(body["tables_md"])
+            if not streamed:  # 缓存命中：把缓存的各节一次性推送
+                report_stream.publish(task_id, "header", header)
+                for name, md in body["sections"]:
+                    report_stream.publish(task_id, name, md)
+            sections = [["header", header]] + body["sections"]
+            report = "\n".join([report_header(topic)] + [md for _, md in body["sections"]])
+            final_report = "\n".join(md for _, md in sections)
+
+            # 保存文件：Markdown 存进内容寻址的产物存储（同时生成 gzip 预压缩版本），PDF 在第一次下载时才渲染
+            section_names = [name for name, _ in sections]
+            md_artifact = artifact_store.save(task_id, ArtifactType.markdown, final_report.encode("utf-8"), MARKDOWN_MIME,
+                                              meta={"sections": section_names})
+            md_path = md_artifact.uri
+            state_manager.save_report_meta(task_id, {
+                "md_path": md_path,
+                "sha256": md_artifact.meta["sha256"],
+                "bytes": md_artifact.meta["size"],
+                "gz_bytes": md_artifact.meta["gz_size"],
+                "sections": section_names,
+            })
+            print(f"🎉 [Writer] 任务完成！Markdown: {md_path}")
+            status = "done"
+        finally:
+            report_stream.finish(task_id, status)
+            export_stats("report_stream", report_stream.snapshot())
 
         # === 存入记忆 ===
         # 提取报告的前 500 字作为摘要存入记忆库
@@ -149,7 +222,8 @@ class WriterAgent(BaseWorker):
         task_memory.remember_task(
             topic=topic,
             summary=summary,
-            artifact_path=pdf_path
+            artifact_path=md_path,
+            depth=payload.params.get("depth", "light")
         )
         print(f"🧠 [Writer] 已将本任务存入长期记忆库。")
         # ==============================
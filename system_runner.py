@@ -6,9 +6,8 @@ from app.models.protocol import TaskPayload
 from app.workers.agents import PlannerAgent, CrawlerAgent, RagAgent, WriterAgent
 from typing import List, Type # 引入 Type 用于类型提示
 
-def start_worker(agent_cls: Type):
-    """启动一个 Worker 实例并运行其主循环。"""
-    worker = agent_cls()
+def start_worker(worker):
+    """运行 Worker 实例的主循环（直到 worker.stop() 被调用）。"""
     worker.run()
 
 def main():
@@ -17,11 +16,12 @@ def main():
     
     # 1. 启动所有 Worker (在独立线程中)
     agents: List[Type] = [PlannerAgent, CrawlerAgent, RagAgent, WriterAgent]
+    workers = [cls() for cls in agents]
     threads = []
     
-    for cls in agents:
+    for worker in workers:
         # daemon=True 保证主线程退出时，worker 线程也会退出
-        t = threading.Thread(target=start_worker, args=(cls,), daemon=True)
+        t = threading.Thread(target=start_worker, args=(worker,), daemon=True)
         t.start()
         threads.append(t)
         
@@ -31,6 +31,11 @@ def main():
             time.sleep(1)
     except KeyboardInterrupt:
         print("停止系统...")
+        # 通知所有 Worker 退出主循环，并执行各自的关闭钩子（释放连接池等）
+        for worker in workers:
+            worker.stop()
+        for t in threads:
+            t.join(timeout=10)
     
     # --- 2. 发送测试任务 ---
 
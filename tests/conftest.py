@@ -0,0 +1,88 @@
+# tests/conftest.py
+"""
+测试环境（在导入任何 app 模块之前完成，所以放在模块顶层）：
+  - 工作目录切到临时目录，Chroma / HTTP 缓存 / 嵌入缓存 / 产物等相对路径都落在这里；
+  - Redis 换成 fakeredis、MongoDB 换成 mongomock，同一进程内共享一个假服务端；
+  - 嵌入模型换成确定性的词袋哈希向量（词重合越多余弦越高），不下载模型。
+"""
+import functools
+import hashlib
+import os
+import re
+import tempfile
+
+import fakeredis
+import mongomock
+import numpy as np
+import pymongo
+import pytest
+import redis
+import redis.asyncio
+
+WORKDIR = tempfile.mkdtemp(prefix="medical-radar-tests-")
+os.chdir(WORKDIR)
+
+_redis_server = fakeredis.FakeServer()
+redis.Redis = functools.partial(fakeredis.FakeRedis, server=_redis_server)
+redis.asyncio.Redis = functools.partial(fakeredis.FakeAsyncRedis, server=_redis_server)
+pymongo.MongoClient = mongomock.MongoClient
+
+EMBED_DIM = 64
+
+
+def fake_embed(texts):
+    """词袋哈希向量：每个词映射到一个维度，L2 归一化"""
+    out = []
+    for text in texts:
+        vec = np.zeros(EMBED_DIM, dtype=np.float32)
+        vec[0] = 1e-3  # 空文本也不是零向量
+        for word in re.findall(r"\w+", text.lower()):
+            vec[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % EMBED_DIM] += 1.0
+        out.append(vec / np.linalg.norm(vec))
+    return out
+
+
+from app.tools.embedding_service import embedder  # noqa: E402
+
+embedder.base_fn = fake_embed
+
+
+@pytest.fixture(autouse=True)
+def clean_backends():
+    """每个用例开始前清空 Redis 与 MongoDB"""
+    from app.core.db import db
+    redis.Redis().flushall()
+    for name in db.db.list_collection_names():
+        db.db[name].delete_many({})
+    yield
+
+
+@pytest.fixture
+def mock_http(monkeypatch):
+    """
+    让 http_pool 新建的 httpx.AsyncClient 走 MockTransport：
+    handler(request) -> httpx.Response；返回收到的请求列表供断言
+    """
+    import httpx
+    from app.core.http_cache import response_cache
+    from app.core.http_pool import http_pool
+
+    seen = []
+    state = {"handler": None}
+
+    def transport_handler(request):
+        seen.append(request)
+        return state["handler"](request)
+
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(httpx, "AsyncClient",
+                        functools.partial(real_client, transport=httpx.MockTransport(transport_handler)))
+    http_pool._clients.clear()
+    monkeypatch.setattr(response_cache, "mode", "off")  # 需要响应缓存的用例自行打开
+
+    def install(handler):
+        state["handler"] = handler
+        return seen
+
+    yield install
+    http_pool._clients.clear()
@@ -0,0 +1,116 @@
+# tests/test_artifact_route.py
+import os
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.main import app
+from api.routes import artifact as artifact_route
+from app.core.artifact_store import artifact_store
+from app.models.enums import ArtifactType
+from app.tools.pdf_artifacts import MARKDOWN_MIME
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def report():
+    task_id = f"t-{uuid.uuid4().hex[:8]}"
+    body = ("# 报告\n" + "polyp segmentation evidence line\n" * 200 + uuid.uuid4().hex).encode("utf-8")
+    md = artifact_store.save(task_id, ArtifactType.markdown, body, MARKDOWN_MIME)
+    return task_id, body, md
+
+
+def _url(task_id):
+    return f"/api/artifact/{task_id}/markdown"
+
+
+def test_full_and_gzip_downloads(client, report):
+    task_id, body, md = report
+    plain = client.get(_url(task_id), headers={"Accept-Encoding": "identity"})
+    assert plain.status_code == 200 and plain.content == body
+    assert plain.headers["etag"] == f'"{md.meta["sha256"]}"'
+
+    raw = client.get(_url(task_id), headers={"Accept-Encoding": "gzip"})
+    assert raw.headers["content-encoding"] == "gzip"
+    assert raw.headers["etag"] == f'"{md.meta["sha256"]}-gzip"'
+    assert "Accept-Encoding" in raw.headers["vary"]
+    assert raw.content == body  # httpx 自动解压
+    assert int(raw.headers["content-length"]) == md.meta["gz_size"] < len(body)
+
+
+def test_conditional_get_returns_304(client, report):
+    task_id, _, md = report
+    for etag in (f'"{md.meta["sha256"]}"', f'W/"{md.meta["sha256"]}-gzip", "other"'):
+        resp = client.get(_url(task_id), headers={"If-None-Match": etag})
+        assert resp.status_code == 304 and resp.content == b""
+
+
+@pytest.mark.parametrize("range_header, first, last", [
+    ("bytes=0-9", 0, 9),
+    ("bytes=10-", 10, None),
+    ("bytes=-5", -5, None),
+    ("bytes=100-99999999", 100, None),  # 结尾越界时截到文件末尾
+])
+def test_range_requests(client, report, range_header, first, last):
+    task_id, body, _ = report
+    first = first % len(body)
+    last = len(body) - 1 if last is None else last
+    resp = client.get(_url(task_id), headers={"Range": range_header, "Accept-Encoding": "gzip"})
+    assert resp.status_code == 206
+    assert resp.content == body[first:last + 1]
+    assert "content-encoding" not in resp.headers  # Range 总是按原始字节
+    assert resp.headers["content-range"] == f"bytes {first}-{last}/{len(body)}"
+
+
+def test_unsatisfiable_range_and_if_range(client, report):
+    task_id, body, md = report
+    resp = client.get(_url(task_id), headers={"Range": f"bytes={len(body)}-"})
+    assert resp.status_code == 416 and resp.headers["content-range"] == f"bytes */{len(body)}"
+
+    stale = client.get(_url(task_id), headers={"Range": "bytes=0-9", "If-Range": '"old-etag"',
+                                                "Accept-Encoding": "identity"})
+    assert stale.status_code == 200 and stale.content == body
+    fresh = client.get(_url(task_id), headers={"Range": "bytes=0-9", "If-Range": f'"{md.meta["sha256"]}"'})
+    assert fresh.status_code == 206 and fresh.content == body[:10]
+
+
+@pytest.mark.parametrize("headers", [{"Range": "bytes=0-9"}, {"Accept-Encoding": "identity"}])
+def test_missing_object_is_404_before_streaming(client, report, monkeypatch, headers):
+    task_id, _, md = report
+    monkeypatch.setattr(artifact_route, "markdown_for_task", lambda _: md)  # 索引还在，对象文件已被清理
+    os.remove(md.uri)
+    served = dict(artifact_store.stats)
+
+    resp = client.get(_url(task_id), headers=headers)
+    assert resp.status_code == 404
+    assert artifact_store.stats["served_200"] == served["served_200"]
+    assert artifact_store.stats["served_206"] == served["served_206"]
+
+
+def test_missing_gzip_variant_is_404(client, report):
+    task_id, _, md = report
+    os.remove(artifact_store.gzip_path(md.meta["sha256"]))
+    assert client.get(_url(task_id), headers={"Accept-Encoding": "gzip"}).status_code == 404
+    assert client.get(_url(task_id), headers={"Accept-Encoding": "identity"}).status_code == 200
+
+
+def test_full_render_queue_is_503_with_retry_after(client, monkeypatch):
+    from app.core.config import settings
+    from app.tools.pdf_render_service import RenderQueueFull
+
+    def queue_full(task_id):
+        raise RenderQueueFull(f"PDF 渲染队列已满（{task_id}）")
+
+    monkeypatch.setattr(artifact_route.pdf_artifacts, "pdf_for_task", queue_full)
+    resp = client.get("/api/artifact/busy")
+    assert resp.status_code == 503
+    assert resp.headers["retry-after"] == str(settings.pdf_retry_after_s)
+
+    monkeypatch.setattr(artifact_route.pdf_artifacts, "pdf_for_task",
+                        lambda task_id: (_ for _ in ()).throw(RuntimeError("weasyprint crashed")))
+    assert client.get("/api/artifact/broken").status_code == 500
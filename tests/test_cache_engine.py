@@ -0,0 +1,97 @@
+# tests/test_cache_engine.py
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.cache import _MISS, CacheEngine, decode_value, encode_value
+from app.core.config import settings
+
+
+@pytest.fixture
+def engine():
+    return CacheEngine()
+
+
+@pytest.mark.parametrize("codec", ["msgpack", "json"])
+def test_codec_roundtrip_with_compression(monkeypatch, codec):
+    monkeypatch.setattr(settings, "cache_codec", codec)
+    small = {"a": [1, 2, 3]}
+    large = {"chunks": ["polyp " * 50] * 20}
+    assert decode_value(encode_value(small)) == small
+    raw = encode_value(large)
+    assert raw[1:2] == b"z" and len(raw) < len(str(large))
+    assert decode_value(raw) == large
+    assert decode_value(b'{"legacy": true}') == {"legacy": True}  # 旧版纯 JSON
+
+
+def test_redis_hit_refills_local_tier(engine):
+    engine.set("k:two-tier", {"v": 1}, ttl=60, prefix="t")
+    engine.local.delete("k:two-tier")  # 模拟另一个进程写入：本地没有
+    assert engine.get("k:two-tier", "t") == {"v": 1}
+    assert engine.local.get("k:two-tier") == {"v": 1}
+    stats = engine.snapshot()["prefixes"]["t"]
+    assert stats["redis_hits"] == 1 and stats["local_hits"] == 0
+    assert engine.get("k:two-tier", "t") == {"v": 1}
+    assert engine.snapshot()["prefixes"]["t"]["local_hits"] == 1
+
+
+def test_threads_compute_once(engine):
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(engine.get_or_compute("k:sf", slow, 60, "t")))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == ["value"] * 8
+    assert len(calls) == 1
+
+
+def test_waits_for_other_process_holding_lock(engine, monkeypatch):
+    monkeypatch.setattr(settings, "cache_lock_wait_s", 5.0)
+    other = CacheEngine()  # 另一个进程
+    token = other._try_lock("k:xproc")
+    assert token
+
+    def finish():
+        time.sleep(0.2)
+        other.set("k:xproc", "from-other", 60, "t")
+        other._unlock("k:xproc", token)
+
+    threading.Thread(target=finish).start()
+    assert engine.get_or_compute("k:xproc", lambda: "computed-here", 60, "t") == "from-other"
+    assert engine.snapshot()["prefixes"]["t"]["waits"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_coroutines_compute_once(engine):
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return [1, 2]
+
+    results = await asyncio.gather(*[engine.aget_or_compute("k:async", slow, 60, "t") for _ in range(10)])
+    assert results == [[1, 2]] * 10
+    assert len(calls) == 1
+    assert engine.local.get("k:async") == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_failed_compute_is_not_cached(engine):
+    async def boom():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        await engine.aget_or_compute("k:fail", boom, 60, "t")
+    assert engine.get("k:fail", "t") is _MISS
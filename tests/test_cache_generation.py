@@ -0,0 +1,78 @@
+# tests/test_cache_generation.py
+import time
+import uuid
+
+import pytest
+
+from app.core.cache import CacheEngine, cache_engine, cache_result
+from app.core.config import settings
+from app.tools.chroma_client import ingest
+from app.tools.chunking import sentence_chunk
+
+
+@pytest.fixture
+def gen_name():
+    return f"test_gen_{uuid.uuid4().hex[:8]}"
+
+
+@pytest.fixture(autouse=True)
+def no_rewarm(monkeypatch):
+    monkeypatch.setattr(settings, "cache_rewarm_top_n", 0)
+
+
+def _counted(gen_name, calls):
+    @cache_result(ttl_seconds=3600, key_prefix="gentest", generation=gen_name)
+    def lookup(q):
+        calls.append(q)
+        return f"{q}#{len(calls)}"
+    return lookup
+
+
+def test_bump_invalidates_cached_results(gen_name):
+    calls = []
+    lookup = _counted(gen_name, calls)
+    assert lookup("polyp") == lookup("polyp") == "polyp#1"
+    cache_engine.bump_generation(gen_name)
+    assert lookup("polyp") == "polyp#2"
+    assert calls == ["polyp", "polyp"]
+
+
+def test_bump_from_other_process_seen_after_refresh(gen_name, monkeypatch):
+    calls = []
+    lookup = _counted(gen_name, calls)
+    lookup("adenoma")
+    CacheEngine().bump_generation(gen_name)  # 另一个进程入库
+    lookup("adenoma")
+    assert len(calls) == 1  # 本进程缓存的代际号还没到刷新时间
+
+    monkeypatch.setattr(settings, "cache_generation_refresh_s", 0.0)
+    lookup("adenoma")
+    assert len(calls) == 2
+
+
+def test_hot_keys_are_rewarmed_after_bump(gen_name, monkeypatch):
+    monkeypatch.setattr(settings, "cache_rewarm_top_n", 1)
+    monkeypatch.setattr(settings, "cache_rewarm_delay_s", 0.05)
+    calls = []
+    lookup = _counted(gen_name, calls)
+    for _ in range(3):
+        lookup("hot")
+    lookup("cold")
+
+    cache_engine.bump_generation(gen_name)
+    deadline = time.time() + 5
+    while len(calls) < 3 and time.time() < deadline:
+        time.sleep(0.02)
+    assert calls == ["hot", "cold", "hot"]  # 只预热了热点 key
+    assert lookup("hot") == "hot#3"  # 预热结果直接命中
+    assert len(calls) == 3
+
+
+def test_ingest_bumps_collection_generation():
+    source_id = uuid.uuid4().hex
+    before = cache_engine.generation("medical_docs")
+    ingest(sentence_chunk("Generation bump check for polyp cohort.", "pubmed", source_id=source_id))
+    assert cache_engine.generation("medical_docs") == before + 1
+    # 重新抓取到完全相同的内容：没有任何变化，不失效
+    ingest(sentence_chunk("Generation bump check for polyp cohort.", "pubmed", source_id=source_id))
+    assert cache_engine.generation("medical_docs") == before + 1
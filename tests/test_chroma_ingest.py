@@ -0,0 +1,63 @@
+# tests/test_chroma_ingest.py
+import uuid
+
+from app.models.enums import SourceType
+from app.tools import chroma_client
+from app.tools.chroma_client import collection, ingest
+from app.tools.chunking import sentence_chunk
+from app.tools.embedding_service import embedder
+
+
+def _repo_chunks(full: str, stars: int, readme: str):
+    return sentence_chunk(
+        text=readme,
+        source=SourceType.github.value,
+        source_id=full,
+        section="readme",
+        metadata_extra={"repo": full, "url": f"https://github.com/{full}", "stars": stars,
+                        "updated_at": "2024-05-06T07:08:09Z"},
+    )
+
+
+def test_github_metadata_is_kept():
+    full = f"org/{uuid.uuid4().hex[:8]}"
+    chunk = _repo_chunks(full, 12, "Polyp detection models for colonoscopy video.")[0]
+    assert chunk.metadata.repo == full
+    assert chunk.metadata.stars == 12
+    assert chunk.metadata.updated_at == "2024-05-06T07:08:09Z"
+
+
+def test_unchanged_content_is_not_reembedded():
+    full = f"org/{uuid.uuid4().hex[:8]}"
+    readme = "Polyp segmentation toolkit. Supports real-time inference on endoscopy frames."
+    ingest(_repo_chunks(full, 10, readme))
+    ids = collection.get(where={"source_id": full}, include=[])["ids"]
+
+    requested = embedder.stats["texts"]  # 嵌入缓存命中也会计数：未调用嵌入函数才算没有重新嵌入
+    ingest(_repo_chunks(full, 10, readme))
+    assert embedder.stats["texts"] == requested
+    assert collection.get(where={"source_id": full}, include=[])["ids"] == ids
+
+
+def test_metadata_only_change_updates_stored_chunk(monkeypatch):
+    full = f"org/{uuid.uuid4().hex[:8]}"
+    readme = "Adenoma detection benchmark. Includes annotated colonoscopy frames."
+    ingest(_repo_chunks(full, 10, readme))
+
+    upserts = []
+    real_upsert = collection.upsert
+    monkeypatch.setattr(chroma_client.collection, "upsert", lambda **kw: upserts.append(kw) or real_upsert(**kw))
+    ingest(_repo_chunks(full, 250, readme))
+
+    stored = collection.get(where={"source_id": full}, include=["metadatas"])
+    assert stored["metadatas"] and all(m["stars"] == 250 for m in stored["metadatas"])
+    assert all(m["date_int"] == 20240506 for m in stored["metadatas"])
+    assert upserts == []  # 只刷新元数据，没有重新写入正文
+
+
+def test_changed_content_replaces_old_chunks():
+    full = f"org/{uuid.uuid4().hex[:8]}"
+    ingest(_repo_chunks(full, 1, "Version one of the polyp readme."))
+    ingest(_repo_chunks(full, 1, "Version two rewrites the polyp readme entirely."))
+    stored = collection.get(where={"source_id": full}, include=["documents"])
+    assert stored["documents"] == ["Version two rewrites the polyp readme entirely."]
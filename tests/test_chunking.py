@@ -0,0 +1,48 @@
+# tests/test_chunking.py
+from app.tools.chunking import count_tokens, iter_chunks, split_sentences
+
+
+def _sentences(n):
+    return [f"Sentence number {i} describes colorectal polyp findings." for i in range(n)]
+
+
+def test_chunks_respect_max_tokens_and_overlap():
+    sents = _sentences(40)
+    chunks = list(iter_chunks(" ".join(sents), "pubmed", source_id="1", max_tokens=40, overlap_tokens=10))
+
+    assert len(chunks) > 1
+    for c in chunks:
+        assert count_tokens(c.content) <= 40
+    # 相邻分块重叠末尾整句，且重叠不超过 overlap_tokens
+    for prev, cur in zip(chunks, chunks[1:]):
+        prev_sents = list(split_sentences(prev.content))
+        cur_sents = list(split_sentences(cur.content))
+        assert cur_sents[0] in prev_sents
+        overlap = [s for s in cur_sents if s in prev_sents]
+        assert sum(count_tokens(s) for s in overlap) <= 10
+    # 每个句子都至少出现在一个分块里
+    covered = {s for c in chunks for s in split_sentences(c.content)}
+    assert covered == set(sents)
+
+
+def test_long_sentence_is_hard_split():
+    text = " ".join(f"item{i}" for i in range(95))  # 无标点的长列表
+    chunks = list(iter_chunks(text, "github", source_id="r", max_tokens=30, overlap_tokens=0))
+    assert [count_tokens(c.content) for c in chunks] == [30, 30, 30, 5]
+
+
+def test_cjk_sentences_and_tokens():
+    text = "结肠息肉是常见病变。" * 6
+    assert count_tokens("结肠息肉。") == 5
+    chunks = list(iter_chunks(text, "pubmed", source_id="zh", max_tokens=25, overlap_tokens=0))
+    assert all(count_tokens(c.content) <= 25 for c in chunks)
+    assert "".join(c.content for c in chunks) == text  # 中文句子之间不加空格
+
+
+def test_chunk_ids_are_stable():
+    text = " ".join(_sentences(10))
+    first = [c.chunk_id for c in iter_chunks(text, "pubmed", source_id="42", max_tokens=30)]
+    again = [c.chunk_id for c in iter_chunks(text, "pubmed", source_id="42", max_tokens=30)]
+    other = [c.chunk_id for c in iter_chunks(text, "pubmed", source_id="43", max_tokens=30)]
+    assert first == again
+    assert not set(first) & set(other)
@@ -0,0 +1,101 @@
+# tests/test_embedding_service.py
+import numpy as np
+import pytest
+
+from app.tools.embedding_service import EmbeddingCache, EmbeddingService, QueryEmbeddingCache
+from conftest import fake_embed
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def service(tmp_path, calls):
+    def base_fn(texts):
+        calls.append(list(texts))
+        return fake_embed(texts)
+
+    svc = EmbeddingService(base_fn=base_fn)
+    svc.cache = EmbeddingCache(str(tmp_path), "test-model")
+    svc.batch_size = 4
+    yield svc
+    svc.shutdown()
+
+
+def test_duplicates_are_embedded_once_and_order_kept(service, calls):
+    texts = ["polyp", "adenoma", "polyp", "colonoscopy", "adenoma"]
+    out = service.embed(texts)
+    assert out.shape == (5, 64)
+    assert calls == [["polyp", "adenoma", "colonoscopy"]]
+    np.testing.assert_allclose(out[0], out[2])
+    np.testing.assert_allclose(out[3], fake_embed(["colonoscopy"])[0], rtol=1e-6)
+
+
+def test_micro_batches_keep_input_order(service, calls):
+    texts = [f"text {i}" for i in range(10)]
+    out = service.embed(texts)
+    assert sorted(len(b) for b in calls) == [2, 4, 4]
+    assert service.stats["batches"] == 3
+    np.testing.assert_allclose(out, np.stack(fake_embed(texts)), rtol=1e-6)
+
+
+def test_persistent_cache_is_shared_across_instances(service, calls, tmp_path):
+    service.embed(["polyp", "adenoma"])
+    calls.clear()
+
+    other = EmbeddingService(base_fn=lambda texts: calls.append(list(texts)) or fake_embed(texts))
+    other.cache = EmbeddingCache(str(tmp_path), "test-model")  # 重新打开，模拟另一个进程
+    out = other.embed(["adenoma", "polyp", "sessile"])
+    assert calls == [["sessile"]]
+    assert other.stats["cache_hits"] == 2
+    np.testing.assert_allclose(out[1], fake_embed(["polyp"])[0], rtol=1e-6)
+
+
+def test_cache_grows_past_initial_capacity(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "grow")
+    vectors = {f"k{i}": np.full(8, i, dtype=np.float32) for i in range(1500)}
+    cache.put_many(vectors)
+    got = cache.get_many(["k0", "k1499"])
+    assert got["k1499"][0] == 1499 and got["k0"][0] == 0
+    assert len(cache) == 1500
+
+
+def test_query_lru_normalizes_and_evicts(service, calls):
+    service.query_cache = QueryEmbeddingCache(maxsize=2)
+    service.embed_queries(["Colon  Polyp", "adenoma"])
+    service.embed_queries(["colon polyp"])  # 规范化后命中
+    assert calls == [["colon polyp", "adenoma"]]
+
+    service.embed_queries(["sessile"])  # 淘汰最久未用的 adenoma
+    service.embed_queries(["adenoma", "colon polyp"])
+    assert calls[-1] == ["adenoma"]
+    assert service.query_cache.snapshot()["size"] == 2
+
+
+def test_bench_run_starts_each_mode_cold(service, monkeypatch):
+    from app.eval import bench_retrieval
+
+    monkeypatch.setattr(bench_retrieval, "embedder", service)
+    monkeypatch.setattr(bench_retrieval, "query_rag_many",
+                        lambda qs, **kw: [[{"id": "d"}] for _ in service.embed_queries(qs)])
+    queries = [("polyp detection", "d"), ("adenoma rate", "d")]
+    bench_retrieval.run("vector", queries, [1], None, None)
+    misses = service.query_cache.misses
+    bench_retrieval.run("hybrid", queries, [1], None, None)
+    assert service.query_cache.misses == misses + 2  # 第二种模式没有命中上一轮的查询向量
+
+
+def test_opens_collection_persisted_with_default_function(tmp_path):
+    import chromadb
+    from chromadb.utils import embedding_functions
+
+    from app.tools.embedding_service import embedder
+
+    path = str(tmp_path / "chroma")
+    chromadb.PersistentClient(path=path).create_collection(
+        "persisted", embedding_function=embedding_functions.DefaultEmbeddingFunction())
+    reopened = chromadb.PersistentClient(path=path).get_or_create_collection("persisted", embedding_function=embedder)
+    reopened.add(ids=["a"], documents=["colon polyp segmentation"])
+    assert reopened.count() == 1
@@ -0,0 +1,77 @@
+# tests/test_evidence.py
+import numpy as np
+import pytest
+
+from app.agents import evidence
+from app.agents.evidence import consolidate_evidence, similarity_clusters
+from app.agents.fact_enricher import classify_facts
+from app.core.config import settings
+from app.tools.embedding_service import embedder
+
+
+def _brute_force(vectors, threshold):
+    v = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    sims = v @ v.T
+    labels = list(range(len(v)))
+    for i in range(len(v)):
+        for j in range(i + 1, len(v)):
+            if sims[i, j] >= threshold:
+                old, new = max(labels[i], labels[j]), min(labels[i], labels[j])
+                labels = [new if x == old else x for x in labels]
+    groups = {}
+    for i, label in enumerate(labels):
+        groups.setdefault(label, []).append(i)
+    return list(groups.values())
+
+
+@pytest.mark.parametrize("block", [1, 3, 7, 1024])
+def test_blocked_clusters_match_brute_force(block):
+    rng = np.random.RandomState(0)
+    centers = rng.normal(size=(5, 16))
+    vectors = np.concatenate([c + rng.normal(scale=0.05, size=(6, 16)) for c in centers])
+    vectors = vectors[rng.permutation(len(vectors))]
+    assert similarity_clusters(vectors, 0.9, block=block) == _brute_force(vectors, 0.9)
+    assert len(similarity_clusters(vectors, 0.9, block=block)) == 5
+
+
+def test_keys_block_merging():
+    vectors = np.ones((3, 4))
+    assert similarity_clusters(vectors, 0.5, keys=["0.91", "0.85", "0.91"]) == [[0, 2], [1]]
+    assert similarity_clusters(np.zeros((0, 4)), 0.5) == []
+
+
+RESULTS = [
+    {"content": "Transformer segmentation improves polyp detection on Kvasir colonoscopy frames.",
+     "metadata": {"source": "pubmed"}},
+    {"content": "On Kvasir colonoscopy frames, transformer segmentation improves polyp detection.",
+     "metadata": {"source": "arxiv"}},
+    {"content": "Capsule endoscopy battery life remains a practical limitation.",
+     "metadata": {"source": "arxiv"}},
+]
+
+
+def test_reworded_sentences_from_two_sources_are_one_fact():
+    conclusion, to_verify = classify_facts(consolidate_evidence(RESULTS, threshold=0.85))
+    assert len(conclusion) == 1 and conclusion[0]["sources"] == ["arxiv", "pubmed"]
+    assert [e["fact"] for e in to_verify] == ["Capsule endoscopy battery life remains a practical limitation"]
+
+
+def test_identical_sentences_are_embedded_once(monkeypatch):
+    seen = []
+    real = embedder.embed
+    monkeypatch.setattr(embedder, "embed", lambda texts: seen.append(list(texts)) or real(texts))
+    consolidate_evidence(RESULTS + [{"content": "capsule endoscopy battery life remains a practical limitation",
+                                     "metadata": {"source": "pubmed"}}])
+    assert len(seen) == 1 and len(seen[0]) == 3
+
+
+def test_falls_back_to_minhash(monkeypatch):
+    calls = []
+    monkeypatch.setattr(evidence, "extract_key_facts", lambda results: calls.append(results) or {})
+
+    monkeypatch.setattr(settings, "evidence_mode", "minhash")
+    consolidate_evidence(RESULTS)
+    monkeypatch.setattr(settings, "evidence_mode", "embedding")
+    monkeypatch.setattr(embedder, "embed", lambda texts: (_ for _ in ()).throw(RuntimeError("model down")))
+    consolidate_evidence(RESULTS)
+    assert calls == [RESULTS, RESULTS]
@@ -0,0 +1,67 @@
+# tests/test_fact_clustering.py
+import numpy as np
+import pytest
+
+from app.agents.fact_clustering import MinHasher, cluster_sentences, shingles
+from app.agents.fact_enricher import classify_facts, extract_key_facts, split_facts
+
+
+def _grouped(sentences, **kw):
+    return sorted(sorted(c) for c in cluster_sentences(sentences, **kw))
+
+
+def test_rephrased_sentences_share_a_cluster():
+    sentences = [
+        "The U-Net model achieves a Dice of 0.91 on the Kvasir dataset",
+        "the U-Net model achieves a Dice of 0.91 on the Kvasir dataset!",
+        "The U-Net model achieves a Dice of 0.91 on the Kvasir polyp dataset",
+        "Colonoscopy withdrawal time correlates with adenoma detection rate",
+    ]
+    assert _grouped(sentences) == [[0, 1, 2], [3]]
+
+
+def test_different_numbers_are_different_facts():
+    sentences = [
+        "The U-Net model achieves a Dice of 0.91 on the Kvasir dataset",
+        "The U-Net model achieves a Dice of 0.85 on the Kvasir dataset",
+    ]
+    assert _grouped(sentences) == [[0], [1]]
+
+
+def test_estimated_similarity_tracks_jaccard():
+    a = "colonoscopy video polyp segmentation with transformer encoder and unet decoder"
+    b = "colonoscopy video polyp segmentation with transformer encoder and cnn decoder"
+    sa, sb = set(shingles(a, 2)), set(shingles(b, 2))
+    jaccard = len(sa & sb) / len(sa | sb)
+    sigs = MinHasher(256).signatures([sorted(sa), sorted(sb)])
+    assert abs(np.mean(sigs[0] == sigs[1]) - jaccard) < 0.15
+
+
+def test_blocked_signatures_match_single_block():
+    sets = [shingles(f"polyp sentence number {i} with some shared words", 2) for i in range(50)] + [[]]
+    hasher = MinHasher(32)
+    np.testing.assert_array_equal(hasher.signatures(sets, block=7), hasher.signatures(sets))
+    assert (hasher.signatures(sets)[-1] == np.iinfo(np.uint32).max).all()  # 空句子保持哨兵值
+
+
+def test_bands_must_divide_perm():
+    with pytest.raises(ValueError):
+        cluster_sentences(["a sentence here"], num_perm=64, bands=10)
+
+
+def test_split_facts_keeps_decimals():
+    assert split_facts("Dice reached 0.91 on Kvasir. Sensitivity was 95.2 percent overall。短") == [
+        "Dice reached 0.91 on Kvasir", "Sensitivity was 95.2 percent overall"]
+
+
+def test_near_duplicates_from_two_sources_become_a_conclusion():
+    results = [
+        {"content": "The U-Net model achieves a Dice of 0.91 on the Kvasir dataset. Unrelated pubmed remark here.",
+         "metadata": {"source": "pubmed"}},
+        {"content": "the U-Net model achieves a Dice of 0.91 on the Kvasir polyp dataset.",
+         "metadata": {"source": "arxiv"}},
+    ]
+    conclusion, to_verify = classify_facts(extract_key_facts(results))
+    assert len(conclusion) == 1
+    assert conclusion[0]["sources"] == ["arxiv", "pubmed"]
+    assert [e["fact"] for e in to_verify] == ["Unrelated pubmed remark here"]
@@ -0,0 +1,66 @@
+import asyncio
+import base64
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.tools import github_client
+from app.tools.github_client import fetch_commit_frequency, _collect_repo
+
+
+def _weeks(n, total=2):
+    return [{"total": total, "week": i} for i in range(n)]
+
+
+@pytest.mark.asyncio
+async def test_commit_frequency_waits_for_background_poll(mock_http, monkeypatch):
+    calls = {"n": 0}
+
+    def handler(request):
+        calls["n"] += 1
+        return httpx.Response(202) if calls["n"] == 1 else httpx.Response(200, json=_weeks(20))
+
+    mock_http(handler)
+    monkeypatch.setattr(settings, "github_stats_wait_s", 5.0)
+    assert await fetch_commit_frequency("org/repo-a") == 24  # 最近 12 周，每周 2 次
+
+
+@pytest.mark.asyncio
+async def test_commit_frequency_unknown_when_still_computing(mock_http, monkeypatch):
+    mock_http(lambda request: httpx.Response(202))
+    monkeypatch.setattr(settings, "github_stats_wait_s", 0.05)
+    try:
+        assert await fetch_commit_frequency("org/repo-b") is None
+        assert "org/repo-b" in github_client._stats_pollers  # 后台轮询继续
+    finally:
+        for task in list(github_client._stats_pollers.values()):
+            task.cancel()
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_collect_repo_fans_out_detail_requests(mock_http):
+    in_flight = {"now": 0, "max": 0}
+    readme = base64.b64encode(b"# Polyp toolkit\n\nSegments colon polyps in colonoscopy video.").decode()
+
+    async def slow(request):
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.05)
+        in_flight["now"] -= 1
+        path = request.url.path
+        if path.endswith("/readme"):
+            return httpx.Response(200, json={"content": readme})
+        if path.endswith("/releases/latest"):
+            return httpx.Response(200, json={"body": "v1.0 adds video support."})
+        return httpx.Response(200, json=_weeks(12, total=1))
+
+    mock_http(slow)
+    repo = {"full_name": "org/polyp", "url": "https://github.com/org/polyp", "stars": 42,
+            "updated_at": "2024-05-01T00:00:00Z"}
+    chunks = await _collect_repo(repo, asyncio.Semaphore(6))
+
+    assert in_flight["max"] == 3  # README / Release / Commit 频率同时在途
+    text = " ".join(c.content for c in chunks)
+    assert "Commit Frequency (12 weeks): 12" in text and "Polyp toolkit" in text
@@ -0,0 +1,72 @@
+# tests/test_http_cache.py
+import os
+
+import httpx
+import pytest
+
+from app.core.http_cache import CacheMissError, response_cache
+from app.core.http_pool import http_pool
+
+URL = "https://api.example.org/items"
+
+
+@pytest.fixture
+def cache(mock_http, monkeypatch, tmp_path):
+    monkeypatch.setattr(response_cache, "root", str(tmp_path / "http"))
+    monkeypatch.setattr(response_cache, "mode", "on")
+    monkeypatch.setattr(response_cache, "_index", None)
+    monkeypatch.setattr(response_cache, "stats", dict.fromkeys(response_cache.stats, 0))
+    return mock_http
+
+
+@pytest.mark.asyncio
+async def test_fresh_entry_served_from_disk(cache):
+    seen = cache(lambda req: httpx.Response(200, json={"n": 1}, headers={"ETag": '"v1"'}))
+    first = await http_pool.get(URL, params={"q": "x", "api_key": "secret"})
+    second = await http_pool.get(URL, params={"q": "x"})  # api_key 不参与缓存 Key
+    assert len(seen) == 1
+    assert second.json() == first.json() == {"n": 1}
+    assert second.headers["x-cache"] == "HIT"
+    assert response_cache.stats["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_304_refreshes_metadata_without_rewriting_body(cache):
+    seen = cache(lambda req: httpx.Response(200, json={"n": 1}, headers={"ETag": '"v1"'}))
+    await http_pool.get(URL, params={"q": "x"}, cache_ttl=0)
+    key = response_cache.make_key("GET", URL, {"q": "x"})
+    body_path = response_cache._path(key)
+    body_stat = os.stat(body_path)
+    stored_at = response_cache.load_meta(key)["stored_at"]
+
+    cache(lambda req: httpx.Response(304))
+    resp = await http_pool.get(URL, params={"q": "x"}, cache_ttl=0)
+
+    assert seen[-1].headers["If-None-Match"] == '"v1"'
+    assert resp.status_code == 200 and resp.json() == {"n": 1}
+    assert response_cache.load_meta(key)["stored_at"] > stored_at
+    assert os.stat(body_path).st_ino == body_stat.st_ino  # 正文文件没有被替换
+    assert response_cache.stats["revalidated"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_bytes_writes_and_replays(cache, monkeypatch):
+    payload = b"".join(str(i).encode() * 1000 for i in range(50))
+    cache(lambda req: httpx.Response(200, content=payload))
+    first = b"".join([c async for c in http_pool.stream_bytes("GET", URL, params={"page": 1})])
+
+    monkeypatch.setattr(response_cache, "mode", "replay")
+    replayed = b"".join([c async for c in http_pool.stream_bytes("GET", URL, params={"page": 1})])
+    assert first == replayed == payload
+
+    with pytest.raises(CacheMissError):
+        await http_pool.get(URL, params={"page": 2})
+
+
+def test_eviction_removes_body_and_metadata(cache, monkeypatch):
+    monkeypatch.setattr(response_cache, "max_bytes", 1)
+    key = "aa" + "0" * 62
+    response_cache.store(key, 200, {"etag": '"x"'}, os.urandom(2048))
+    assert response_cache.stats["evictions"] == 1
+    assert not os.path.exists(response_cache._path(key))
+    assert not os.path.exists(response_cache._meta_path(key))
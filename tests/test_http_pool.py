@@ -0,0 +1,42 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.http_pool import http_pool
+
+
+@pytest.mark.asyncio
+async def test_client_shared_per_host_within_loop(mock_http):
+    seen = mock_http(lambda request: httpx.Response(200, json={"path": request.url.path}))
+
+    a = http_pool.get_client("https://example.org/a")
+    b = http_pool.get_client("https://example.org/b?x=1")
+    c = http_pool.get_client("https://other.example.org/")
+    assert a is b
+    assert a is not c
+
+    responses = await asyncio.gather(*(http_pool.get(f"https://example.org/item/{i}") for i in range(5)))
+    assert [r.json()["path"] for r in responses] == [f"/item/{i}" for i in range(5)]
+    assert len(seen) == 5
+    assert http_pool.stats()["hosts"]["example.org"]["requests"] >= 5
+
+
+def test_clients_are_per_event_loop(mock_http):
+    mock_http(lambda request: httpx.Response(200))
+
+    async def grab():
+        return http_pool.get_client("https://example.org/")
+
+    loop1, loop2 = asyncio.new_event_loop(), asyncio.new_event_loop()
+    try:
+        c1 = loop1.run_until_complete(grab())
+        c2 = loop2.run_until_complete(grab())
+        assert c1 is not c2
+        assert loop1.run_until_complete(grab()) is c1
+    finally:
+        loop1.run_until_complete(http_pool.aclose(loop1))
+        loop2.run_until_complete(http_pool.aclose(loop2))
+        loop1.close()
+        loop2.close()
+    assert c1.is_closed and c2.is_closed
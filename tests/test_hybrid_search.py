@@ -0,0 +1,80 @@
+# tests/test_hybrid_search.py
+import uuid
+
+import pytest
+
+from app.tools import chroma_client
+from app.tools.bm25_index import Bm25Index, bm25_index
+from app.tools.chroma_client import client, collection, ingest
+from app.tools.chunking import sentence_chunk
+from app.tools.embedding_service import embedder
+from app.tools.rag_query import query_rag_many, rrf_fuse
+
+
+def test_rrf_rewards_agreement_between_rankings():
+    fused = rrf_fuse([["a", "b", "c"], ["c", "a", "d"]], k=60)
+    ids = [doc_id for doc_id, _ in fused]
+    assert ids[:2] == ["a", "c"]
+    assert set(ids) == {"a", "b", "c", "d"}
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
+
+
+def test_bm25_filters_by_source_and_date(tmp_path):
+    index = Bm25Index(str(tmp_path / "bm25.sqlite3"))
+    index.upsert([
+        ("d1", "NCT01234567 polyp surveillance", "clinical_trials", 20230105),
+        ("d2", "polyp surveillance interval", "pubmed", 20210301),
+        ("d3", "结肠息肉 随访", "pubmed", 20240101),
+    ])
+    assert index.search("NCT01234567")[0][0] == "d1"
+    assert [d for d, _ in index.search("polyp", sources=["pubmed"])] == ["d2"]
+    assert [d for d, _ in index.search("polyp", date_from=20220101)] == ["d1"]
+    assert index.search("息肉")[0][0] == "d3"
+    index.delete(["d1"])
+    assert index.search("NCT01234567") == []
+
+
+def test_hybrid_query_fuses_lexical_only_hits(tmp_path):
+    coll = client.create_collection(f"test_{uuid.uuid4().hex[:8]}", embedding_function=embedder)
+    index = Bm25Index(str(tmp_path / "bm25.sqlite3"))
+    docs = {
+        "v1": "polyp detection deep learning colonoscopy polyp detection",
+        "v2": "polyp detection benchmark colonoscopy",
+        "lex": "registry entry NCT09999999 sessile lesion follow up",
+    }
+    coll.add(ids=list(docs), documents=list(docs.values()), metadatas=[{"source": "pubmed"}] * 3)
+    index.upsert((i, d, "pubmed", None) for i, d in docs.items())
+    try:
+        hits = query_rag_many(["polyp detection NCT09999999"], top_k=3, hybrid=True, coll=coll, index=index)[0]
+    finally:
+        client.delete_collection(coll.name)
+    assert {h["id"] for h in hits} == set(docs)
+    assert all("rrf" in h for h in hits)
+    lexical = next(h for h in hits if h["id"] == "lex")
+    assert lexical["content"] == docs["lex"]  # 只被 BM25 召回的分块补取了正文
+
+
+def _chunks(source_id, date):
+    return sentence_chunk("Serrated polyp surveillance cohort results.", "pubmed",
+                          metadata_extra={"date": date}, source_id=source_id)
+
+
+def test_metadata_update_reaches_bm25_filters():
+    source_id = uuid.uuid4().hex
+    ingest(_chunks(source_id, "2020-01-01"))
+    chunk_id = _chunks(source_id, "2020-01-01")[0].chunk_id
+    assert chunk_id in [d for d, _ in bm25_index.search("serrated", 50, date_to=20201231)]
+
+    ingest(_chunks(source_id, "2024-06-01"))  # 正文不变，只改日期
+    assert chunk_id not in [d for d, _ in bm25_index.search("serrated", 50, date_to=20201231)]
+    assert chunk_id in [d for d, _ in bm25_index.search("serrated", 50, date_from=20240101)]
+
+
+def test_empty_index_is_backfilled_from_chroma(monkeypatch, tmp_path):
+    ingest(_chunks(uuid.uuid4().hex, "2022-02-02"))
+    empty = Bm25Index(str(tmp_path / "fresh.sqlite3"))  # 模拟索引文件是后加的
+    monkeypatch.setattr(chroma_client, "bm25_index", empty)
+    monkeypatch.setattr(chroma_client, "_bm25_checked", False)
+
+    ingest(_chunks(uuid.uuid4().hex, "2023-03-03"))
+    assert empty.count() == collection.count()
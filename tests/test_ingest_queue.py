@@ -0,0 +1,86 @@
+# tests/test_ingest_queue.py
+import asyncio
+import threading
+
+import pytest
+
+from app.core.config import settings
+from app.tools import chroma_client
+from app.tools.chunking import sentence_chunk
+from app.tools.ingest_queue import IngestQueue
+
+
+def _chunks(n, tag):
+    text = " ".join(f"Sentence {tag} {i} about polyps." for i in range(n))
+    return sentence_chunk(text, "pubmed", source_id=tag)
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    """替换 chroma_client.ingest：记录每次写入的分块数；gate 未打开前阻塞写入线程（进入时设置 busy）"""
+    calls = []
+    gate, busy = threading.Event(), threading.Event()
+    gate.set()
+
+    def fake_ingest(chunks):
+        busy.set()
+        gate.wait(5)
+        if any(c.metadata.source_id == "bad" for c in chunks):
+            raise RuntimeError("disk full")
+        calls.append(len(chunks))
+
+    monkeypatch.setattr(chroma_client, "ingest", fake_ingest)
+    monkeypatch.setattr(settings, "chunk_max_tokens", 8)
+    monkeypatch.setattr(settings, "chunk_overlap_tokens", 0)
+    return calls, gate, busy
+
+
+def test_queued_batches_are_merged_up_to_max_batch(writes, monkeypatch):
+    calls, gate, busy = writes
+    monkeypatch.setattr(settings, "ingest_max_batch", 5)
+    q = IngestQueue(maxsize=10)
+    gate.clear()
+    first = q.submit(_chunks(1, "a"))
+    assert busy.wait(5)  # 写入线程取走第一批后阻塞在 gate 上
+    rest = [q.submit(_chunks(2, t)) for t in "bcd"]  # 2 + 2 + 2 个分块在队列里等待
+    gate.set()
+    assert first.result(5) == 1
+    assert [f.result(5) for f in rest] == [2, 2, 2]
+    q.close(5)
+    assert sum(calls) == 7
+    assert max(calls) <= 5
+    assert len(calls) < 4  # 排队的批次被合并写入
+
+
+def test_failure_is_reported_to_submitter(writes):
+    q = IngestQueue(maxsize=4)
+    bad = q.submit(_chunks(1, "bad"))
+    with pytest.raises(RuntimeError, match="disk full"):
+        bad.result(5)
+    assert q.submit(_chunks(1, "ok")).result(5) == 1  # 写入线程仍然存活
+    q.close(5)
+    assert q.stats["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_submit_async_applies_backpressure_without_blocking_loop(writes):
+    calls, gate, busy = writes
+    q = IngestQueue(maxsize=1)
+    gate.clear()
+    futs = [await q.submit_async(_chunks(1, "x0"))]
+    assert await asyncio.to_thread(busy.wait, 5)  # 写入线程取走第一批，阻塞
+    futs.append(await q.submit_async(_chunks(1, "x1")))  # 占满队列
+    pending = asyncio.ensure_future(q.submit_async(_chunks(1, "x2")))
+    await asyncio.sleep(0.05)
+    assert not pending.done()  # 队列满：提交方等待
+    gate.set()
+    futs.append(await pending)
+    assert [await f for f in futs] == [1, 1, 1]
+    q.close(5)
+    assert sum(calls) == 3
+
+
+def test_empty_submit_resolves_immediately(writes):
+    q = IngestQueue(maxsize=1)
+    assert q.submit([]).result(0) == 0
+    assert q._thread is None
@@ -0,0 +1,85 @@
+# tests/test_memory.py
+import time
+import uuid
+
+import pytest
+
+from app.core.config import settings
+from app.core.memory import TaskMemory, topic_id
+from app.tools.embedding_service import embedder
+
+
+@pytest.fixture
+def memory():
+    mem = TaskMemory()
+    existing = mem.collection.get()["ids"]
+    if existing:
+        mem.collection.delete(ids=existing)
+    return mem
+
+
+@pytest.fixture
+def tag():
+    return uuid.uuid4().hex[:8]
+
+
+def _age(memory, topic, seconds):
+    got = memory.collection.get(ids=[topic_id(topic)], include=["metadatas"])
+    meta = {**got["metadatas"][0], "created_at": time.time() - seconds}
+    memory.collection.update(ids=[topic_id(topic)], metadatas=[meta])
+
+
+def test_exact_topic_is_recalled_without_vector_search(memory, tag, monkeypatch):
+    memory.remember_task(f"Polyp Segmentation {tag}", "summary", "a.md")
+    monkeypatch.setattr(embedder, "embed_queries", lambda qs: pytest.fail("不应做向量检索"))
+
+    hit = memory.recall_task(f"  polyp   segmentation {tag}")
+    assert hit["artifact_path"] == "a.md"
+    assert memory.stats["exact_hits"] == 1
+
+
+def test_same_topic_overwrites_single_entry(memory, tag):
+    memory.remember_task(f"Polyp {tag}", "old", "old.md")
+    memory.remember_task(f"polyp {tag}", "new", "new.md")
+    assert memory.collection.count() == 1
+    assert memory.recall_task(f"POLYP {tag}")["artifact_path"] == "new.md"
+
+
+def test_similar_topic_falls_back_to_vector_search(memory, tag):
+    memory.remember_task(f"colon polyp segmentation deep learning {tag}", "s", "v.md")
+    hit = memory.recall_task(f"colon polyp segmentation deep learning models {tag}", threshold=0.5)
+    assert hit["artifact_path"] == "v.md"
+    assert memory.stats["vector_hits"] == 1
+    assert memory.recall_task(f"cardiac mri {tag}") is None
+
+
+def test_stale_memories_are_not_reused(memory, tag):
+    topic = f"adenoma detection {tag}"
+    memory.remember_task(topic, "s", "stale.md")
+    _age(memory, topic, settings.memory_ttl_light_s + 60)
+    assert memory.recall_task(topic, threshold=2.0) is None
+    assert memory.stats["stale"] == 1
+
+
+def test_deep_request_needs_fresh_deep_memory(memory, tag):
+    light, deep = f"light topic {tag}", f"deep topic {tag}"
+    memory.remember_task(light, "s", "light.md", depth="light")
+    memory.remember_task(deep, "s", "deep.md", depth="deep")
+
+    assert memory.recall_task(light, depth="deep", threshold=2.0)["artifact_path"] == "deep.md"
+    assert memory.recall_task(light, depth="light")["artifact_path"] == "light.md"
+
+    _age(memory, deep, settings.memory_ttl_deep_s + 60)  # 对 light 仍然新鲜，对 deep 过期
+    assert memory.recall_task(deep, depth="deep", threshold=2.0) is None
+    assert memory.recall_task(deep, depth="light")["artifact_path"] == "deep.md"
+
+
+def test_oldest_entries_are_evicted_over_capacity(memory, tag, monkeypatch):
+    monkeypatch.setattr(settings, "memory_max_entries", 10)
+    for i in range(11):
+        memory.remember_task(f"topic {i} {tag}", "s", f"{i}.md")
+        _age(memory, f"topic {i} {tag}", 100 - i)
+    assert memory.collection.count() == 9
+    assert memory.stats["evicted"] == 2
+    assert memory.recall_task(f"topic 0 {tag}", threshold=0.0) is None
+    assert memory.recall_task(f"topic 10 {tag}")["artifact_path"] == "10.md"
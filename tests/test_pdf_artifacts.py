@@ -0,0 +1,80 @@
+# tests/test_pdf_artifacts.py
+import threading
+import time
+import uuid
+
+import pytest
+
+from app.core.artifact_store import artifact_store
+from app.models.enums import ArtifactType
+from app.tools import pdf_artifacts as pdf_module
+from app.tools.pdf_artifacts import MARKDOWN_MIME, PdfArtifacts
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    calls = []
+
+    def fake_render(task_id, markdown_text, pdf_path=None):
+        calls.append(task_id)
+        time.sleep(0.1)
+        with open(pdf_path, "wb") as f:
+            f.write(b"%PDF-1.7\n" + markdown_text.encode("utf-8"))
+        return pdf_path
+
+    monkeypatch.setattr(pdf_module.pdf_render_service, "render", fake_render)
+    return calls
+
+
+@pytest.fixture
+def pdfs(tmp_path):
+    return PdfArtifacts(str(tmp_path / "locks"))
+
+
+def _task(markdown_text):
+    task_id = f"t-{uuid.uuid4().hex[:8]}"
+    artifact_store.save(task_id, ArtifactType.markdown, markdown_text.encode("utf-8"), MARKDOWN_MIME)
+    return task_id
+
+
+def test_concurrent_downloads_render_once(pdfs, renders):
+    task_id = _task(f"# Report {uuid.uuid4().hex}")
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(pdfs.pdf_for_task(task_id))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert renders == [task_id]
+    assert len({a.meta["sha256"] for a in results}) == 1
+    assert pdfs.stats["renders"] == 1 and pdfs.stats["waits"] >= 1
+    with open(results[0].uri, "rb") as f:
+        assert f.read().startswith(b"%PDF")
+
+
+def test_same_markdown_reuses_pdf_and_rewrite_rerenders(pdfs, renders):
+    text = f"# Shared {uuid.uuid4().hex}"
+    first, second = _task(text), _task(text)
+    assert pdfs.pdf_for_task(first).meta["sha256"] == pdfs.pdf_for_task(second).meta["sha256"]
+    assert renders == [first]
+    assert pdfs.pdf_for_task(second) is not None and len(renders) == 1  # 已登记，直接命中
+
+    artifact_store.save(second, ArtifactType.markdown, (text + " v2").encode("utf-8"), MARKDOWN_MIME)  # 任务重试
+    pdfs.pdf_for_task(second)
+    assert renders == [first, second]
+
+
+def test_missing_markdown_returns_none(pdfs, renders):
+    assert pdfs.pdf_for_task("no-such-task") is None
+    assert renders == []
+
+
+def test_failed_render_is_not_registered(pdfs, monkeypatch):
+    monkeypatch.setattr(pdf_module.pdf_render_service, "render",
+                        lambda *a, **kw: (_ for _ in ()).throw(RuntimeError("render crashed")))
+    task_id = _task(f"# Broken {uuid.uuid4().hex}")
+    with pytest.raises(RuntimeError):
+        pdfs.pdf_for_task(task_id)
+    assert artifact_store.get(task_id, ArtifactType.pdf) is None
+    assert pdfs.stats["failed"] == 1
@@ -0,0 +1,45 @@
+# tests/test_pdf_render_service.py
+import time
+
+import pytest
+
+from app.tools.pdf_render_service import PdfRenderService
+
+
+def _sleep_render(task_id, markdown_text, pdf_path=None):
+    """在子进程里执行：markdown_text 是要睡眠的秒数"""
+    time.sleep(float(markdown_text))
+    return pdf_path or f"{task_id}.pdf"
+
+
+@pytest.fixture
+def make_service():
+    services = []
+
+    def make(**kw):
+        svc = PdfRenderService(render_fn=_sleep_render, warmup=None, **kw)
+        services.append(svc)
+        return svc
+
+    yield make
+    for svc in services:
+        svc.shutdown(wait=False)
+
+
+def test_queued_jobs_do_not_count_wait_against_timeout(make_service):
+    svc = make_service(workers=1, max_queue=8, timeout_s=1.0)
+    svc.render("warm", "0")  # 子进程启动（spawn + 导入）不计入本用例
+    futures = [svc.submit(f"t{i}", "0.6") for i in range(4)]  # 串行共约 2.4s，每个都在超时内
+    assert [f.result(timeout=30) for f in futures] == [f"t{i}.pdf" for i in range(4)]
+    assert svc.stats["timeouts"] == 0 and svc.stats["pool_restarts"] == 0
+
+
+def test_stuck_render_times_out_and_pool_recovers(make_service):
+    svc = make_service(workers=1, max_queue=2, timeout_s=0.5)
+    stuck = svc.submit("stuck", "30")
+    with pytest.raises(TimeoutError):
+        stuck.result(timeout=30)
+    assert svc.stats["timeouts"] == 1 and svc.stats["pool_restarts"] == 1
+
+    assert svc.render("after", "0", pdf_path="after.pdf") == "after.pdf"
+    assert svc.snapshot()["in_flight"] == 0
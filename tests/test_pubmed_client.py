@@ -0,0 +1,54 @@
+import httpx
+import pytest
+
+from app.tools.pubmed_client import PubmedStreamParser, iter_pubmed
+
+
+def _article(pmid):
+    return (f"<PubmedArticle><MedlineCitation><PMID>{pmid}</PMID><Article>"
+            f"<ArticleTitle>Polyp <i>segmentation</i> {pmid}</ArticleTitle>"
+            f"<Journal><JournalIssue><PubDate><Year>2024</Year></PubDate></JournalIssue></Journal>"
+            f"<Abstract><AbstractText Label=\"METHODS\">U-Net on colonoscopy frames {pmid}.</AbstractText>"
+            f"<AbstractText Label=\"RESULTS\">Dice 0.91.</AbstractText></Abstract>"
+            f"</Article></MedlineCitation></PubmedArticle>")
+
+
+def _xml(pmids):
+    return ("<?xml version=\"1.0\"?><PubmedArticleSet>" + "".join(_article(p) for p in pmids)
+            + "</PubmedArticleSet>").encode("utf-8")
+
+
+def test_stream_parser_handles_arbitrary_chunk_boundaries():
+    data = _xml(["1", "2", "3"])
+    parser = PubmedStreamParser()
+    papers = []
+    for i in range(0, len(data), 7):
+        papers.extend(parser.feed(data[i:i + 7]))
+    papers.extend(parser.close())
+
+    assert [p["pmid"] for p in papers] == ["1", "2", "3"]
+    assert papers[0]["title"] == "Polyp segmentation 1"
+    assert papers[0]["abstract"] == "METHODS: U-Net on colonoscopy frames 1.\nRESULTS: Dice 0.91."
+    assert papers[0]["date"] == "2024"
+
+
+@pytest.mark.asyncio
+async def test_iter_pubmed_fetches_history_batches(mock_http):
+    pmids = [str(100 + i) for i in range(5)]
+
+    def handler(request):
+        if request.url.path.endswith("esearch.fcgi"):
+            assert request.url.params["usehistory"] == "y"
+            return httpx.Response(200, json={"esearchresult": {"count": "40", "webenv": "WE1", "querykey": "1"}})
+        assert request.url.params["WebEnv"] == "WE1"
+        start, n = int(request.url.params["retstart"]), int(request.url.params["retmax"])
+        return httpx.Response(200, content=_xml(pmids[start:start + n]))
+
+    seen = mock_http(handler)
+    papers = [p async for p in iter_pubmed("polyp", retmax=5, batch_size=2)]
+
+    assert sorted(p["pmid"] for p in papers) == pmids
+    fetches = [r for r in seen if r.url.path.endswith("efetch.fcgi")]
+    assert sorted((int(r.url.params["retstart"]), int(r.url.params["retmax"])) for r in fetches) == [(0, 2), (2, 2), (4, 1)]
+    # PMID 不拼进 URL，只用 WebEnv + 分页位置
+    assert all("id" not in r.url.params for r in fetches)
@@ -0,0 +1,87 @@
+# tests/test_rag_query.py
+import uuid
+
+import pytest
+
+from app.tools.chroma_client import client
+from app.tools.embedding_service import embedder
+from app.tools.rag_query import merge_results, query_rag_many
+
+DOCS = {
+    "p1": ("colorectal polyp detection with convolutional networks", "pubmed"),
+    "p2": ("adenoma miss rate during screening colonoscopy", "pubmed"),
+    "a1": ("transformer segmentation of polyps in endoscopy video", "arxiv"),
+    "g1": ("open source polyp segmentation toolkit repository", "github"),
+    "t1": ("clinical trial of computer aided detection enrollment", "clinical_trials"),
+}
+
+
+@pytest.fixture
+def coll():
+    coll = client.create_collection(f"test_{uuid.uuid4().hex[:8]}", embedding_function=embedder)
+    coll.add(ids=list(DOCS), documents=[d for d, _ in DOCS.values()],
+             metadatas=[{"source": s} for _, s in DOCS.values()])
+    yield coll
+    client.delete_collection(coll.name)
+
+
+class _CountingCollection:
+    def __init__(self, coll):
+        self.coll = coll
+        self.queries = []
+
+    def query(self, **kwargs):
+        self.queries.append(kwargs)
+        return self.coll.query(**kwargs)
+
+
+def test_many_queries_share_one_embed_and_one_query(coll, monkeypatch):
+    embed_calls = []
+    real = embedder.embed_queries
+    monkeypatch.setattr(embedder, "embed_queries", lambda qs: embed_calls.append(list(qs)) or real(qs))
+    counting = _CountingCollection(coll)
+
+    queries = ["adenoma miss rate colonoscopy", "polyp segmentation toolkit", "clinical trial enrollment"]
+    results = query_rag_many(queries, top_k=2, hybrid=False, coll=counting)
+
+    assert len(embed_calls) == 1 and len(counting.queries) == 1
+    assert len(counting.queries[0]["query_embeddings"]) == 3
+    assert [hits[0]["id"] for hits in results] == ["p2", "g1", "t1"]
+    assert all(len(hits) == 2 and "id" in hits[0] for hits in results)
+
+
+def test_where_filter_applies_to_every_query(coll):
+    results = query_rag_many(["polyp", "colonoscopy"], top_k=5, where={"source": "pubmed"},
+                             hybrid=False, coll=coll)
+    for hits in results:
+        assert {h["metadata"]["source"] for h in hits} == {"pubmed"}
+
+
+def test_merge_results_keeps_best_rank_per_chunk():
+    per_query = [
+        [{"id": "x", "score": 0.5}, {"id": "y", "score": 0.2}],
+        [{"id": "x", "score": 0.1}, {"id": "z", "score": 0.9}],
+    ]
+    merged = merge_results(per_query, limit=2)
+    assert [(c["id"], c["score"]) for c in merged] == [("x", 0.1), ("y", 0.2)]
+
+
+def test_expanded_query_has_same_shape_on_cache_hit(monkeypatch):
+    from app.tools import rag_query
+
+    tag = uuid.uuid4().hex[:8]
+    calls = []
+
+    def fake_by_source(queries, quotas=None, date_from=None, date_to=None):
+        calls.append(queries)
+        return {"pubmed": [{"id": "p", "content": "polyp", "metadata": {"source": "pubmed"}}],
+                "clinical_trials": [{"id": "t", "content": "trial", "metadata": {"source": "clinical_trials"}}]}
+
+    monkeypatch.setattr(rag_query, "query_rag_by_source", fake_by_source)
+    miss = rag_query.query_rag_expanded(f"polyp {tag}")
+    hit = rag_query.query_rag_expanded(f"polyp {tag}")
+    assert len(calls) == 1
+    assert type(miss) is type(hit) is list
+    assert miss == hit
+    trials, others = hit
+    assert [c["id"] for c in trials] == ["t"] and [c["id"] for c in others] == ["p"]
@@ -0,0 +1,81 @@
+# tests/test_rate_limiter.py
+import asyncio
+import time
+
+import pytest
+
+from app.core import rate_limiter
+from app.core.config import settings
+from app.core.event_bus import bus
+from app.core.rate_limiter import TokenBucketLimiter, get_limiter
+
+
+@pytest.fixture(params=["local", "redis"])
+def backend(request, monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_backend", request.param)
+    return request.param
+
+
+@pytest.mark.asyncio
+async def test_bucket_refills_at_rate(backend):
+    limiter = TokenBucketLimiter(f"test-refill-{backend}", rate=20.0, capacity=2)
+    start = time.monotonic()
+    await limiter.acquire()
+    await limiter.acquire()
+    assert time.monotonic() - start < 0.04  # 桶满时不等待
+    await limiter.acquire()
+    await limiter.acquire()
+    elapsed = time.monotonic() - start
+    # 第 3、4 个令牌各需 1/20 秒补充
+    assert 0.08 <= elapsed < 0.3
+    assert limiter.stats["acquired"] == 4
+    assert limiter.stats["waited_s"] > 0
+
+
+@pytest.mark.asyncio
+async def test_redis_bucket_is_shared_and_async(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_backend", "redis")
+    a = TokenBucketLimiter("test-shared", rate=10.0, capacity=1)
+    b = TokenBucketLimiter("test-shared", rate=10.0, capacity=1)
+
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    tick_task = asyncio.create_task(ticker())
+    await a.acquire()
+    await b.acquire()  # 另一个实例（另一个进程）从同一个 Redis 桶取令牌，需要等待
+    tick_task.cancel()
+    assert b.stats["waited_s"] > 0.05
+    assert ticks >= 3  # 等待期间事件循环没有被阻塞
+    assert bus.redis.hget("ratelimit:test-shared", "tokens") is not None
+
+
+@pytest.mark.asyncio
+async def test_pause_is_written_to_redis(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_backend", "redis")
+    limiter = TokenBucketLimiter("test-pause", rate=10.0)
+    limiter.observe(429, {"Retry-After": "2"})
+    await asyncio.gather(*limiter._pending)
+    paused_until = float(bus.redis.hget("ratelimit:test-pause", "paused_until"))
+    assert paused_until > time.time() * 1000 + 1000
+
+
+def test_github_search_has_own_bucket(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_limiters", {})
+    search = get_limiter("github_search")
+    core = get_limiter("github")
+    assert search is not core
+    assert search.rate == settings.github_search_rate_per_s
+    assert core.rate == settings.github_rate_per_s
+
+    # 搜索配额耗尽只暂停搜索桶
+    monkeypatch.setattr(settings, "rate_limit_backend", "local")
+    search.observe(200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Limit": "30",
+                         "X-RateLimit-Reset": str(time.time() + 30)})
+    assert search._paused_until > time.monotonic()
+    assert core._paused_until == 0.0
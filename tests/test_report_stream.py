@@ -0,0 +1,94 @@
+# tests/test_report_stream.py
+import json
+import uuid
+
+import pytest
+
+from app.core.config import settings
+from app.core.report_stream import report_stream
+from app.models.protocol import TaskPayload
+from app.workers import agents
+
+
+def _events(chunks):
+    out = []
+    for chunk in chunks:
+        if chunk.startswith(":"):
+            out.append(("keep-alive", None))
+            continue
+        fields = dict(line.split(": ", 1) for line in chunk.strip().splitlines())
+        out.append((fields["event"], json.loads(fields["data"])))
+    return out
+
+
+async def _read_all(task_id, last_id="0"):
+    return [chunk async for chunk in report_stream.iter_sse(task_id, last_id)]
+
+
+@pytest.fixture
+def task_id():
+    return f"t-{uuid.uuid4().hex[:8]}"
+
+
+@pytest.mark.asyncio
+async def test_sse_replays_sections_then_end(task_id):
+    report_stream.start(task_id)
+    report_stream.publish(task_id, "header", "# 标题")
+    report_stream.publish(task_id, "facts", "## 事实")
+    report_stream.finish(task_id, "done")
+
+    chunks = await _read_all(task_id)
+    events = _events(chunks)
+    assert [(e, d.get("section")) for e, d in events] == [("section", "header"), ("section", "facts"), ("end", None)]
+    assert events[1][1] == {"section": "facts", "index": 1, "markdown": "## 事实"}
+    assert events[-1][1]["status"] == "done"
+
+    # 断线重连：从第一节的消息 ID 之后继续
+    first_id = chunks[0].split("\n", 1)[0][len("id: "):]
+    assert [e for e, _ in _events(await _read_all(task_id, first_id))] == ["section", "end"]
+
+
+@pytest.mark.asyncio
+async def test_sse_keeps_alive_then_times_out(task_id, monkeypatch):
+    monkeypatch.setattr(settings, "report_stream_block_ms", 20)
+    monkeypatch.setattr(settings, "report_stream_timeout_s", 0.1)
+    events = _events(await _read_all(task_id))
+    assert ("keep-alive", None) in events
+    assert events[-1][0] == "timeout"
+
+
+@pytest.mark.asyncio
+async def test_writer_failure_still_ends_the_stream(task_id, monkeypatch):
+    def boom(topic, context):
+        yield "header", "# header"
+        raise RuntimeError("writer crashed")
+
+    monkeypatch.setattr(agents, "iter_report_sections", boom)
+    payload = TaskPayload(task_id=task_id, topic=f"failing topic {task_id}", step="write", params={},
+                          data={"rag_context": [{"content": "Polyp detection evidence sentence.",
+                                                 "metadata": {"source": "pubmed"}}]})
+    with pytest.raises(RuntimeError):
+        agents.WriterAgent().process(payload)
+
+    events = _events(await _read_all(task_id))
+    assert events[0][0] == "section" and events[0][1]["section"] == "header"
+    assert events[-1][0] == "end" and events[-1][1]["status"] == "failed"
+
+
+@pytest.mark.asyncio
+async def test_sse_route_streams_from_async_generator(task_id):
+    import httpx
+    from api.main import app
+    from app.core.db import db
+
+    db.tasks.insert_one({"task_id": task_id})
+    report_stream.start(task_id)
+    report_stream.publish(task_id, "header", "# 标题")
+    report_stream.finish(task_id, "done")
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        resp = await client.get(f"/api/task/{task_id}/report/stream")
+        missing = await client.get("/api/task/nope/report/stream")
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    assert [e for e, _ in _events(resp.text.split("\n\n")[:-1])] == ["section", "end"]
+    assert missing.status_code == 404
@@ -0,0 +1,93 @@
+# tests/test_semantic_cache.py
+import uuid
+
+import pytest
+
+from app.core.artifact_store import artifact_store
+from app.core.event_bus import bus
+from app.core.report_stream import stream_key
+from app.core.semantic_cache import _MISS, semantic_cache
+from app.models.enums import ArtifactType
+from app.models.protocol import TaskPayload
+from app.tools import rag_query
+from app.tools.embedding_service import embedder
+from app.workers import agents
+
+
+@pytest.fixture
+def retrievals(monkeypatch):
+    calls = []
+
+    def fake_many(queries, top_k=5, **kwargs):
+        calls.append(list(queries))
+        return [[{"id": f"{q}-hit", "content": q, "metadata": {"source": "pubmed"}, "score": 0.1}]
+                for q in queries]
+
+    monkeypatch.setattr(rag_query, "query_rag_many", fake_many)
+    return calls
+
+
+def test_exact_repeat_is_served_by_outer_cache_without_embedding(retrievals, monkeypatch):
+    topic = f"polyp segmentation {uuid.uuid4().hex[:6]}"
+    rag_query.query_rag(topic)
+    embed_calls = []
+    real = embedder.embed_queries
+    monkeypatch.setattr(embedder, "embed_queries", lambda qs: embed_calls.append(qs) or real(qs))
+
+    rag_query.query_rag(topic)
+    assert len(retrievals) == 1
+    assert embed_calls == []  # cache_result 在外层命中，没有走语义查找
+
+
+def test_near_duplicate_query_hits_semantic_cache(retrievals):
+    tag = uuid.uuid4().hex[:6]
+    first = rag_query.query_rag(f"Colon Polyp Segmentation {tag}")
+    hits = semantic_cache.stats["hits"]
+    again = rag_query.query_rag(f"colon  polyp   segmentation {tag} ")  # 说法不同，cache_result 未命中
+    assert again == first
+    assert len(retrievals) == 1
+    assert semantic_cache.stats["hits"] == hits + 1
+
+    rag_query.query_rag(f"adenoma miss rate {tag}")
+    assert len(retrievals) == 2
+
+
+def _run_writer(topic):
+    task_id = f"t-{uuid.uuid4().hex[:8]}"
+    context = [{"id": "c1", "content": "Polyp detection improves adenoma detection rate.",
+                "metadata": {"source": "pubmed", "title": "Polyp study"}}]
+    payload = TaskPayload(task_id=task_id, topic=topic, step="write", params={"depth": "light"},
+                          data={"rag_context": context})
+    agents.WriterAgent().process(payload)
+    artifact = artifact_store.get(task_id, ArtifactType.markdown)
+    sections = [f["section"] for _, f in bus.redis.xrange(stream_key(task_id))]
+    return artifact_store.read_text(artifact), sections
+
+
+def test_cached_report_gets_its_own_title(monkeypatch):
+    tag = uuid.uuid4().hex[:6]
+    composed = []
+    real_iter = agents.iter_report_sections
+    monkeypatch.setattr(agents, "iter_report_sections",
+                        lambda topic, ctx: composed.append(topic) or real_iter(topic, ctx))
+
+    first, first_sections = _run_writer(f"Polyp Segmentation {tag}")
+    second, second_sections = _run_writer(f"polyp segmentation {tag}")
+
+    assert len(composed) == 1  # 第二次命中语义缓存，没有重新生成
+    assert f"# 医学技术自动化报告：Polyp Segmentation {tag}" in first
+    assert f"# 医学技术自动化报告：polyp segmentation {tag}" in second
+    assert f"Polyp Segmentation {tag}" not in second
+    assert first_sections == second_sections
+    assert first_sections[0] == "header" and first_sections[-1] == "__end__"
+
+
+def test_lookup_survives_decision_log_failure(monkeypatch):
+    def broken_xadd(*args, **kwargs):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(bus.redis, "xadd", broken_xadd)
+    tag = uuid.uuid4().hex[:6]
+    assert semantic_cache.lookup("rag", f"polyp {tag}") is _MISS
+    semantic_cache.store("rag", f"polyp {tag}", ["cached"], ttl=60)
+    assert semantic_cache.lookup("rag", f"Polyp  {tag}") == ["cached"]
@@ -0,0 +1,53 @@
+# tests/test_source_quota_dates.py
+import base64
+import uuid
+
+import httpx
+import pytest
+
+from app.tools.github_client import ingest_github
+from app.tools.rag_query import build_where, query_rag_by_source
+
+
+def _github_handler(tag):
+    repos = [
+        {"name": "old", "full_name": f"{tag}/old", "html_url": f"https://github.com/{tag}/old",
+         "stargazers_count": 10, "updated_at": "2021-03-04T05:06:07Z"},
+        {"name": "new", "full_name": f"{tag}/new", "html_url": f"https://github.com/{tag}/new",
+         "stargazers_count": 20, "updated_at": "2024-08-09T10:11:12Z"},
+    ]
+    readme = base64.b64encode(b"Colon polyp segmentation toolkit for colonoscopy video.").decode()
+
+    def handler(request):
+        path = request.url.path
+        if path == "/search/repositories":
+            return httpx.Response(200, json={"items": repos})
+        if path.endswith("/readme"):
+            return httpx.Response(200, json={"content": readme})
+        if path.endswith("/stats/commit_activity"):
+            return httpx.Response(200, json=[{"total": 1, "week": i} for i in range(12)])
+        return httpx.Response(404)
+
+    return handler
+
+
+def test_build_where_combines_source_and_dates():
+    assert build_where("github", "2023-01-01", 20231231) == {"$and": [
+        {"source": "github"}, {"date_int": {"$gte": 20230101}}, {"date_int": {"$lte": 20231231}}]}
+    assert build_where() is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("hybrid", [False, True])
+async def test_github_chunks_are_date_filterable(mock_http, hybrid):
+    tag = f"org{uuid.uuid4().hex[:8]}"
+    mock_http(_github_handler(tag))
+    assert await ingest_github(f"polyp {tag}", top_n=2, incremental=False) > 0
+
+    def repos(**dates):
+        hits = query_rag_by_source([f"polyp segmentation {tag}"], quotas={"github": 10}, hybrid=hybrid, **dates)
+        return {h["metadata"]["repo"] for h in hits["github"] if h["metadata"]["repo"].startswith(tag)}
+
+    assert repos() == {f"{tag}/old", f"{tag}/new"}
+    assert repos(date_from="2023-01-01") == {f"{tag}/new"}
+    assert repos(date_to="2022-12-31") == {f"{tag}/old"}
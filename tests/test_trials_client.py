@@ -0,0 +1,34 @@
+import httpx
+import pytest
+
+from app.tools.trials_client import iter_trials
+
+
+def _studies(start, n):
+    return [{"protocolSection": {"identificationModule": {"nctId": f"NCT{start + i:08d}"}}} for i in range(n)]
+
+
+@pytest.mark.asyncio
+async def test_iter_trials_follows_page_tokens_and_caps_total(mock_http):
+    def handler(request):
+        token = request.url.params.get("pageToken")
+        size = int(request.url.params["pageSize"])
+        start = int(token) if token else 0
+        return httpx.Response(200, json={"studies": _studies(start, size), "nextPageToken": str(start + size)})
+
+    seen = mock_http(handler)
+    studies = [s async for s in iter_trials("polyp", max_results=7, page_size=3)]
+
+    ids = [s["protocolSection"]["identificationModule"]["nctId"] for s in studies]
+    assert ids == [f"NCT{i:08d}" for i in range(7)]
+    # 最后一页只请求剩余数量
+    assert [int(r.url.params["pageSize"]) for r in seen] == [3, 3, 1]
+    assert [r.url.params.get("pageToken") for r in seen] == [None, "3", "6"]
+
+
+@pytest.mark.asyncio
+async def test_iter_trials_stops_without_next_token(mock_http):
+    seen = mock_http(lambda request: httpx.Response(200, json={"studies": _studies(0, 2)}))
+    studies = [s async for s in iter_trials("polyp", max_results=10, page_size=5)]
+    assert len(studies) == 2
+    assert len(seen) == 1
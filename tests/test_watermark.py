@@ -0,0 +1,53 @@
+# tests/test_watermark.py
+import httpx
+import pytest
+
+from app.core.watermark import watermarks
+from app.tools.trials_client import ingest_trials
+
+
+def test_shallow_mark_is_ignored_by_deeper_crawl():
+    watermarks.set("pubmed", "Colon Polyps", depth=5, last_edat="2024/01/01")
+    assert watermarks.get("pubmed", "colon polyps", depth=5) == {"last_edat": "2024/01/01", "depth": 5}
+    assert watermarks.get("pubmed", "colon polyps", depth=3)["last_edat"] == "2024/01/01"
+    assert watermarks.get("pubmed", "colon polyps", depth=50) == {}
+
+
+def test_capped_crawl_lowers_depth_uncapped_keeps_it():
+    watermarks.set("arxiv", "polyp", depth=50, published="2024-01-01T00:00:00Z")
+    # 浅的增量抓取接上了旧水位线：原来 50 条的覆盖仍然成立
+    watermarks.set("arxiv", "polyp", depth=5, capped=False, published="2024-02-01T00:00:00Z")
+    assert watermarks.get("arxiv", "polyp", depth=50)["published"] == "2024-02-01T00:00:00Z"
+    # 浅抓取被 5 条上限截断：与旧水位线之间可能有遗漏
+    watermarks.set("arxiv", "polyp", depth=5, capped=True, published="2024-03-01T00:00:00Z")
+    assert watermarks.get("arxiv", "polyp", depth=50) == {}
+    assert watermarks.get("arxiv", "polyp", depth=5)["published"] == "2024-03-01T00:00:00Z"
+
+
+def _study(i, date):
+    return {"protocolSection": {
+        "identificationModule": {"nctId": f"NCT{i:08d}", "briefTitle": f"Polyp trial {i}"},
+        "statusModule": {"overallStatus": "RECRUITING", "lastUpdatePostDateStruct": {"date": date}},
+    }}
+
+
+@pytest.mark.asyncio
+async def test_ingest_trials_delta_respects_depth(mock_http):
+    catalogue = [_study(i, f"2024-01-{20 - i:02d}") for i in range(6)]
+
+    def handler(request):
+        size = int(request.url.params["pageSize"])
+        return httpx.Response(200, json={"studies": catalogue[:size]})
+
+    seen = mock_http(handler)
+
+    await ingest_trials("polyp", max_results=2, incremental=True)
+    assert "filter.advanced" not in seen[-1].url.params
+
+    # 更深的抓取不能沿用 2 条深度的水位线
+    await ingest_trials("polyp", max_results=5, incremental=True)
+    assert "filter.advanced" not in seen[-1].url.params
+
+    # 同样深度再抓一次：只取水位线之后更新的试验
+    await ingest_trials("polyp", max_results=5, incremental=True)
+    assert seen[-1].url.params["filter.advanced"] == "AREA[LastUpdatePostDate]RANGE[2024-01-20,MAX]"
@@ -44,12 +44,46 @@ export default function Home() {
     return () => clearInterval(interval);
   }, [taskId, status]);
 
-  // 模拟获取报告内容（实际项目中可以加一个 API /task/{id}/content）
+  // 报告分节推送（SSE）：Writer 每写完一节就追加渲染，不必等 PDF 生成
+  useEffect(() => {
+    if (!taskId) return;
+
+    const es = new EventSource(`${API_BASE}/task/${taskId}/report/stream`);
+    const sections: string[] = [];
+    es.addEventListener("section", (e) => {
+      const data = JSON.parse((e as MessageEvent).data);
+      sections[data.index] = data.markdown;
+      setReportMd(sections.filter(Boolean).join("\n"));
+    });
+    es.addEventListener("end", () => es.close());
+    es.addEventListener("timeout", () => es.close());
+    // 服务端推送的 event: error（Stream 不可用）带 data，直接关闭，否则浏览器会不停重连；
+    // 网络断开时浏览器自己触发的 error 没有 data，交给 EventSource 按 Last-Event-ID 自动重连
+    es.addEventListener("error", (e) => {
+      const data = (e as MessageEvent).data;
+      if (data !== undefined) {
+        console.error("Report stream error:", data);
+        es.close();
+      }
+    });
+
+    return () => es.close();
+  }, [taskId]);
+
+  // 获取完整 Markdown（后端按 ETag 校验，浏览器重复请求时得到 304 并复用缓存）
   const fetchReportContent = async (tid: string) => {
-    // 暂时先只显示完成状态，真正的 Markdown 预览需要后端支持读取文件
-    // 为了演示，我们在前端硬编码或通过 artifact 接口读取（如果是文本流）
-    // 这里暂时留空，重点展示 Timeline 和 PDF 下载
-    setReportMd(`## 报告已生成 \n\n 请点击右上方按钮下载 PDF 查看完整图表与引用。`);
+    try {
+      const res = await fetch(`${API_BASE}/artifact/${tid}/markdown`);
+      if (res.ok) {
+        const md = await res.text();
+        setReportMd(md);
+        return;
+      }
+    } catch (e) {
+      console.error(e);
+    }
+    // 已通过 SSE 收到正文时保留正文
+    setReportMd((prev) => prev || `## 报告已生成 \n\n 请点击右上方按钮下载 PDF 查看完整图表与引用。`);
   };
 
   const submitTask = async () => {